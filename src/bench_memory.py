@@ -0,0 +1,106 @@
+"""
+Measures how much memory the node trees of a large corpus take.
+
+Every markdown file under content/ is parsed --copies times and all the
+resulting HTMLNode trees are kept alive at once, which is what a build that
+holds many pages in memory does. The trees are then cloned twice, sharing
+their strings: once into the current slotted nodes and once into dict-backed
+objects shaped like the nodes before they had __slots__ (an instance
+__dict__, and a children list and props dict on every leaf). Comparing the
+two clones gives the per-node saving without the text payload.
+
+The same corpus is also parsed into document_ir Documents, the flat opcode
+form, and their memory and object count are compared with the trees'.
+Objects are counted as the tree holds them: every node, the children list
+of every parent, every non-empty props dict and every text value.
+
+    python3 src/bench_memory.py --copies 200
+"""
+import argparse
+import gc
+import tracemalloc
+from pathlib import Path
+
+from document_ir import markdown_to_document
+from htmlnode import LeafNode, ParentNode
+from markdown_to_blocks import markdown_to_html_node
+
+
+class _DictNode(object):
+    """Stand-in for the pre-__slots__ HTMLNode layout."""
+
+    def __init__(self, tag, value, children, props):
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+
+
+def _clone_slotted(node):
+    if isinstance(node, LeafNode):
+        return LeafNode(node.tag, node.value, node.props if node.props else None)
+    return ParentNode(node.tag, [_clone_slotted(child) for child in node.children], node.props if node.props else None)
+
+
+def _clone_unslotted(node):
+    if isinstance(node, LeafNode):
+        return _DictNode(node.tag, node.value, [], dict(node.props))
+    return _DictNode(node.tag, node.value, [_clone_unslotted(child) for child in node.children], dict(node.props))
+
+
+def _count_nodes(node) -> int:
+    return 1 + sum(_count_nodes(child) for child in node.children)
+
+
+def _count_objects(node) -> int:
+    if isinstance(node, LeafNode):
+        return 1 + (1 if node.props else 0) + 1
+    return 2 + (1 if node.props else 0) + sum(_count_objects(child) for child in node.children)
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def load_corpus(content_dir: Path, copies: int) -> list:
+    pages = [path.read_text(encoding='utf-8') for path in sorted(content_dir.rglob("*.md"))]
+    return pages * copies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--content", type=Path, default=Path("content"))
+    parser.add_argument("--copies", type=int, default=100, help="how many times to repeat the corpus")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.content, args.copies)
+    trees, parsed_bytes = _measure(lambda: [markdown_to_html_node(page) for page in corpus])
+    nodes = sum(_count_nodes(tree) for tree in trees)
+    _, slotted_bytes = _measure(lambda: [_clone_slotted(tree) for tree in trees])
+    _, unslotted_bytes = _measure(lambda: [_clone_unslotted(tree) for tree in trees])
+    tree_objects = sum(_count_objects(tree) for tree in trees)
+    documents, document_bytes = _measure(lambda: [markdown_to_document(page) for page in corpus])
+    # A Document, its op array and its text buffer.
+    document_objects = 3 * len(documents)
+
+    print(f"pages:            {len(corpus)}")
+    print(f"nodes:            {nodes}")
+    print(f"parsed trees:     {parsed_bytes / 2**20:8.1f} MiB  (including text)")
+    print(f"slotted trees:    {slotted_bytes / 2**20:8.1f} MiB  {slotted_bytes / nodes:6.1f} B/node")
+    print(f"dict-based trees: {unslotted_bytes / 2**20:8.1f} MiB  {unslotted_bytes / nodes:6.1f} B/node")
+    print(f"saving:           {(unslotted_bytes - slotted_bytes) / nodes:6.1f} B/node "
+          f"({100 * (1 - slotted_bytes / unslotted_bytes):.0f}%)")
+    print(f"tree objects:     {tree_objects}")
+    print(f"flat documents:   {document_bytes / 2**20:8.1f} MiB  (including text), {document_objects} objects "
+          f"({100 * (1 - document_bytes / parsed_bytes):.0f}% less memory than the parsed trees)")
+
+
+if __name__ == "__main__":
+    main()
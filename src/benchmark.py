@@ -0,0 +1,313 @@
+"""
+Times each stage of the build on a synthetic corpus and writes the results as JSON.
+
+    python3 src/benchmark.py --pages 2000 --shape paragraph --output bench.json
+    python3 src/benchmark.py --compare bench.json
+
+Each stage is timed on its own, over inputs prepared by the earlier stages,
+so a regression can be pinned to one function. --compare prints the change
+against an earlier results file.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from block_cache import BlockCache
+from blocktype import block_to_block_type, classify_block, BlockType
+from copy_static import copy_directory_contents, sync_directory
+from corpus import SHAPES, generate_corpus, generate_static
+from document_ir import markdown_to_document
+from generate_page import generate_pages_recursive
+from htmlnode import LeafNode
+from markdown_to_blocks import markdown_to_blocks, markdown_to_html_node
+from precompress import precompress
+from raw_to_textnode import INLINE_BACKENDS, text_to_textnodes
+from template import Template
+
+# name -> function(bench) returning the number of items it processed.
+STAGES = {}
+
+
+def stage(name):
+    def register(func):
+        STAGES[name] = func
+        return func
+    return register
+
+
+class Bench(object):
+    """Holds the corpus and lazily derives each stage's inputs from it."""
+
+    def __init__(self, work_dir: Path, pages: int, shape: str, static_files: int, seed: int):
+        self.work_dir = work_dir
+        self.content_dir = work_dir / "content"
+        self.static_dir = work_dir / "static"
+        self.template_path = Path(__file__).resolve().parent.parent / "template.html"
+        generate_corpus(self.content_dir, pages, shape, seed=seed)
+        generate_static(self.static_dir, static_files, seed=seed)
+        self.documents = [path.read_text(encoding='utf-8') for path in sorted(self.content_dir.rglob("*.md"))]
+        self._cache = {}
+
+    def derived(self, name, build):
+        if name not in self._cache:
+            self._cache[name] = build()
+        return self._cache[name]
+
+    @property
+    def blocks(self) -> list:
+        return self.derived("blocks", lambda: [block for doc in self.documents for block in markdown_to_blocks(doc)])
+
+    @property
+    def inline_texts(self) -> list:
+        def build():
+            return [block.replace("\n", " ") for block in self.blocks
+                    if block_to_block_type(block) != BlockType.CODE]
+        return self.derived("inline_texts", build)
+
+    @property
+    def trees(self) -> list:
+        return self.derived("trees", lambda: [markdown_to_html_node(doc) for doc in self.documents])
+
+    @property
+    def flat_documents(self) -> list:
+        return self.derived("flat_documents", lambda: [markdown_to_document(doc) for doc in self.documents])
+
+    @property
+    def rendered(self) -> list:
+        return self.derived("rendered", lambda: [LeafNode(None, tree.to_html()) for tree in self.trees])
+
+
+@stage("markdown_to_blocks")
+def bench_markdown_to_blocks(bench):
+    for doc in bench.documents:
+        markdown_to_blocks(doc)
+    return len(bench.documents)
+
+
+@stage("block_to_block_type")
+def bench_block_to_block_type(bench):
+    for block in bench.blocks:
+        block_to_block_type(block)
+    return len(bench.blocks)
+
+
+@stage("classify_block")
+def bench_classify_block(bench):
+    for block in bench.blocks:
+        classify_block(block)
+    return len(bench.blocks)
+
+
+@stage("text_to_textnodes")
+def bench_text_to_textnodes(bench):
+    for text in bench.inline_texts:
+        text_to_textnodes(text)
+    return len(bench.inline_texts)
+
+
+@stage("text_to_textnodes_regex")
+def bench_text_to_textnodes_regex(bench):
+    """The same texts through the regex inline backend."""
+    regex_backend = INLINE_BACKENDS["regex"]
+    for text in bench.inline_texts:
+        regex_backend(text)
+    return len(bench.inline_texts)
+
+
+@stage("markdown_to_html_node")
+def bench_markdown_to_html_node(bench):
+    for doc in bench.documents:
+        markdown_to_html_node(doc)
+    return len(bench.documents)
+
+
+@stage("markdown_to_html_node_cached")
+def bench_markdown_to_html_node_cached(bench):
+    """Parse and serialize through a fresh cache, so only blocks repeated within the corpus hit.
+
+    Compare against markdown_to_html_node plus to_html.
+    """
+    cache = BlockCache()
+    for doc in bench.documents:
+        markdown_to_html_node(doc, cache=cache).to_html()
+    return len(bench.documents)
+
+
+@stage("to_html")
+def bench_to_html(bench):
+    for tree in bench.trees:
+        tree.to_html()
+    return len(bench.trees)
+
+
+@stage("markdown_to_document")
+def bench_markdown_to_document(bench):
+    for doc in bench.documents:
+        markdown_to_document(doc)
+    return len(bench.documents)
+
+
+@stage("document_to_html")
+def bench_document_to_html(bench):
+    for document in bench.flat_documents:
+        document.to_html()
+    return len(bench.flat_documents)
+
+
+@stage("template")
+def bench_template(bench):
+    template = Template(bench.template_path.read_text(encoding='utf-8'), "/site/")
+    for content in bench.rendered:
+        template.write(io.StringIO(), content, {"Title": "Title"})
+    return len(bench.rendered)
+
+
+@stage("copy_directory_contents")
+def bench_copy_directory_contents(bench):
+    dest = Path(tempfile.mkdtemp(dir=bench.work_dir))
+    copy_directory_contents(str(bench.static_dir), str(dest))
+    return sum(1 for _ in bench.static_dir.rglob("*") if _.is_file())
+
+
+@stage("sync_directory_noop")
+def bench_sync_directory_noop(bench):
+    dest = bench.work_dir / "synced"
+    manifest = bench.work_dir / "sync-manifest.json"
+    if not dest.exists():
+        sync_directory(bench.static_dir, dest, manifest)
+    _, unchanged, _ = sync_directory(bench.static_dir, dest, manifest)
+    return unchanged
+
+
+@stage("full_build")
+def bench_full_build(bench):
+    dest = Path(tempfile.mkdtemp(dir=bench.work_dir))
+    generate_pages_recursive(bench.content_dir, bench.template_path, dest, "/site/")
+    return len(bench.documents)
+
+
+@stage("full_build_minified")
+def bench_full_build_minified(bench):
+    dest = Path(tempfile.mkdtemp(dir=bench.work_dir))
+    generate_pages_recursive(bench.content_dir, bench.template_path, dest, "/site/", minify=True)
+    return len(bench.documents)
+
+
+@stage("full_build_precompressed")
+def bench_full_build_precompressed(bench):
+    """full_build followed by compressing every page, as a --precompress build does; compare with full_build."""
+    dest = Path(tempfile.mkdtemp(dir=bench.work_dir))
+    generate_pages_recursive(bench.content_dir, bench.template_path, dest, "/site/")
+    precompress(sorted(dest.rglob("*.html")))
+    return len(bench.documents)
+
+
+@stage("precompress_noop")
+def bench_precompress_noop(bench):
+    dest = bench.work_dir / "precompressed"
+    if not dest.exists():
+        generate_pages_recursive(bench.content_dir, bench.template_path, dest, "/site/")
+        precompress(dest.rglob("*.html"))
+    _, unchanged = precompress(sorted(dest.rglob("*.html")))
+    return unchanged
+
+
+@stage("startup_noop")
+def bench_startup_noop(bench):
+    # A whole main.py run, interpreter startup included, over a site that is already up to date.
+    main = [sys.executable, str(Path(__file__).resolve().parent / "main.py"), "/site/"]
+    template = bench.work_dir / "template.html"
+    if not template.exists():
+        template.write_bytes(bench.template_path.read_bytes())
+        subprocess.run(main, cwd=bench.work_dir, stdout=subprocess.DEVNULL, check=True)
+    subprocess.run(main, cwd=bench.work_dir, stdout=subprocess.DEVNULL, check=True)
+    return 1
+
+
+def _quiet(func, *args):
+    """Runs func with stdout discarded; copy_directory_contents prints per file."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def run_stage(func, bench, repeat: int) -> dict:
+    """Times func repeat times after one untimed warm-up run, which also builds its derived inputs."""
+    items = _quiet(func, bench)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = _quiet(func, bench)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "items": items,
+        "seconds_min": best,
+        "seconds_mean": sum(timings) / len(timings),
+        "items_per_second": items / best if best else None,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print(f"{'stage':<26}{'before':>12}{'after':>12}{'change':>10}")
+    for name, result in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        after = result["seconds_min"]
+        if old is None:
+            print(f"{name:<26}{'-':>12}{after:>12.4f}{'':>10}")
+            continue
+        before = old["seconds_min"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:<26}{before:>12.4f}{after:>12.4f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the site build.")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--shape", choices=SHAPES, default="mixed")
+    parser.add_argument("--static-files", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), default=None,
+                        help="only run these stages (default: all)")
+    parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--compare", type=Path, default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench = Bench(Path(tmp), args.pages, args.shape, args.static_files, args.seed)
+        results = {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "corpus": {"pages": args.pages, "shape": args.shape, "static_files": args.static_files, "seed": args.seed},
+            "stages": {},
+        }
+        for name in args.stages or STAGES:
+            result = run_stage(STAGES[name], bench, args.repeat)
+            results["stages"][name] = result
+            print(f"{name:<26}{result['seconds_min']:>10.4f}s  {result['items']:>8} items")
+
+    args.output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+    print(f"Results written to {args.output}")
+    if args.compare is not None:
+        compare(results, json.loads(args.compare.read_text(encoding='utf-8')))
+
+
+if __name__ == "__main__":
+    main()
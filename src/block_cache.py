@@ -0,0 +1,108 @@
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+# Bump whenever block rendering changes so fragments cached by an older
+# version are not reused.
+BLOCK_CACHE_VERSION = 3
+
+
+class BlockCache(object):
+    """
+    Bounded LRU cache from markdown block text to its rendered HTML fragment.
+
+    Blocks repeated across pages (disclaimers, nav lists, the "Back Home"
+    link) are parsed once and served from here afterwards. Each entry is a
+    (fragment, links, images, terms) tuple, keeping the block's link and
+    image URLs for the dependency graph and, once index_terms is set, its
+    search terms (None until then). The cache holds at most max_size
+    bytes of blocks plus entries, measured UTF-8 encoded; the least
+    recently used entries are evicted first. Fragments don't depend on the
+    basepath, which is applied later by the template. The cache is only
+    written to disk when it has a path.
+    """
+
+    def __init__(self, max_size: int = 32 * 1024 * 1024, path=None, index_terms: bool = False):
+        self.max_size = max_size
+        self.path = Path(path) if path is not None else None
+        self.index_terms = index_terms
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Set by generate_pages_recursive to the number of worker processes
+        # that rendered the last build without the cache, or 0.
+        self.workers = 0
+
+    @classmethod
+    def load(cls, path, max_size: int = 32 * 1024 * 1024):
+        """Loads a cache from disk, returning an empty one if it is missing, unreadable or outdated."""
+        cache = cls(max_size, path)
+        try:
+            data = json.loads(Path(path).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return cache
+        if data.get("version") != BLOCK_CACHE_VERSION:
+            return cache
+        for block, fragment, links, images, terms in data.get("entries", []):
+            cache.put(block, fragment, links, images, terms)
+        return cache
+
+    def save(self, path=None):
+        """Writes the entries in LRU order, atomically like BuildManifest.save."""
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("BlockCache has no path to save to")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        data = {"version": BLOCK_CACHE_VERSION, "entries": [[block, *entry] for block, entry in self.entries.items()]}
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def get(self, block: str):
+        """Returns the cached (fragment, links, images, terms) for block, or None, and counts the hit or miss."""
+        entry = self.entries.get(block)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(block)
+        self.hits += 1
+        return entry
+
+    def put(self, block: str, fragment: str, links=(), images=(), terms=None) -> None:
+        entry = (fragment, tuple(links), tuple(images), tuple(terms) if terms is not None else None)
+        entry_size = _entry_size(block, entry)
+        if entry_size > self.max_size:
+            return
+        old = self.entries.pop(block, None)
+        if old is not None:
+            self.size -= _entry_size(block, old)
+        self.entries[block] = entry
+        self.size += entry_size
+        while self.size > self.max_size:
+            evicted_block, evicted = self.entries.popitem(last=False)
+            self.size -= _entry_size(evicted_block, evicted)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self) -> str:
+        if self.workers:
+            return (f"Block cache: not used by the {self.workers} worker processes; "
+                    f"{len(self.entries)} entries, {self.size / 2**20:.1f} MiB kept for in-process builds")
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0.0
+        return (f"Block cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), "
+                f"{len(self.entries)} entries, {self.size / 2**20:.1f} MiB")
+
+
+def _utf8_size(text: str) -> int:
+    # ASCII text, by far the most common, is as many bytes as characters.
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
+def _entry_size(block: str, entry) -> int:
+    fragment, links, images, terms = entry
+    size = _utf8_size(block) + _utf8_size(fragment) + sum(map(_utf8_size, links)) + sum(map(_utf8_size, images))
+    return size + sum(map(_utf8_size, terms)) if terms is not None else size
@@ -11,22 +11,54 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
    
 
+_ORDERED_LIST_PATTERN = re.compile(r"\d+\.\s")
+
+
 def block_to_block_type(block):
     """
     Convert a block to its corresponding BlockType.
 
     If the block does not match any specific type, it defaults to BlockType.PARAGRAPH.
     """
-    lines = block.strip().splitlines()
-    if block.lstrip().startswith("#") and block.lstrip().split(" ", 1)[0].count("#") > 0:
-        return BlockType.HEADING
-    elif block.startswith("> "):
-        return BlockType.QUOTE
+    return classify_block(block)[0]
+
+
+def classify_block(block):
+    """
+    Classify a block by its first character and return (BlockType, lines).
+
+    lines is block.splitlines() for quote, code and list blocks, so their
+    create_*_node functions don't split the block again, and None for
+    headings and paragraphs, which don't need it.
+    """
+    first = block[:1]
+    if first == "#":
+        return BlockType.HEADING, None
+    if first == ">":
+        if block.startswith("> "):
+            return BlockType.QUOTE, block.splitlines()
+        return BlockType.PARAGRAPH, None
+    if first == "`":
+        return _classify_code(block)
+    if first == "-":
+        if block.startswith("- "):
+            return BlockType.UNORDERED_LIST, block.splitlines()
+        return BlockType.PARAGRAPH, None
+    if first.isdecimal():
+        if _ORDERED_LIST_PATTERN.match(block):
+            return BlockType.ORDERED_LIST, block.splitlines()
+        return BlockType.PARAGRAPH, None
+    if first.isspace():
+        # Blocks from markdown_to_blocks are stripped; only blocks passed in directly get here.
+        if block.lstrip().startswith("#"):
+            return BlockType.HEADING, None
+        return _classify_code(block)
+    return BlockType.PARAGRAPH, None
+
+
+def _classify_code(block):
+    stripped = block.strip()
+    lines = stripped.splitlines()
     if len(lines) >= 2 and lines[0].startswith("```") and lines[-1].startswith("```"):
-        return BlockType.CODE
-    elif block.startswith("- "):
-        return BlockType.UNORDERED_LIST
-    elif re.match(r"^\d+\.\s", block):
-        return BlockType.ORDERED_LIST
-    else:
-        return BlockType.PARAGRAPH
\ No newline at end of file
+        return BlockType.CODE, lines if stripped == block else block.splitlines()
+    return BlockType.PARAGRAPH, None
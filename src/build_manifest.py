@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+MANIFEST_VERSION = 3
+
+# The root-relative URLs template.rewrite_root_urls points at fingerprinted
+# copies; kept here so checking a manifest never imports the renderer.
+_ROOT_URL_PATTERN = re.compile(r'\b(?:href|src)="/([^"]*)"')
+
+
+def hash_bytes(data: bytes) -> str:
+    """Returns the hex sha256 digest of the given bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path, buffer: bytearray = None) -> str:
+    """
+    Returns the hex sha256 digest of a file, read in 1 MiB chunks.
+
+    Chunks are read into buffer, so hashing many files with one buffer
+    allocates nothing per chunk or per file.
+    """
+    digest = hashlib.sha256()
+    view = memoryview(buffer if buffer is not None else bytearray(1024*1024))
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(view)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def asset_urls(urls, assets: dict = None) -> dict:
+    """
+    The fingerprinted copies of the assets among the root-relative urls,
+    keyed by asset path; urls are looked up as in image_sizes.
+    """
+    if not assets:
+        return {}
+    paths = (unquote(urlsplit(url[1:]).path) for url in urls if url.startswith("/"))
+    return {path: assets[path] for path in paths if path in assets}
+
+
+def image_sizes(urls, images: dict = None) -> dict:
+    """The [width, height] of the images among the root-relative urls, keyed as in images."""
+    if not images:
+        return {}
+    sizes = {}
+    for url in urls:
+        if url.startswith("/"):
+            key = unquote(urlsplit(url[1:]).path)
+            if key in images:
+                sizes[key] = list(images[key])
+    return sizes
+
+
+def template_fingerprint(template_bytes: bytes, site_values: dict, assets: dict = None, minify: bool = False, images: dict = None) -> str:
+    """
+    Hash of everything besides the markdown that a page's output depends on.
+
+    assets is the map of fingerprinted asset URLs pages are rendered with, if
+    any, minify whether the template's whitespace is stripped, and images
+    the image sizes img tags are given, if any. Only the entries of assets
+    and images that the template and site_values themselves refer to are
+    hashed; each page records the ones its content refers to (see
+    BuildManifest.record_page), so changing one asset only rebuilds the
+    pages that use it.
+    """
+    data = template_bytes + json.dumps(site_values, sort_keys=True).encode('utf-8')
+    if assets or images:
+        text = template_bytes.decode('utf-8', 'replace') + "".join(str(value) for value in site_values.values())
+        urls = ["/" + path for path in _ROOT_URL_PATTERN.findall(text)]
+        used_assets = asset_urls(urls, assets)
+        if used_assets:
+            data += json.dumps(used_assets, sort_keys=True).encode('utf-8')
+        used_images = image_sizes(urls, images)
+        if used_images:
+            data += b"\0images" + json.dumps(used_images, sort_keys=True).encode('utf-8')
+    if minify:
+        data += b"\0minify"
+    return hash_bytes(data)
+
+
+class BuildManifest(object):
+    """
+    Persistent record of the inputs every generated page was built from.
+
+    Each page entry is keyed by the source path relative to the content
+    directory and stores the hash of its markdown, the template hash, the
+    basepath and the destination, plus the source size and mtime so that an
+    untouched file can be skipped without being read at all. The link and
+    image URLs found in the page and the template path are kept for the
+    dependency graph, the fingerprinted URLs and image sizes the page was
+    rendered with for those of its links and images that have them (see
+    asset_urls and image_sizes), the title and search terms for the search index
+    when the build indexes them (terms as one space separated string), and
+    the summary for the site files when the build writes them.
+
+    Static assets synced into the output directory are tracked separately so
+    that files which disappear from the source can be removed without
+    touching generated pages. Assets copied under content-addressed names
+    (see copy_static.sync_fingerprinted) also record their digest and the
+    path of their copy as "url".
+    """
+
+    def __init__(self, path=None, pages=None, assets=None):
+        self.path = Path(path) if path is not None else None
+        self.pages = pages if pages is not None else {}
+        self.assets = assets if assets is not None else {}
+
+    @classmethod
+    def load(cls, path):
+        """Loads a manifest from disk, returning an empty one if it is missing or unreadable."""
+        path = Path(path)
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, pages=data.get("pages", {}), assets=data.get("assets", {}))
+
+    def save(self, path=None):
+        """Writes the manifest atomically so an interrupted build never leaves it half written."""
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("BuildManifest has no path to save to")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        data = {"version": MANIFEST_VERSION, "pages": self.pages, "assets": self.assets}
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def page_is_fresh(self, key: str, stat: os.stat_result, template_hash: str, basepath: str, dest_path: Path, markdown_hash: str = None, assets: dict = None, images: dict = None) -> bool:
+        """
+        True if the page was built from this template and basepath, with the
+        current URLs and sizes of the assets and images it refers to, and its
+        output still exists.
+
+        Without a markdown hash the source is compared by size and mtime only;
+        with one, the content hash decides, which catches touched-but-unchanged files.
+        """
+        entry = self.pages.get(key)
+        if entry is None:
+            return False
+        if entry["template"] != template_hash or entry["basepath"] != basepath:
+            return False
+        if entry["dest"] != str(dest_path) or not dest_path.exists():
+            return False
+        urls = entry["links"] + entry["images"]
+        if entry.get("asset_urls", {}) != asset_urls(urls, assets):
+            return False
+        if entry.get("image_sizes", {}) != image_sizes(entry["images"], images):
+            return False
+        if markdown_hash is not None:
+            return entry["markdown"] == markdown_hash
+        return entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+
+    def touch_page(self, key: str, stat: os.stat_result) -> None:
+        """Refreshes the recorded size and mtime of a page whose content did not change."""
+        entry = self.pages[key]
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+
+    def record_page(self, key: str, stat: os.stat_result, markdown_hash: str, template_hash: str, basepath: str, dest_path: Path, links=(), images=(), template_path=None, title=None, terms=None, summary=None, assets: dict = None, sizes: dict = None) -> None:
+        """
+        Records a page built from these inputs. assets and sizes are the
+        fingerprinted URLs and image sizes it was rendered with, as passed to
+        generate_page.generate_pages_recursive; only its own are kept.
+        """
+        self.pages[key] = {
+            "markdown": markdown_hash,
+            "template": template_hash,
+            "basepath": basepath,
+            "dest": str(dest_path),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "links": list(links),
+            "images": list(images),
+            "template_path": str(template_path) if template_path is not None else None,
+            "title": title,
+            "terms": " ".join(terms) if terms is not None else None,
+            "summary": summary,
+            "asset_urls": asset_urls(list(links) + list(images), assets),
+            "image_sizes": image_sizes(images, sizes),
+        }
+
+    def is_up_to_date(self, content_dir: Path, dest_dir: Path, template_hash: str, basepath: str, static_dir: Path = None, require_terms: bool = False, fingerprinted: bool = False, images: dict = None) -> bool:
+        """
+        True if a build would change nothing, judged from sizes and mtimes alone.
+
+        Every markdown file under content_dir must have a fresh page (see
+        page_is_fresh) and no recorded page may be gone; with static_dir,
+        every static file must match its record and its copy in dest_dir,
+        and nothing may have been added or removed; fingerprinted says whether
+        they should also have been copied under content-addressed names, and the
+        pages are checked against the URLs recorded for those copies. images
+        are the image sizes pages should have been given, if any. With
+        require_terms every page must have search terms recorded. Nothing is read or hashed, so
+        this is cheap enough to run before importing the renderer at all.
+        """
+        assets = None
+        if fingerprinted:
+            assets = {key: entry.get("url") for key, entry in self.assets.items()}
+        pages = 0
+        for root, _, files in os.walk(content_dir):
+            for name in files:
+                if not name.endswith('.md'):
+                    continue
+                path = Path(root) / name
+                relative_path = path.relative_to(content_dir)
+                key = relative_path.as_posix()
+                dest_path = Path(dest_dir) / relative_path.with_suffix('.html')
+                if not self.page_is_fresh(key, path.stat(), template_hash, basepath, dest_path, None, assets, images):
+                    return False
+                if require_terms and self.pages[key].get("terms") is None:
+                    return False
+                pages += 1
+        if pages != len(self.pages):
+            return False
+        if static_dir is None:
+            return True
+
+        assets = 0
+        for root, _, files in os.walk(static_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, static_dir).replace(os.sep, "/")
+                entry = self.assets.get(key)
+                stat = os.stat(path)
+                if entry is None or (entry["size"], entry["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                    return False
+                if ("url" in entry) != fingerprinted:
+                    return False
+                try:
+                    dest_stat = os.stat(os.path.join(dest_dir, key))
+                    # A content-addressed copy may be shared with an identical file, and carry its mtime.
+                    if fingerprinted and os.stat(os.path.join(dest_dir, entry["url"])).st_size != stat.st_size:
+                        return False
+                except FileNotFoundError:
+                    return False
+                if (dest_stat.st_size, dest_stat.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                    return False
+                assets += 1
+        return assets == len(self.assets)
+
+    def prune_pages(self, seen_keys) -> list:
+        """Drops entries whose source no longer exists and returns their destination paths."""
+        stale = [key for key in self.pages if key not in seen_keys]
+        return [Path(self.pages.pop(key)["dest"]) for key in stale]
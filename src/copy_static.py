@@ -1,4 +1,19 @@
 import os
+import posixpath
+import shutil
+from build_manifest import BuildManifest, hash_file
+from precompress import remove_compressed
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl request number for FICLONE from <linux/fs.h>
+_FICLONE = 0x40049409
+
+# Hex digits of the content hash put into fingerprinted asset names.
+FINGERPRINT_LENGTH = 8
 
 def clear_directory(directory: str):
     """Deletes all contents of the specified directory."""
@@ -43,3 +58,207 @@ def copy_directory_contents(source_dir: str, dest_dir: str):
                         fdst.write(buf)
 
 
+def _files_match(source_path: str, dest_path: str, source_stat: os.stat_result, use_hash: bool) -> bool:
+    """Compares a source file with its copy by size and mtime, falling back to a content hash if asked."""
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    if dest_stat.st_size != source_stat.st_size:
+        return False
+    if dest_stat.st_mtime_ns == source_stat.st_mtime_ns:
+        return True
+    if use_hash and hash_file(source_path) == hash_file(dest_path):
+        # Same bytes, only the mtime drifted: align it so the next run takes the cheap path.
+        os.utime(dest_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        return True
+    return False
+
+
+def _reflink(source_path: str, dest_path: str) -> bool:
+    """Tries a copy-on-write clone (btrfs, xfs, ...). Returns False where the filesystem can't do it."""
+    if fcntl is None:
+        return False
+    with open(source_path, 'rb') as fsrc, open(dest_path, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            return False
+    return True
+
+
+def copy_file(source_path: str, dest_path: str, link: bool = False) -> None:
+    """
+    Copies a single file using the cheapest mechanism available.
+
+    With link=True a hardlink is tried first. Otherwise a reflink is tried, then
+    shutil.copyfile, which uses os.sendfile on Linux. The source mtime is kept
+    so that later syncs can compare the two files by size and mtime. A file
+    that is replaced loses its precompressed copies, which would be stale.
+    """
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+        remove_compressed(dest_path)
+    if link:
+        try:
+            os.link(source_path, dest_path)
+            return
+        except OSError:
+            pass
+    if not _reflink(source_path, dest_path):
+        shutil.copyfile(source_path, dest_path)
+    shutil.copystat(source_path, dest_path)
+
+
+def sync_directory(source_dir: str, dest_dir: str, manifest_path=None, use_hash: bool = False, link: bool = False):
+    """
+    Brings dest_dir up to date with source_dir, copying only files that changed.
+
+    Files are compared by size and mtime, plus a content hash when use_hash is
+    set. When manifest_path is given, the synced files are recorded there and
+    files that were synced before but are gone from the source are removed.
+    Nothing else in dest_dir, such as generated pages, is touched.
+
+    Returns a (copied, unchanged, removed) tuple of file counts.
+    """
+    manifest = BuildManifest.load(manifest_path) if manifest_path is not None else None
+    copied = unchanged = removed = 0
+    seen = {}
+
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        rel_root = os.path.relpath(root, source_dir)
+        dest_root = os.path.join(dest_dir, rel_root)
+        os.makedirs(dest_root, exist_ok=True)
+        for name in sorted(files):
+            source_path = os.path.join(root, name)
+            dest_path = os.path.join(dest_root, name)
+            source_stat = os.stat(source_path)
+            if _files_match(source_path, dest_path, source_stat, use_hash):
+                unchanged += 1
+            else:
+                copy_file(source_path, dest_path, link)
+                copied += 1
+            key = os.path.normpath(os.path.join(rel_root, name)).replace(os.sep, "/")
+            seen[key] = {"size": source_stat.st_size, "mtime_ns": source_stat.st_mtime_ns}
+
+    if manifest is not None:
+        removed = _remove_orphans(manifest.assets, set(seen), dest_dir)
+        manifest.assets = seen
+        manifest.save()
+
+    return copied, unchanged, removed
+
+
+def fingerprint_name(key: str, digest: str) -> str:
+    """Puts the start of digest before the extension: images/tom.png becomes images/tom.3f9a2c1b.png."""
+    root, ext = posixpath.splitext(key)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def fingerprint_assets(source_dir: str, manifest: BuildManifest = None) -> dict:
+    """
+    Returns a manifest asset entry for every file under source_dir, keyed by its relative path.
+
+    Each entry has the file's size, mtime and digest, and in "url" the
+    content-addressed path its copy lives at. Files with identical content
+    share the copy named after the first of them, in sorted order. Digests
+    recorded in manifest are reused for files whose size and mtime still
+    match; everything else is hashed through one reused buffer.
+    """
+    previous = manifest.assets if manifest is not None else {}
+    buffer = bytearray(1024*1024)
+    urls = {}
+    entries = {}
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(files):
+            source_path = os.path.join(root, name)
+            key = os.path.relpath(source_path, source_dir).replace(os.sep, "/")
+            stat = os.stat(source_path)
+            old = previous.get(key)
+            if old is not None and "digest" in old and (old["size"], old["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                digest = old["digest"]
+            else:
+                digest = hash_file(source_path, buffer)
+            url = urls.setdefault(digest, fingerprint_name(key, digest))
+            entries[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest, "url": url}
+    return entries
+
+
+def sync_fingerprinted(source_dir: str, dest_dir: str, manifest_path=None, link: bool = False):
+    """
+    Copies every file in source_dir to dest_dir under a content-addressed name.
+
+    A copy's name changes whenever its content does, so it can be served
+    with an immutable cache header, and files with identical content are
+    stored once (see fingerprint_assets). A copy that already exists is
+    left alone. Every file is also synced under its own name, since URLs
+    pages aren't rewritten for, such as url() references in stylesheets,
+    still point there. When manifest_path is given the entries are
+    recorded there, and copies nothing refers to any more are removed.
+
+    Returns (urls, copied, unchanged, removed), where urls maps each
+    file's relative path to the relative path of its fingerprinted copy;
+    the counts include both kinds of copy.
+    """
+    manifest = BuildManifest.load(manifest_path) if manifest_path is not None else None
+    entries = fingerprint_assets(source_dir, manifest)
+    copied = unchanged = removed = 0
+    written = set()
+    for key, entry in entries.items():
+        source_path = os.path.join(source_dir, *key.split("/"))
+        dest_path = os.path.join(dest_dir, *key.split("/"))
+        written.add(key)
+        if _files_match(source_path, dest_path, os.stat(source_path), False):
+            unchanged += 1
+        else:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            copy_file(source_path, dest_path, link)
+            copied += 1
+
+        url = entry["url"]
+        if url in written:
+            continue
+        written.add(url)
+        dest_path = os.path.join(dest_dir, *url.split("/"))
+        try:
+            exists = os.stat(dest_path).st_size == entry["size"]
+        except FileNotFoundError:
+            exists = False
+        if exists:
+            unchanged += 1
+        else:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            copy_file(source_path, dest_path, link)
+            copied += 1
+
+    if manifest is not None:
+        removed = _remove_orphans(manifest.assets, written, dest_dir)
+        manifest.assets = entries
+        manifest.save()
+
+    return {key: entry["url"] for key, entry in entries.items()}, copied, unchanged, removed
+
+
+def _remove_orphans(old_assets: dict, outputs: set, dest_dir: str) -> int:
+    """Removes the copies recorded in old_assets that are not among outputs, and returns how many there were."""
+    removed = 0
+    old_outputs = set(old_assets)
+    old_outputs.update(entry["url"] for entry in old_assets.values() if "url" in entry)
+    for output in sorted(old_outputs - outputs):
+        orphan = os.path.join(dest_dir, *output.split("/"))
+        if os.path.lexists(orphan):
+            os.remove(orphan)
+            remove_compressed(orphan)
+            removed += 1
+            _remove_empty_parents(os.path.dirname(orphan), dest_dir)
+    return removed
+
+
+def _remove_empty_parents(directory: str, stop_at: str) -> None:
+    stop_at = os.path.abspath(stop_at)
+    directory = os.path.abspath(directory)
+    while directory != stop_at and directory.startswith(stop_at) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
@@ -0,0 +1,147 @@
+"""
+Generates synthetic content/ trees for benchmarking the build.
+
+    python3 src/corpus.py /tmp/corpus --pages 5000 --shape mixed
+"""
+import argparse
+import random
+from pathlib import Path
+
+SHAPES = ("paragraph", "list", "code", "nested", "mixed")
+
+_WORDS = (
+    "tom bombadil ring shire hobbit river forest song elf dwarf wizard road mountain "
+    "tower sword light shadow king return fellowship council gate bridge valley star"
+).split()
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(count))
+
+
+def _inline(rng: random.Random, count: int, images: int = 0, links: int = 0) -> str:
+    """A run of words with emphasis, code, links and images sprinkled in."""
+    parts = []
+    for _ in range(count):
+        roll = rng.random()
+        word = rng.choice(_WORDS)
+        if roll < 0.05:
+            parts.append(f"**{word}**")
+        elif roll < 0.10:
+            parts.append(f"_{word}_")
+        elif roll < 0.13:
+            parts.append(f"`{word}()`")
+        else:
+            parts.append(word)
+    for _ in range(links):
+        parts.insert(rng.randrange(len(parts) + 1), f"[{_words(rng, 2)}](/blog/{rng.choice(_WORDS)})")
+    for _ in range(images):
+        parts.insert(rng.randrange(len(parts) + 1), f"![{_words(rng, 2)}](/images/{rng.choice(_WORDS)}.png)")
+    return " ".join(parts)
+
+
+def _paragraph_page(rng: random.Random) -> list:
+    blocks = []
+    for _ in range(rng.randint(8, 16)):
+        blocks.append(_inline(rng, rng.randint(40, 120), links=rng.randint(0, 2)))
+        if rng.random() < 0.2:
+            blocks.append(f"## {_words(rng, 3)}")
+    return blocks
+
+
+def _list_page(rng: random.Random) -> list:
+    blocks = []
+    for _ in range(rng.randint(6, 12)):
+        items = rng.randint(5, 20)
+        if rng.random() < 0.5:
+            blocks.append("\n".join(f"- {_inline(rng, rng.randint(3, 12))}" for _ in range(items)))
+        else:
+            blocks.append("\n".join(f"{n}. {_inline(rng, rng.randint(3, 12))}" for n in range(1, items + 1)))
+        blocks.append(_inline(rng, rng.randint(10, 30)))
+    return blocks
+
+
+def _code_page(rng: random.Random) -> list:
+    blocks = []
+    for _ in range(rng.randint(6, 12)):
+        lines = [f"def {rng.choice(_WORDS)}_{n}(x):\n    return x + {n}" for n in range(rng.randint(3, 15))]
+        blocks.append("```python\n" + "\n".join(lines) + "\n```")
+        blocks.append(_inline(rng, rng.randint(10, 30)))
+    return blocks
+
+
+def _nested_page(rng: random.Random) -> list:
+    blocks = []
+    for _ in range(rng.randint(8, 16)):
+        blocks.append(_inline(rng, rng.randint(20, 60), images=rng.randint(1, 4), links=rng.randint(2, 8)))
+        if rng.random() < 0.3:
+            blocks.append("> " + _inline(rng, rng.randint(10, 30), links=1))
+    return blocks
+
+
+_PAGE_BUILDERS = {
+    "paragraph": _paragraph_page,
+    "list": _list_page,
+    "code": _code_page,
+    "nested": _nested_page,
+}
+
+
+def generate_page_markdown(rng: random.Random, shape: str) -> str:
+    if shape == "mixed":
+        shape = rng.choice(tuple(_PAGE_BUILDERS))
+    blocks = [f"# {_words(rng, 4).title()}", "[< Back Home](/)"] + _PAGE_BUILDERS[shape](rng)
+    return "\n\n".join(blocks) + "\n"
+
+
+def generate_corpus(dest_dir: Path, pages: int = 1000, shape: str = "mixed", depth: int = 2, seed: int = 0) -> list:
+    """
+    Writes pages markdown files under dest_dir and returns their paths.
+
+    Pages are spread over directories up to depth levels deep; the "nested"
+    shape goes deeper still and packs many images and links into each
+    paragraph. The same seed always produces the same corpus.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown corpus shape {shape!r}, expected one of {', '.join(SHAPES)}")
+    if shape == "nested":
+        depth *= 3
+    rng = random.Random(seed)
+    dest_dir = Path(dest_dir)
+    paths = []
+    for n in range(pages):
+        parts = [f"d{rng.randrange(8)}" for _ in range(rng.randint(0, depth))]
+        path = dest_dir.joinpath(*parts, f"page{n}", "index.md")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(generate_page_markdown(rng, shape), encoding='utf-8')
+        paths.append(path)
+    return paths
+
+
+def generate_static(dest_dir: Path, files: int = 200, size: int = 64 * 1024, seed: int = 0) -> list:
+    """Writes files random binary assets of about size bytes each under dest_dir/images."""
+    rng = random.Random(seed)
+    images = Path(dest_dir) / "images"
+    images.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for n in range(files):
+        path = images / f"image{n}.png"
+        path.write_bytes(rng.randbytes(size))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic content/ tree.")
+    parser.add_argument("dest", type=Path)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--shape", choices=SHAPES, default="mixed")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_corpus(args.dest, args.pages, args.shape, args.depth, args.seed)
+    print(f"Wrote {args.pages} {args.shape} pages to {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
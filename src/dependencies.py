@@ -0,0 +1,135 @@
+import os
+from pathlib import Path
+from urllib.parse import unquote, urljoin, urlsplit
+
+
+def add_dependencies(node, links: dict, images: dict) -> None:
+    """
+    Adds the link and image URLs found in node's tree to links and images.
+
+    Both are dicts used as ordered sets. Blocks served from the block cache
+    carry the URLs they were rendered with instead of a node tree.
+    """
+    block_links = getattr(node, "links", None)
+    if block_links is not None:
+        links.update(dict.fromkeys(block_links))
+        images.update(dict.fromkeys(node.images))
+        return
+    if node.tag == "a" and "href" in node.props:
+        links[node.props["href"]] = None
+    elif node.tag == "img" and "src" in node.props:
+        images[node.props["src"]] = None
+    for child in node.children:
+        if hasattr(child, "tag"):
+            add_dependencies(child, links, images)
+
+
+def collect_dependencies(node):
+    """Returns the (links, images) URLs in node's tree, each in order of first appearance."""
+    links, images = {}, {}
+    add_dependencies(node, links, images)
+    return list(links), list(images)
+
+
+def page_url(key: str) -> str:
+    """Root-relative URL of the page generated from the content-relative markdown path key."""
+    return "/" + key[:-len(".md")] + ".html" if key.endswith(".md") else "/" + key
+
+
+def url_target(url: str, base: str = "/"):
+    """
+    Normalizes an internal URL to the site path it points at, or returns None for external URLs.
+
+    "/blog/tom", "/blog/tom/" and "/blog/tom/index.html" all become
+    "blog/tom"; relative URLs are resolved against base. Percent-escapes
+    are decoded, so "/my%20photo.png" is the file "my photo.png".
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = urljoin(base, unquote(parts.path))
+    if path.endswith("/index.html"):
+        path = path[:-len("index.html")]
+    elif path.endswith(".html"):
+        path = path[:-len(".html")]
+    return path.strip("/")
+
+
+class DependencyGraph(object):
+    """
+    What every page depends on, and the reverse: which pages depend on a target.
+
+    Built from the links, images and template recorded per page in the build
+    manifest. Targets are site paths as returned by url_target, so a page is
+    found however it is linked. Pages and static assets of the last build
+    are the known targets; a link to anything else is broken.
+    """
+
+    def __init__(self, pages: dict, assets: dict = None):
+        self.pages = pages
+        self.targets = {}
+        for key in pages:
+            self.targets[url_target(page_url(key))] = key
+        for key in assets or ():
+            self.targets[url_target("/" + key)] = key
+        self.reverse = {}
+        self.templates = {}
+        for key, entry in pages.items():
+            base = page_url(key)
+            for url in entry.get("links", []) + entry.get("images", []):
+                target = url_target(url, base)
+                if target is not None:
+                    self.reverse.setdefault(target, set()).add(key)
+            template_path = entry.get("template_path")
+            if template_path is not None:
+                self.templates.setdefault(template_path, set()).add(key)
+
+    @classmethod
+    def from_manifest(cls, manifest):
+        return cls(manifest.pages, manifest.assets)
+
+    def dependents(self, url: str) -> set:
+        """Keys of the pages that link to or embed url."""
+        return set(self.reverse.get(url_target(url), ()))
+
+    def page_dependents(self, key: str) -> set:
+        """Keys of the pages that link to the page generated from key."""
+        return self.dependents(page_url(key))
+
+    def asset_dependents(self, key: str) -> set:
+        """Keys of the pages that link to or embed the static asset key."""
+        return self.dependents("/" + key)
+
+    def template_dependents(self, template_path) -> set:
+        return set(self.templates.get(str(template_path), ()))
+
+    def broken_links(self, dest_dir: Path = None) -> list:
+        """
+        Returns (page key, url) for every internal link or image with no page or asset behind it.
+
+        With dest_dir, a URL that resolves to a file there (one copied by
+        --clean or placed by hand) doesn't count as broken.
+        """
+        broken = []
+        for key in sorted(self.pages):
+            entry = self.pages[key]
+            base = page_url(key)
+            for url in entry.get("links", []) + entry.get("images", []):
+                target = url_target(url, base)
+                if target is None or target in self.targets:
+                    continue
+                if dest_dir is not None and _output_exists(Path(dest_dir), target):
+                    continue
+                broken.append((key, url))
+        return broken
+
+
+def _output_exists(dest_dir: Path, target: str) -> bool:
+    candidates = [target, target + ".html", os.path.join(target, "index.html")]
+    return any((dest_dir / candidate).is_file() for candidate in candidates if candidate)
+
+
+def broken_links_report(broken) -> str:
+    lines = [f"Warning: {len(broken)} broken internal link(s):"]
+    lines.extend(f"  {key}: {url}" for key, url in broken)
+    return "\n".join(lines)
@@ -0,0 +1,225 @@
+"""
+A compact document representation: one flat opcode array instead of a node tree.
+
+A Document is an array of ints and one string, the text buffer. The ops are
+
+    OPEN  tag attr_count (attr start end)*   an opening tag and its attributes
+    TEXT  start end                          the text buffer slice [start:end]
+    CLOSE tag                                a closing tag
+
+where tags and attribute names are indexes into TAGS and ATTRS, and every
+piece of text, attribute values included, is a span of the text buffer.
+A page is three objects however long it is, and serializing it is a
+single pass over the array that creates no nodes.
+
+markdown_to_document parses exactly like markdown_to_html_node, and
+Document.to_html() is byte for byte the same as the tree's to_html();
+to_html_node() converts a Document into that tree for existing callers.
+"""
+from array import array
+
+from blocktype import classify_block, BlockType
+from htmlnode import LeafNode, ParentNode
+from markdown_to_blocks import (code_text, heading_parts, iter_blocks, ordered_list_items, paragraph_text,
+                                quote_text, unordered_list_items)
+from raw_to_textnode import text_to_textnodes
+from textnode import TextType
+
+OPEN, TEXT, CLOSE = 0, 1, 2
+
+TAGS = ("div", "p", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "code", "ul", "ol", "li",
+        "b", "i", "a", "img")
+TAG_IDS = {tag: tag_id for tag_id, tag in enumerate(TAGS)}
+# Sorted, so attributes written in id order come out in the order props_to_html uses.
+ATTRS = ("alt", "href", "src")
+
+# Tags that are LeafNodes in the node tree, holding at most one text span.
+_LEAF_TAGS = frozenset(TAG_IDS[tag] for tag in ("code", "b", "i", "a", "img"))
+
+_OPEN_TAGS = tuple(f"<{tag}>" for tag in TAGS)
+_CLOSE_TAGS = tuple(f"</{tag}>" for tag in TAGS)
+
+_DIV, _P, _BLOCKQUOTE, _PRE, _CODE, _UL, _OL, _LI, _A, _IMG = (
+    TAG_IDS[tag] for tag in ("div", "p", "blockquote", "pre", "code", "ul", "ol", "li", "a", "img"))
+_ALT, _HREF, _SRC = range(3)
+_NORMAL, _LINK, _IMAGE = TextType.NORMAL, TextType.LINK, TextType.IMAGE
+_INLINE_TAGS = {TextType.BOLD: TAG_IDS["b"], TextType.ITALIC: TAG_IDS["i"], TextType.CODE: _CODE}
+
+
+class Document(object):
+    """A parsed page as a flat opcode array over a text buffer; see the module docstring."""
+
+    __slots__ = ("ops", "text")
+
+    def __init__(self, ops: array, text: str):
+        self.ops = ops
+        self.text = text
+
+    def to_html(self) -> str:
+        text = self.text
+        out = []
+        append = out.append
+        # Operands are read off the same iterator as the opcodes.
+        ops = iter(self.ops)
+        operand = ops.__next__
+        for op in ops:
+            if op == TEXT:
+                append(text[operand():operand()])
+            elif op == OPEN:
+                tag = operand()
+                attr_count = operand()
+                if not attr_count:
+                    append(_OPEN_TAGS[tag])
+                    continue
+                attrs = "".join([f' {ATTRS[operand()]}="{text[operand():operand()]}"' for _ in range(attr_count)])
+                append(f"<{TAGS[tag]}{attrs}>")
+            else:
+                append(_CLOSE_TAGS[operand()])
+        return "".join(out)
+
+    def iter_html(self):
+        yield self.to_html()
+
+    def write_html(self, fp) -> None:
+        fp.write(self.to_html())
+
+    def to_html_node(self) -> ParentNode:
+        """Builds the HTMLNode tree markdown_to_html_node would have returned."""
+        ops, text = self.ops, self.text
+        root = ParentNode("div", [])
+        stack = []
+        parent = None
+        i, end = 0, len(ops)
+        while i < end:
+            op = ops[i]
+            if op == OPEN:
+                tag, attr_count = ops[i + 1], ops[i + 2]
+                i += 3
+                props = None
+                if attr_count:
+                    props = {}
+                    for _ in range(attr_count):
+                        props[ATTRS[ops[i]]] = text[ops[i + 1]:ops[i + 2]]
+                        i += 3
+                if tag in _LEAF_TAGS:
+                    value = ""
+                    if ops[i] == TEXT:
+                        value = text[ops[i + 1]:ops[i + 2]]
+                        i += 3
+                    parent.children.append(LeafNode(TAGS[tag], value, props))
+                    i += 2  # its CLOSE
+                elif parent is None:
+                    parent = root
+                else:
+                    node = ParentNode(TAGS[tag], [], props)
+                    parent.children.append(node)
+                    stack.append(parent)
+                    parent = node
+            elif op == TEXT:
+                parent.children.append(LeafNode(None, text[ops[i + 1]:ops[i + 2]]))
+                i += 3
+            else:
+                parent = stack.pop() if stack else None
+                i += 2
+        return root
+
+
+class _Builder(object):
+    """Appends ops and text for one document."""
+
+    def __init__(self):
+        self.ops = array('i')
+        self.pieces = []
+        self.size = 0
+
+    def span(self, value: str):
+        start = self.size
+        self.pieces.append(value)
+        self.size += len(value)
+        return start, self.size
+
+    def open(self, tag: int) -> None:
+        self.ops.extend((OPEN, tag, 0))
+
+    def close(self, tag: int) -> None:
+        self.ops.extend((CLOSE, tag))
+
+    def text(self, value: str) -> None:
+        self.ops.extend((TEXT, *self.span(value)))
+
+    def inline(self, text: str) -> None:
+        # The hot loop: spans are computed inline rather than through span().
+        extend = self.ops.extend
+        append = self.pieces.append
+        start = self.size
+        for node in text_to_textnodes(text):
+            value = node.text
+            end = start + len(value)
+            text_type = node.text_type
+            if text_type is _NORMAL:
+                extend((TEXT, start, end))
+            elif text_type is _LINK:
+                url_end = end + len(node.url)
+                append(value)
+                value = node.url
+                extend((OPEN, _A, 1, _HREF, end, url_end, TEXT, start, end, CLOSE, _A))
+                end = url_end
+            elif text_type is _IMAGE:
+                url_end = end + len(node.url)
+                append(value)
+                value = node.url
+                extend((OPEN, _IMG, 2, _ALT, start, end, _SRC, end, url_end, CLOSE, _IMG))
+                end = url_end
+            elif text_type in _INLINE_TAGS:
+                tag = _INLINE_TAGS[text_type]
+                extend((OPEN, tag, 0, TEXT, start, end, CLOSE, tag))
+            else:
+                raise ValueError(f"Invalid text type: {text_type}")
+            append(value)
+            start = end
+        self.size = start
+
+    def block(self, block: str) -> None:
+        block_type, lines = classify_block(block)
+        if block_type == BlockType.PARAGRAPH:
+            self.wrap(_P, paragraph_text(block))
+        elif block_type == BlockType.HEADING:
+            level, content = heading_parts(block)
+            self.wrap(TAG_IDS[f"h{level}"], content)
+        elif block_type == BlockType.QUOTE:
+            self.wrap(_BLOCKQUOTE, quote_text(lines))
+        elif block_type == BlockType.CODE:
+            self.open(_PRE)
+            self.open(_CODE)
+            self.text(code_text(lines))
+            self.close(_CODE)
+            self.close(_PRE)
+        else:
+            tag = _UL if block_type == BlockType.UNORDERED_LIST else _OL
+            items = unordered_list_items(lines) if tag == _UL else ordered_list_items(lines)
+            self.open(tag)
+            for item in items:
+                self.wrap(_LI, item)
+            self.close(tag)
+
+    def wrap(self, tag: int, text: str) -> None:
+        self.open(tag)
+        self.inline(text)
+        self.close(tag)
+
+    def document(self) -> Document:
+        return Document(self.ops, "".join(self.pieces))
+
+
+def blocks_to_document(blocks) -> Document:
+    builder = _Builder()
+    builder.open(_DIV)
+    for block in blocks:
+        builder.block(block)
+    builder.close(_DIV)
+    return builder.document()
+
+
+def markdown_to_document(markdown: str) -> Document:
+    """Parses markdown into a Document; the flat counterpart of markdown_to_html_node."""
+    return blocks_to_document(iter_blocks(markdown.split('\n')))
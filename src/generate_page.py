@@ -1,69 +1,467 @@
+import html
+import io
 import re
 import os
+import sys
+from collections import namedtuple
+from datetime import datetime, timezone
 from pathlib import Path
-from markdown_to_blocks import markdown_to_html_node
+from blocktype import block_to_block_type, BlockType
+from markdown_to_blocks import StreamedDocument, iter_blocks, iter_file_blocks, markdown_to_html_node
+from raw_to_textnode import get_inline_backend, set_inline_backend, text_to_textnodes
+from template import Template, minify_whitespace
+from htmlnode import LeafNode
+from textnode import TextType
+from timings import StageTimer
+from build_manifest import BuildManifest, hash_bytes, hash_file, template_fingerprint
+from dependencies import collect_dependencies
+from page_writer import PageWriter, atomic_open, write_atomic
+from precompress import remove_compressed
+from search_index import collect_terms
+from shard import shard_of
+from site_files import write_site_files
+
+# Markdown files larger than this are rendered from disk block by block
+# instead of being read into memory whole.
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+_TITLE_PATTERN = re.compile(r'^#\s+(.+)', re.MULTILINE)
+
+# What write_page learned about a page while rendering it: the link and image
+# URLs it contains, its title, and its sorted search terms (None unless asked for).
+PageInfo = namedtuple("PageInfo", ["links", "images", "title", "terms"])
+
+# How generate_pages_recursive builds, besides where from and where to.
+BuildOptions = namedtuple("BuildOptions", [
+    "jobs",           # worker processes to render with; 1 renders in this one
+    "site_values",    # slot values every page shares, such as {{Nav}}
+    "timings",        # a timings.Timings to record each stage in
+    "block_cache",    # a block_cache.BlockCache for this process
+    "write_threads",  # page_writer.PageWriter threads
+    "shard",          # 1-based (index, count) of the pages to build
+    "index_terms",    # record search terms for search_index
+    "assets",         # fingerprinted asset URLs, by asset path
+    "site_url",       # record summaries and, unless sharded, write site_files
+    "minify",         # strip the template's whitespace
+    "images",         # image sizes, by image path
+], defaults=(1, None, None, None, 4, None, False, None, None, False, None))
 
 
 def extract_title(markdown: str) -> str:
     """Extracts the first level-1 heading (#) as the title."""
-    title_match = re.search(r'^#\s+(.+)', markdown, re.MULTILINE)
+    title_match = _TITLE_PATTERN.search(markdown)
     if not title_match:
         raise ValueError("Title not found in markdown. Make sure there's a '# Title' at the top.")
     return title_match.group(1).strip()
 
 
+def extract_title_from_lines(lines) -> str:
+    """extract_title over an iterable of lines, such as an open file, reading only as far as the title."""
+    lines = iter(lines)
+    for line in lines:
+        if not line.startswith("#"):
+            continue
+        chunk = [line.rstrip("\n")]
+        if not line[1:].strip():
+            # The whitespace after '#' may run over blank lines, putting the title on a later line.
+            for line in lines:
+                chunk.append(line.rstrip("\n"))
+                if line.strip():
+                    break
+        title_match = _TITLE_PATTERN.match("\n".join(chunk))
+        if title_match:
+            return title_match.group(1).strip()
+    raise ValueError("Title not found in markdown. Make sure there's a '# Title' at the top.")
+
+
+def decode_text(data: bytes) -> str:
+    """Decodes utf-8 bytes with the same newline translation as Path.read_text."""
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def extract_description(markdown: str, max_length: int = 160) -> str:
+    """Returns the plain text of the first paragraph, cut at a word boundary and escaped for an attribute."""
+    return extract_description_from_blocks(iter_blocks(markdown.split('\n')), max_length)
+
+
+def extract_description_from_blocks(blocks, max_length: int = 160) -> str:
+    """extract_description over an iterable of blocks; stops at the first paragraph."""
+    return html.escape(extract_summary_from_blocks(blocks, max_length))
+
+
+def _is_prose(node) -> bool:
+    return node.text_type not in (TextType.LINK, TextType.IMAGE) and bool(node.text.strip())
+
+
+def extract_summary_from_blocks(blocks, max_length: int = 160) -> str:
+    """
+    The plain text of the first paragraph with prose in it, cut at a word
+    boundary; extract_description before escaping. Paragraphs of nothing
+    but links and images, such as a "Back home" link, are skipped.
+    """
+    for block in blocks:
+        if block_to_block_type(block) == BlockType.PARAGRAPH:
+            nodes = text_to_textnodes(block.replace("\n", " "))
+            if not any(_is_prose(node) for node in nodes):
+                continue
+            text = "".join(node.text for node in nodes)
+            if len(text) > max_length:
+                text = text[:max_length].rsplit(" ", 1)[0].rstrip() + "\u2026"
+            return text
+    return ""
+
+
+def page_summary(md_path: Path, markdown_content: str = None) -> str:
+    """extract_summary_from_blocks for a page, read from disk only if its markdown isn't given."""
+    if markdown_content is not None:
+        return extract_summary_from_blocks(iter_blocks(markdown_content.split('\n')))
+    blocks = iter_file_blocks(md_path)
+    try:
+        return extract_summary_from_blocks(blocks)
+    finally:
+        blocks.close()
+
+
+def format_date(mtime: float) -> str:
+    return datetime.fromtimestamp(mtime, tz=timezone.utc).date().isoformat()
+
+
+def compile_template(template, basepath: str = "/") -> Template:
+    """Accepts either template source or an already compiled Template."""
+    if isinstance(template, Template):
+        return template
+    return Template(template, basepath)
+
+
+def _prepare_page(markdown_content: str, template: Template, values: dict = None, timer=None, cache=None):
+    """Parses the page and collects the values for every slot the template uses."""
+    html_node = markdown_to_html_node(markdown_content, timer, cache)
+    page_values = dict(values) if values else {}
+    page_values["Title"] = extract_title(markdown_content)
+    if "Description" in template.slots and "Description" not in page_values:
+        page_values["Description"] = extract_description(markdown_content)
+    return html_node, page_values
+
+
+def stream_page(markdown_content: str, template, fp, basepath: str = "/", values: dict = None) -> None:
+    """
+    Renders markdown into the template and writes it to fp fragment by fragment.
+
+    The template head, the content and the template tail are written in turn,
+    so the finished page is never held in memory as a single string. template
+    may be source text or a compiled Template; values supplies extra slots
+    such as Date or Nav.
+    """
+    template = compile_template(template, basepath)
+    html_node, page_values = _prepare_page(markdown_content, template, values)
+    template.write(fp, html_node, page_values)
+
+
+def render_page(markdown_content: str, template, basepath: str = "/", values: dict = None) -> str:
+    """Renders markdown into the template and rewrites root-relative URLs to the basepath."""
+    buffer = io.StringIO()
+    stream_page(markdown_content, template, buffer, basepath, values)
+    return buffer.getvalue()
+
+
 def generate_page(from_path: Path, template_path: Path, dest_path: Path, basepath: str = "/") -> None:
     """Generates an HTML page from a markdown file using a template."""
-    print(f"Generating page from {from_path} to {dest_path} using template {template_path}")
-
     markdown_content = from_path.read_text(encoding='utf-8')
-    template_content = template_path.read_text(encoding='utf-8')
+    template = Template.from_file(template_path, basepath)
 
-    html_node = markdown_to_html_node(markdown_content)
-    html_string = html_node.to_html()
-    title = extract_title(markdown_content)
+    write_page(markdown_content, template, dest_path, basepath, {"Date": format_date(from_path.stat().st_mtime)})
 
-    if "{{Title}}" not in template_content or "{{Content}}" not in template_content:
-        raise ValueError("Template missing {{Title}} or {{Content}} placeholder")
 
-    final_html = (
-        template_content
-        .replace("{{Title}}", title)
-        .replace("{{Content}}", html_string)
-        .replace('href="/', f'href="{basepath}')
-        .replace('src="/', f'src="{basepath}')
-    )
+def write_page(markdown_content: str, template, dest_path: Path, basepath: str = "/", values: dict = None, timer=None, cache=None, writer=None, index_terms: bool = False):
+    """
+    Renders a page into dest_path, creating parent directories as needed.
 
+    Returns a PageInfo, with search terms if index_terms is set. The page is streamed
+    into a temporary file that replaces dest_path once complete, or, with a
+    page_writer.PageWriter, streamed through the writer, which leaves an
+    unchanged page alone. With a timings.StageTimer the page is serialized,
+    templated and written in separate steps so each can be timed, instead
+    of being streamed.
+    cache is an optional block_cache.BlockCache of rendered blocks; to index
+    terms through it, its index_terms must be set too.
+    """
+    template = compile_template(template, basepath)
+    html_node, page_values = _prepare_page(markdown_content, template, values, timer, cache)
+    terms = collect_terms(html_node) if index_terms else None
+    if timer is not None:
+        with timer.stage("serialize"):
+            content = LeafNode(None, html_node.to_html())
+        with timer.stage("template"):
+            final_html = template.render(content, page_values)
+        with timer.stage("write"):
+            if writer is not None:
+                with writer.open(dest_path) as fp:
+                    fp.write(final_html)
+            else:
+                dest_path.parent.mkdir(parents=True, exist_ok=True)
+                write_atomic(dest_path, final_html.encode('utf-8'))
+                remove_compressed(dest_path)
+        return PageInfo(*collect_dependencies(html_node), page_values["Title"], terms)
+
+    if writer is not None:
+        with writer.open(dest_path) as fp:
+            template.write(fp, html_node, page_values)
+    else:
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_open(dest_path) as fp:
+            template.write(fp, html_node, page_values)
+        remove_compressed(dest_path)
+    return PageInfo(*collect_dependencies(html_node), page_values["Title"], terms)
+
+
+def stream_markdown_file(md_path: Path, template, dest_path: Path, basepath: str = "/", values: dict = None, timer=None, cache=None, index_terms: bool = False):
+    """
+    Renders the markdown file at md_path into dest_path without reading it whole.
+
+    The file is scanned once for the title (and the description, if the
+    template uses it) and then again as it is rendered, one block at a time,
+    so memory use depends on the largest block rather than the file size.
+    The page is written to a temporary file that only replaces dest_path once
+    it is complete. With a timings.StageTimer the render is recorded as
+    "stream". Returns a PageInfo, like write_page.
+    """
+    template = compile_template(template, basepath)
+    page_values = dict(values) if values else {}
+    with open(md_path, encoding='utf-8') as f:
+        page_values["Title"] = extract_title_from_lines(f)
+    if "Description" in template.slots and "Description" not in page_values:
+        blocks = iter_file_blocks(md_path)
+        try:
+            page_values["Description"] = extract_description_from_blocks(blocks)
+        finally:
+            blocks.close()
+
+    content = StreamedDocument(lambda: iter_file_blocks(md_path), cache, index_terms)
     dest_path.parent.mkdir(parents=True, exist_ok=True)
-    dest_path.write_text(final_html, encoding='utf-8')
+    with atomic_open(dest_path) as fp:
+        if timer is not None:
+            with timer.stage("stream"):
+                template.write(fp, content, page_values)
+        else:
+            template.write(fp, content, page_values)
+    remove_compressed(dest_path)
+    terms = sorted(content.terms) if index_terms else None
+    return PageInfo(list(content.links), list(content.images), page_values["Title"], terms)
+
+
+def page_values(template: Template, stat: os.stat_result, site_values: dict) -> dict:
+    """Slot values for one page that don't come from its markdown."""
+    values = dict(site_values)
+    if "Date" in template.slots:
+        values["Date"] = format_date(stat.st_mtime)
+    return values
+
+
+# Set once per worker process by _init_worker so the template is pickled per
+# worker rather than per page.
+_worker_state = {}
+
+
+def _init_worker(template: Template, timed: bool = False, inline_backend: str = "scanner", index_terms: bool = False) -> None:
+    set_inline_backend(inline_backend)
+    _worker_state["template"] = template
+    _worker_state["timed"] = timed
+    _worker_state["index_terms"] = index_terms
+    # Worker processes already overlap rendering with writing, so each writes synchronously.
+    _worker_state["writer"] = PageWriter(workers=0)
+
+
+def _try_write_page(job, template: Template, timed: bool = False, cache=None, writer=None, index_terms: bool = False, md_bytes: bytes = None):
+    """
+    Writes one page and returns (error, spans, info, summary).
+
+    job is (md_path, dest_path, values, streamed, summarize); the markdown is
+    read from md_path unless md_bytes already holds it, and its summary is
+    only extracted if summarize is set. The error is a message rather than
+    an exception so one bad page doesn't abort the batch; spans are the
+    page's stage timings when timed is set, and info the PageInfo of a page
+    that was written.
+    """
+    md_path, dest_path, values, streamed, summarize = job
+    timer = StageTimer() if timed else None
+    summary = None
+    try:
+        if streamed:
+            info = stream_markdown_file(md_path, template, dest_path, template.basepath, values, timer, cache,
+                                        index_terms)
+            markdown_content = None
+        else:
+            if md_bytes is None:
+                if timer is not None:
+                    with timer.stage("read"):
+                        md_bytes = md_path.read_bytes()
+                else:
+                    md_bytes = md_path.read_bytes()
+            markdown_content = decode_text(md_bytes)
+            info = write_page(markdown_content, template, dest_path, template.basepath, values, timer, cache,
+                              writer, index_terms)
+        if summarize:
+            summary = page_summary(md_path, markdown_content)
+    except Exception as e:
+        return f"{md_path}: {type(e).__name__}: {e}", None, None, None
+    return None, (os.getpid(), timer.spans) if timer is not None else None, info, summary
+
 
+def _build_page_job(job):
+    """Process-pool entry point."""
+    return _try_write_page(job, _worker_state["template"], _worker_state["timed"], None, _worker_state["writer"],
+                           _worker_state["index_terms"])
 
 
-def generate_pages_recursive(dir_path_content: Path, template_path: Path, dest_dir_path: Path, basepath: str = "/"):
-    template_content = template_path.read_text(encoding='utf-8')
+def _read_page(md_path: Path, keep: bool, buffer: bytearray = None) -> tuple:
+    """Returns (markdown bytes, hash) of a page, or (None, hash) without holding the file if keep isn't set."""
+    if not keep:
+        return None, hash_file(md_path, buffer)
+    md_bytes = md_path.read_bytes()
+    return md_bytes, hash_bytes(md_bytes)
 
-    for root, _, files in os.walk(dir_path_content):
-        for file in files:
+
+def find_markdown_files(dir_path_content: Path) -> list:
+    """Returns every .md file under dir_path_content in a stable, sorted order."""
+    md_paths = []
+    for root, dirs, files in os.walk(dir_path_content):
+        dirs.sort()
+        for file in sorted(files):
             if file.endswith('.md'):
-                md_path = Path(root) / file
-                relative_path = md_path.relative_to(dir_path_content)
-                dest_path = dest_dir_path / relative_path.with_suffix('.html')
-
-                md_content = md_path.read_text(encoding='utf-8')
-                html_node = markdown_to_html_node(md_content)
-                html_string = html_node.to_html()
-                title = extract_title(md_content)
-
-                if "{{Title}}" not in template_content or "{{Content}}" not in template_content:
-                    raise ValueError("Template missing {{Title}} or {{Content}} placeholder")
-
-                final_html = (
-                    template_content
-                    .replace("{{Title}}", title)
-                    .replace("{{Content}}", html_string)
-                    .replace('href="/', f'href="{basepath}')
-                    .replace('src="/', f'src="{basepath}')
-                )
+                md_paths.append(Path(root) / file)
+    return md_paths
 
-                dest_path.parent.mkdir(parents=True, exist_ok=True)
-                dest_path.write_text(final_html, encoding='utf-8')
+
+def generate_pages_recursive(dir_path_content: Path, template_path: Path, dest_dir_path: Path, basepath: str = "/", manifest_path: Path = None, options: BuildOptions = None, **overrides):
+    """
+    Generates an HTML page for every markdown file under dir_path_content.
+
+    With manifest_path, the inputs of every page are recorded there (see
+    build_manifest.BuildManifest) and pages whose inputs are unchanged are
+    skipped; the outputs of removed sources are deleted, along with their
+    precompressed copies. options is a BuildOptions, and keyword arguments
+    override its fields.
+
+    Pages are dispatched and recorded in sorted source order, and every page
+    that fails is reported with its source path before a ValueError is raised.
+    """
+    options = (options if options is not None else BuildOptions())._replace(**overrides)
+    jobs, site_values, timings, block_cache, write_threads, shard, index_terms, assets, site_url, minify, images = options
+    template_bytes = template_path.read_bytes()
+    template_source = decode_text(template_bytes)
+    if minify:
+        template_source = minify_whitespace(template_source)
+    template = Template(template_source, basepath, assets, images)
+    site_values = dict(site_values) if site_values else {}
+    template_hash = template_fingerprint(template_bytes, site_values, assets, minify, images)
+    manifest = BuildManifest.load(manifest_path) if manifest_path is not None else None
+    seen = set()
+    pending = []
+    timed = timings is not None
+    timer = StageTimer() if timed else None
+    if index_terms and block_cache is not None:
+        block_cache.index_terms = True
+
+    if timed:
+        with timer.stage("walk"):
+            md_paths = find_markdown_files(dir_path_content)
+        timings.add_spans(timer.spans)
+    else:
+        md_paths = find_markdown_files(dir_path_content)
+    if shard is not None:
+        index, count = shard
+        md_paths = [md_path for md_path in md_paths
+                    if shard_of(md_path.relative_to(dir_path_content).as_posix(), count) == index]
+
+    # With jobs > 1 the hashing loop only collects what each stale page's
+    # worker needs to read and render it; otherwise each page is rendered as
+    # soon as it is found stale, while its markdown is still in hand.
+    inline = jobs <= 1
+    results = []
+    buffer = None if inline else bytearray(1024*1024)
+    if block_cache is not None:
+        block_cache.workers = 0
+    writer = PageWriter(workers=write_threads)
+    try:
+        for md_path in md_paths:
+            relative_path = md_path.relative_to(dir_path_content)
+            dest_path = dest_dir_path / relative_path.with_suffix('.html')
+            key = relative_path.as_posix()
+            seen.add(key)
+
+            stat = md_path.stat()
+            if index_terms and manifest is not None and manifest.pages.get(key, {}).get("terms") is None:
+                manifest.pages.pop(key, None)
+            if site_url is not None and manifest is not None and manifest.pages.get(key, {}).get("summary") is None:
+                manifest.pages.pop(key, None)
+            if manifest is not None and manifest.page_is_fresh(key, stat, template_hash, basepath, dest_path, None,
+                                                               assets, images):
+                continue
+
+            streamed = stat.st_size > STREAM_THRESHOLD
+            if timed:
+                with timings.stage("read", page=key):
+                    md_bytes, md_hash = _read_page(md_path, inline and not streamed, buffer)
+            else:
+                md_bytes, md_hash = _read_page(md_path, inline and not streamed, buffer)
+            if manifest is not None and manifest.page_is_fresh(key, stat, template_hash, basepath, dest_path, md_hash,
+                                                               assets, images):
+                manifest.touch_page(key, stat)
+                continue
+
+            job = (md_path, dest_path, page_values(template, stat, site_values), streamed, site_url is not None)
+            pending.append((key, stat, md_hash, job))
+            if inline:
+                results.append(_try_write_page(job, template, timed, block_cache, writer, index_terms, md_bytes))
+
+        page_jobs = [job for *_, job in pending]
+        pooled = not inline and len(page_jobs) > 1
+        if pooled:
+            from concurrent.futures import ProcessPoolExecutor
+
+            if block_cache is not None:
+                block_cache.workers = jobs
+            chunksize = max(1, len(page_jobs) // (jobs * 4))
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                     initargs=(template, timed, get_inline_backend(), index_terms)) as executor:
+                results = list(executor.map(_build_page_job, page_jobs, chunksize=chunksize))
+        elif not inline:
+            results = [_try_write_page(job, template, timed, block_cache, writer, index_terms) for job in page_jobs]
+    finally:
+        write_errors = dict(writer.close())
+    for index, (md_path, dest_path, *_) in enumerate(page_jobs):
+        if dest_path in write_errors:
+            e = write_errors[dest_path]
+            results[index] = (f"{md_path}: {type(e).__name__}: {e}", None, None, None)
+
+    errors = []
+    # What the site files need of each page, when there is no manifest to keep it in.
+    site_pages = {}
+    for (key, stat, md_hash, (_, dest_path, *_)), (error, spans, info, summary) in zip(pending, results):
+        if spans is not None:
+            pid, page_spans = spans
+            timings.add_spans(page_spans, page=key, pid=pid)
+        if error is not None:
+            errors.append(error)
+        elif manifest is not None:
+            manifest.record_page(key, stat, md_hash, template_hash, basepath, dest_path, info.links, info.images,
+                                 template_path, info.title, info.terms, summary, assets, images)
+        else:
+            site_pages[key] = {"title": info.title, "dest": str(dest_path), "mtime_ns": stat.st_mtime_ns,
+                               "summary": summary}
+
+    if manifest is not None:
+        for stale_dest in manifest.prune_pages(seen):
+            if stale_dest.exists():
+                stale_dest.unlink()
+            remove_compressed(stale_dest)
+        manifest.save()
+    if site_url is not None and shard is None:
+        write_site_files(manifest.pages if manifest is not None else site_pages, dest_dir_path, site_url, basepath)
+    if block_cache is not None and block_cache.path is not None and not pooled:
+        block_cache.save()
+
+    if errors:
+        for error in errors:
+            print(f"Error generating page {error}", file=sys.stderr)
+        raise ValueError(f"{len(errors)} page(s) failed to generate:\n" + "\n".join(errors))
@@ -1,24 +1,51 @@
+from types import MappingProxyType
+
+# Shared by every node created without props. Read-only so that one node
+# can't leak attributes into all the others.
+EMPTY_PROPS = MappingProxyType({})
 
 
 class HTMLNode(object):
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
         self.children = children if children is not None else []
-        self.props = props if props is not None else {}
+        self.props = props if props is not None else EMPTY_PROPS
 
     def to_html(self):
         raise NotImplementedError("Subclasses should implement this method")
+
+    def iter_html(self):
+        """Yields the HTML for this node in fragments, in document order."""
+        yield self.to_html()
+
+    def write_html(self, fp):
+        """Streams the HTML for this node to a writable text file without building it as one string."""
+        write = fp.write
+        for fragment in self.iter_html():
+            write(fragment)
     
     def props_to_html(self):
+        if not self.props:
+            return ""
         return "".join(f' {key}="{value}"' for key, value in sorted(self.props.items()))
         
     def __repr__(self):
         return f"HTMLNode(tag={self.tag}, value={self.value}, children={self.children}, props={self.props})"
     
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
+    # Leaves never have children; the class attribute shadows the slot so no
+    # per-instance list is ever allocated.
+    children = ()
+
     def __init__(self, tag, value, props=None):
-        super().__init__(tag=tag, value=value, props=props)
+        self.tag = tag
+        self.value = value
+        self.props = props if props is not None else EMPTY_PROPS
 
     def to_html(self):
         if self.value is None:
@@ -30,8 +57,13 @@ class LeafNode(HTMLNode):
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>" 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children=None, props=None):
-        super().__init__(tag=tag, children=children if children is not None else [], props=props)
+        self.tag = tag
+        self.value = None
+        self.children = children if children is not None else []
+        self.props = props if props is not None else EMPTY_PROPS
 
     def add_child(self, child):
         self.children.append(child)
@@ -42,13 +74,31 @@ class ParentNode(HTMLNode):
         if not self.children:
             print("Warning: ParentNode has no children")
 
-        children_html = ""
+        children_html = "".join(_child_fragments(self.children))
+        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
+
+    def iter_html(self):
+        if self.tag is None:
+            raise ValueError("ParentNode must have a tag")
+        if not self.children:
+            print("Warning: ParentNode has no children")
+
+        yield f"<{self.tag}{self.props_to_html()}>"
         for child in self.children:
-            if hasattr(child, 'to_html'):
-                children_html += child.to_html()
+            if hasattr(child, 'iter_html'):
+                yield from child.iter_html()
             elif hasattr(child, 'text'):
-                children_html += child.text
+                yield child.text
             else:
-                children_html += str(child)
+                yield str(child)
+        yield f"</{self.tag}>"
 
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
+
+def _child_fragments(children):
+    for child in children:
+        if hasattr(child, 'to_html'):
+            yield child.to_html()
+        elif hasattr(child, 'text'):
+            yield child.text
+        else:
+            yield str(child)
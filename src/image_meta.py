@@ -0,0 +1,185 @@
+import json
+import os
+import struct
+from pathlib import Path
+
+# Bump whenever read_image_size changes so sizes read by an older version are read again.
+IMAGE_META_VERSION = 1
+
+# Files whose headers are read; the format itself is told by signature, not by name.
+IMAGE_SUFFIXES = frozenset((".png", ".jpg", ".jpeg", ".gif"))
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers, which carry the image size. C4, C8 and CC
+# share the range but are tables and extensions.
+_JPEG_SOF_MARKERS = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+# Markers with no length or payload after them.
+_JPEG_STANDALONE_MARKERS = frozenset((0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8))
+_EXIF_ORIENTATION_TAG = 0x0112
+
+
+def read_image_size(path):
+    """
+    Returns the (width, height) of a PNG, GIF or JPEG file, or None if it is
+    none of those or its header is cut short.
+
+    Only the header is read: the first 24 bytes of a PNG or GIF, and the
+    segments of a JPEG up to its start-of-frame, skipping everything else.
+    JPEGs that are stored rotated by a quarter turn, as EXIF orientations
+    5 to 8 say, have their width and height swapped, as browsers show them.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(24)
+        if header.startswith(_PNG_SIGNATURE) and header[12:16] == b"IHDR":
+            return struct.unpack(">II", header[16:24])
+        if header[:6] in (b"GIF87a", b"GIF89a") and len(header) >= 10:
+            return struct.unpack("<HH", header[6:10])
+        if header.startswith(b"\xff\xd8"):
+            f.seek(2)
+            return _jpeg_size(f)
+    return None
+
+
+def _jpeg_size(f):
+    rotated = False
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9:  # end of image
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in _JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return (height, width) if rotated else (width, height)
+        if marker == 0xE1:  # APP1, where EXIF lives
+            rotated = _exif_orientation(f.read(length - 2)) in (5, 6, 7, 8) or rotated
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def _exif_orientation(segment: bytes):
+    """The orientation in an APP1 segment's EXIF data, or None."""
+    if not segment.startswith(b"Exif\0\0"):
+        return None
+    tiff = segment[6:]
+    order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+    if order is None or len(tiff) < 8:
+        return None
+    offset = struct.unpack(order + "I", tiff[4:8])[0]
+    if offset + 2 > len(tiff):
+        return None
+    count = struct.unpack(order + "H", tiff[offset:offset + 2])[0]
+    for entry in range(offset + 2, min(offset + 2 + count * 12, len(tiff) - 11), 12):
+        tag, _, _, value = struct.unpack(order + "HHIH", tiff[entry:entry + 10])
+        if tag == _EXIF_ORIENTATION_TAG:
+            return value
+    return None
+
+
+def _read_size_or_none(path):
+    try:
+        return read_image_size(path)
+    except OSError:
+        return None
+
+
+class ImageMetadata(object):
+    """
+    Persistent index of the pixel size of every image under the static directory.
+
+    Entries are keyed by the image's path relative to that directory and
+    keep the file's size and mtime next to its width and height (both None
+    if the header could not be read), so unchanged images are never opened
+    again, like static assets in the build manifest.
+    """
+
+    def __init__(self, path=None, entries=None):
+        self.path = Path(path) if path is not None else None
+        self.entries = entries if entries is not None else {}
+        self.changed = False
+
+    @classmethod
+    def load(cls, path):
+        """Loads the index from disk, returning an empty one if it is missing, unreadable or outdated."""
+        try:
+            data = json.loads(Path(path).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != IMAGE_META_VERSION:
+            return cls(path)
+        return cls(path, data.get("images", {}))
+
+    def save(self, path=None):
+        """Writes the index atomically, like BuildManifest.save."""
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("ImageMetadata has no path to save to")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        data = {"version": IMAGE_META_VERSION, "images": self.entries}
+        tmp_path.write_text(json.dumps(data, indent=1, sort_keys=True), encoding='utf-8')
+        os.replace(tmp_path, path)
+        self.changed = False
+
+    def sizes(self) -> dict:
+        """Maps the key of every image with a known size to its (width, height)."""
+        return {key: (entry["width"], entry["height"]) for key, entry in self.entries.items()
+                if entry["width"] is not None}
+
+    def scan(self, static_dir, workers: int = 4) -> dict:
+        """
+        Brings the index up to date with the images under static_dir and returns sizes().
+
+        Images whose size and mtime match their entry are skipped; the
+        headers of all the others are read as one batch on a pool of
+        workers threads, which spend their time waiting on the disk.
+        """
+        seen = {}
+        stale = []
+        for root, dirs, files in os.walk(static_dir):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() not in IMAGE_SUFFIXES:
+                    continue
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, static_dir).replace(os.sep, "/")
+                stat = os.stat(path)
+                seen[key] = (stat.st_size, stat.st_mtime_ns)
+                entry = self.entries.get(key)
+                if entry is None or (entry["size"], entry["mtime_ns"]) != seen[key]:
+                    stale.append((key, path))
+
+        if stale:
+            if workers > 1 and len(stale) > 1:
+                from concurrent.futures import ThreadPoolExecutor
+
+                with ThreadPoolExecutor(max_workers=min(workers, len(stale))) as executor:
+                    sizes = list(executor.map(_read_size_or_none, [path for _, path in stale]))
+            else:
+                sizes = [_read_size_or_none(path) for _, path in stale]
+            for (key, _), size in zip(stale, sizes):
+                width, height = size if size is not None else (None, None)
+                self.entries[key] = {"size": seen[key][0], "mtime_ns": seen[key][1], "width": width, "height": height}
+            self.changed = True
+
+        for key in set(self.entries) - set(seen):
+            del self.entries[key]
+            self.changed = True
+        return self.sizes()
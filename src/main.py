@@ -1,30 +1,358 @@
-from copy_static import copy_directory_contents
-from generate_page import generate_pages_recursive
+# Only what parsing arguments and the up-to-date check need is imported here.
+# The renderer and everything else are imported where they are used, so a
+# build with nothing to do exits before paying for them (see test_startup.py).
+from build_manifest import BuildManifest, template_fingerprint
+from shard import merge_shard_manifests, parse_shard, shard_manifest_path
 from pathlib import Path
-import sys
+import argparse
+import os
 
+CONTENT_DIR = Path("content")
+STATIC_DIR = Path("static")
+TEMPLATE_PATH = Path("template.html")
+DEST_DIR = Path("docs")
+MANIFEST_PATH = Path(".build-manifest.json")
+BLOCK_CACHE_PATH = Path(".block-cache.json")
+SEARCH_DIR = DEST_DIR / "search"
+SEARCH_STATE_PATH = Path(".search-index.json")
+IMAGE_META_PATH = Path(".image-meta.json")
+# site_files.PAGE_INDEX_NAME, which is not imported before there is work to do.
+PAGE_INDEX_PATH = DEST_DIR / "pages.json"
 
-def main():
-    source_directory = Path('static')
-    destination_directory = Path('docs')
 
-    print("Copying static assets...")
-    copy_directory_contents(source_directory, destination_directory)
-    print("Static assets copied.")
+def _shard_arg(value: str):
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
-    # Read basepath from command-line args, default to "/"
-    basepath = sys.argv[1] if len(sys.argv) > 1 else "/"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site from content/ into docs/.")
+    parser.add_argument("basepath", nargs="?", default="/", help="URL prefix the site is served under (default: /)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                        help="render pages with N worker processes (0 = one per CPU)")
+    parser.add_argument("--write-threads", type=int, default=4, metavar="N",
+                        help="write pages on N background threads while rendering continues "
+                             "(default: 4, 0 = inline)")
+    parser.add_argument("--clean", action="store_true",
+                        help="wipe docs/ and recopy every static asset instead of syncing changes")
+    parser.add_argument("--hash", action="store_true",
+                        help="compare static assets by content hash when their mtimes differ")
+    parser.add_argument("--link", action="store_true",
+                        help="hardlink static assets into docs/ where the filesystem allows it")
+    parser.add_argument("--fingerprint-assets", action="store_true",
+                        help="copy static assets under content-addressed names (images/tom.3f9a2c1b.png), "
+                             "storing identical files once, and point pages at them")
+    parser.add_argument("--inline-backend", default=None, metavar="NAME",
+                        help="inline markdown parser, scanner or regex; all give identical output (default: scanner, "
+                             "or $SSG_INLINE_BACKEND)")
+    parser.add_argument("--block-cache", type=int, default=32, metavar="MB",
+                        help="keep up to MB megabytes of rendered blocks in memory (0 = off, default: 32)")
+    parser.add_argument("--block-cache-file", action="store_true",
+                        help="keep the block cache in .block-cache.json between builds")
+    parser.add_argument("--minify", action="store_true",
+                        help="strip the template's insignificant whitespace from every page")
+    parser.add_argument("--precompress", action="store_true",
+                        help="write .gz copies (and .br with the brotli package) next to every generated page and "
+                             "static asset, compressing only those that changed")
+    parser.add_argument("--image-sizes", action="store_true",
+                        help="read the size of every PNG, JPEG and GIF in static/ from its header, caching it in "
+                             ".image-meta.json, and give img tags width, height, loading=\"lazy\" and "
+                             "decoding=\"async\"")
+    parser.add_argument("--search", action="store_true",
+                        help="also write a client-side search index to docs/search/, updating only changed pages")
+    parser.add_argument("--site-url", default=None, metavar="URL",
+                        help="absolute URL the site is published at, such as https://example.com; also writes "
+                             "sitemap.xml, an RSS feed of content/blog/ (feed.xml) and a page index (pages.json) "
+                             "to docs/, updating them from the build manifest")
+    parser.add_argument("--shard", type=_shard_arg, default=None, metavar="i/N",
+                        help="build only shard i of N (1-based), partitioned by a stable hash of each page's path; "
+                             "shard 1 also syncs static assets")
+    parser.add_argument("--merge-shards", type=int, default=None, metavar="N",
+                        help="instead of building, merge the manifests of shards 1..N and check them for conflicts")
+    parser.add_argument("--watch", action="store_true",
+                        help="after building, serve docs/ locally and rebuild pages as their sources change")
+    parser.add_argument("--port", type=int, default=8888, help="port for --watch to serve on (default: 8888)")
+    parser.add_argument("--timings", type=int, nargs="?", const=10, default=None, metavar="N",
+                        help="print time and call counts per build stage and the N slowest pages (default N: 10)")
+    parser.add_argument("--trace", type=Path, default=None, metavar="FILE",
+                        help="write per-stage timings as Chrome trace-event JSON")
+    parser.add_argument("--profile", type=Path, default=None, metavar="FILE",
+                        help="run the build under cProfile and dump the stats to FILE (main process only)")
+    args = parser.parse_args(argv)
+    if args.fingerprint_assets and args.watch:
+        parser.error("--fingerprint-assets can't be combined with --watch")
+    if args.image_sizes and args.watch:
+        parser.error("--image-sizes can't be combined with --watch")
+    if args.site_url is not None and "://" not in args.site_url:
+        parser.error(f"argument --site-url: expected an absolute URL such as https://example.com, got {args.site_url!r}")
+    if args.inline_backend is not None:
+        from raw_to_textnode import INLINE_BACKENDS
+        if args.inline_backend not in INLINE_BACKENDS:
+            parser.error(f"argument --inline-backend: invalid choice: {args.inline_backend!r} "
+                         f"(choose from {', '.join(sorted(INLINE_BACKENDS))})")
+    return args
+
+
+def copy_static_assets(args, source_directory: Path, destination_directory: Path, manifest_path: Path):
+    """Copies or syncs the static assets, and returns the fingerprinted asset URLs with --fingerprint-assets."""
+    from copy_static import clear_directory, copy_directory_contents, sync_directory, sync_fingerprinted
+
+    if args.fingerprint_assets:
+        if args.clean and destination_directory.exists():
+            clear_directory(destination_directory)
+        print("Fingerprinting static assets...")
+        assets, copied, unchanged, removed = sync_fingerprinted(source_directory, destination_directory,
+                                                                manifest_path, link=args.link)
+        print(f"Static assets fingerprinted: {copied} copied, {unchanged} unchanged, {removed} removed, "
+              f"{len(assets) - len(set(assets.values()))} duplicate(s) stored once.")
+        return assets
+    if args.clean:
+        print("Copying static assets...")
+        copy_directory_contents(source_directory, destination_directory)
+        print("Static assets copied.")
+    else:
+        print("Syncing static assets...")
+        copied, unchanged, removed = sync_directory(source_directory, destination_directory, manifest_path,
+                                                    use_hash=args.hash, link=args.link)
+        print(f"Static assets synced: {copied} copied, {unchanged} unchanged, {removed} removed.")
+
+
+def build_is_current(args, basepath: str) -> bool:
+    """
+    True if the manifest shows that nothing changed since the last build, so
+    the build can be skipped. --clean, sharded builds and timed or profiled
+    builds always run.
+    """
+    if args.clean or args.shard is not None:
+        return False
+    if args.timings is not None or args.trace is not None or args.profile is not None:
+        return False
+    manifest = BuildManifest.load(MANIFEST_PATH)
+    if not manifest.pages:
+        return False
+    if args.search and not (SEARCH_STATE_PATH.exists() and (SEARCH_DIR / "pages.json").exists()):
+        return False
+    if args.site_url is not None and not site_files_current(manifest, args.site_url):
+        return False
+    assets = None
+    if args.fingerprint_assets:
+        assets = {key: entry.get("url") for key, entry in manifest.assets.items()}
+    images = None
+    if args.image_sizes:
+        from image_meta import ImageMetadata
+        # Without the index the sizes are unknown rather than none.
+        if not IMAGE_META_PATH.exists():
+            return False
+        images = ImageMetadata.load(IMAGE_META_PATH).sizes()
+    template_hash = template_fingerprint(TEMPLATE_PATH.read_bytes(), {}, assets, args.minify, images)
+    if not manifest.is_up_to_date(CONTENT_DIR, DEST_DIR, template_hash, basepath, STATIC_DIR,
+                                  require_terms=args.search, fingerprinted=args.fingerprint_assets, images=images):
+        return False
+    if args.precompress:
+        from precompress import is_compressible, is_current
+        return all(is_current(path) for path in output_paths(args, manifest) if is_compressible(path))
+    return True
+
+
+def site_files_current(manifest: BuildManifest, site_url: str) -> bool:
+    """True if every page has a recorded summary and the site files were last written for site_url."""
+    import json
+
+    if any(entry.get("summary") is None for entry in manifest.pages.values()):
+        return False
+    try:
+        data = json.loads(PAGE_INDEX_PATH.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    return data.get("site_url") == site_url.rstrip("/")
+
+
+def build(args, basepath: str, timings=None) -> None:
+    from block_cache import BlockCache
+    from generate_page import BuildOptions, generate_pages_recursive
+
+    manifest_path = MANIFEST_PATH
+    if args.shard is not None:
+        manifest_path = shard_manifest_path(MANIFEST_PATH, *args.shard)
+        print(f"Building shard {args.shard[0]}/{args.shard[1]} into {DEST_DIR}, manifest {manifest_path}")
+
+    # Image headers are read on other threads while the static assets are synced.
+    image_scan = start_image_scan() if args.image_sizes else None
+
+    assets = None
+    if args.shard is not None and args.shard[0] != 1:
+        print("Static assets are synced by shard 1.")
+        if args.fingerprint_assets:
+            from copy_static import fingerprint_assets
+            assets = {key: entry["url"] for key, entry in fingerprint_assets(STATIC_DIR).items()}
+    elif timings is not None:
+        with timings.stage("static_copy"):
+            assets = copy_static_assets(args, STATIC_DIR, DEST_DIR, manifest_path)
+    else:
+        assets = copy_static_assets(args, STATIC_DIR, DEST_DIR, manifest_path)
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+
+    images = None
+    if image_scan is not None:
+        images = image_scan.result()
+        print(f"Image sizes: {len(images)} image(s) in {STATIC_DIR}")
+
+    block_cache = None
+    if args.block_cache > 0 and args.block_cache_file:
+        block_cache = BlockCache.load(BLOCK_CACHE_PATH, args.block_cache * 1024 * 1024)
+    elif args.block_cache > 0:
+        block_cache = BlockCache(args.block_cache * 1024 * 1024)
+
+    print (f"Generating pages from {CONTENT_DIR} to {DEST_DIR} using {TEMPLATE_PATH}")
+    options = BuildOptions(jobs=jobs, timings=timings, block_cache=block_cache, write_threads=args.write_threads,
+                           shard=args.shard, index_terms=args.search, assets=assets, site_url=args.site_url,
+                           minify=args.minify, images=images)
+    generate_pages_recursive(CONTENT_DIR, TEMPLATE_PATH, DEST_DIR, basepath, manifest_path, options)
+    print ("Pages generated")
+    if args.precompress:
+        if timings is not None:
+            with timings.stage("precompress"):
+                precompress_outputs(args, manifest_path, jobs)
+        else:
+            precompress_outputs(args, manifest_path, jobs)
+    if block_cache is not None and timings is not None:
+        print(block_cache.stats())
+
+    # A shard only knows its own pages; links are checked and the search
+    # index and site files are written once the shards are merged.
+    if args.shard is None:
+        manifest = BuildManifest.load(MANIFEST_PATH)
+        report_broken_links(manifest)
+        if args.search:
+            update_search_index(manifest, basepath)
+
+
+def start_image_scan():
+    """
+    Starts bringing the image size index up to date on a background thread
+    and returns a future for the sizes; the index is saved once it is done.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from image_meta import ImageMetadata
+
+    def scan():
+        index = ImageMetadata.load(IMAGE_META_PATH)
+        sizes = index.scan(STATIC_DIR)
+        if index.changed:
+            index.save()
+        return sizes
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(scan)
+    executor.shutdown(wait=False)
+    return future
+
+
+def output_paths(args, manifest: BuildManifest) -> list:
+    """
+    Every generated page the manifest records and, unless this shard leaves
+    them to shard 1, every copied static asset: the files under static/,
+    which --clean copies without recording them, and with
+    --fingerprint-assets the fingerprinted copies the manifest records.
+    """
+    paths = [Path(entry["dest"]) for entry in manifest.pages.values()]
+    if args.shard is not None and args.shard[0] != 1:
+        return paths
+    for root, _, files in os.walk(STATIC_DIR):
+        paths.extend(DEST_DIR / Path(root).relative_to(STATIC_DIR) / name for name in files)
+    if args.fingerprint_assets:
+        # Copies shared by identical assets are listed once.
+        paths.extend(sorted({DEST_DIR / entry["url"] for entry in manifest.assets.values()}))
+    return paths
+
+
+def precompress_outputs(args, manifest_path: Path, workers: int) -> None:
+    from precompress import precompress
+
+    paths = output_paths(args, BuildManifest.load(manifest_path))
+    compressed, unchanged = precompress(paths, workers)
+    print(f"Precompressed {compressed} file(s), {unchanged} unchanged.")
+
+
+def update_search_index(manifest: BuildManifest, basepath: str):
+    from search_index import SearchIndex
+
+    index = SearchIndex.load(SEARCH_DIR, SEARCH_STATE_PATH)
+    changed = index.update(manifest.pages, basepath)
+    written = index.save()
+    print(f"Search index: {len(index.pages)} pages, {changed} changed, {written} file(s) written to {SEARCH_DIR}")
+    return index
+
+
+def report_broken_links(manifest: BuildManifest) -> None:
+    from dependencies import DependencyGraph, broken_links_report
+
+    broken = DependencyGraph.from_manifest(manifest).broken_links(DEST_DIR)
+    if broken:
+        print(broken_links_report(broken))
+
+
+def merge_shards(count: int, basepath: str, search: bool = False, site_url: str = None) -> None:
+    print(f"Merging {count} shard manifests into {MANIFEST_PATH}")
+    manifest = merge_shard_manifests(MANIFEST_PATH, count, DEST_DIR)
+    print(f"Merged {len(manifest.pages)} pages and {len(manifest.assets)} assets.")
+    report_broken_links(manifest)
+    if search:
+        update_search_index(manifest, basepath)
+    if site_url is not None:
+        from site_files import write_site_files
+        written = write_site_files(manifest.pages, DEST_DIR, site_url, basepath)
+        print(f"Site files: {written} written to {DEST_DIR}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    basepath = args.basepath
 
     # Ensure basepath ends with a slash if it's not root
     if not basepath.endswith("/"):
         basepath += "/"
 
-    dir_path_content = Path("content")
-    template_path = Path("template.html")
-    dest_dir_path = Path("docs")
-    print (f"Generating pages from {dir_path_content} to {dest_dir_path} using {template_path}")
-    generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath)
-    print ("Pages generated")
+    if args.inline_backend is not None:
+        from raw_to_textnode import set_inline_backend
+        set_inline_backend(args.inline_backend)
+
+    if args.merge_shards is not None:
+        merge_shards(args.merge_shards, basepath, args.search, args.site_url)
+        return
+
+    timings = None
+    if args.timings is not None or args.trace is not None:
+        from timings import Timings
+        timings = Timings()
+
+    if build_is_current(args, basepath):
+        print("Nothing changed since the last build.")
+    elif args.profile is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.runcall(build, args, basepath, timings)
+        profiler.dump_stats(args.profile)
+        print(f"cProfile stats written to {args.profile}")
+    else:
+        build(args, basepath, timings)
+
+    if timings is not None:
+        if args.timings is not None:
+            print(timings.report(args.timings))
+        if args.trace is not None:
+            timings.write_trace(args.trace)
+            print(f"Trace written to {args.trace}")
+
+    if args.watch:
+        from watch import watch
+        from search_index import SearchIndex
+        search_index = SearchIndex.load(SEARCH_DIR, SEARCH_STATE_PATH) if args.search else None
+        watch(CONTENT_DIR, STATIC_DIR, TEMPLATE_PATH, DEST_DIR, basepath, MANIFEST_PATH, port=args.port,
+              search_index=search_index, site_url=args.site_url, minify=args.minify)
 
 
 if __name__ == "__main__":
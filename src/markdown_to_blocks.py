@@ -1,94 +1,218 @@
-from blocktype import block_to_block_type, BlockType
+from blocktype import classify_block, BlockType
 from htmlnode import ParentNode, LeafNode
 from raw_to_textnode import text_to_textnodes
 from textnode import text_node_to_html_node
+from dependencies import add_dependencies, collect_dependencies
+from search_index import add_terms, collect_terms
 import re
 
-def markdown_to_blocks(markdown: str) -> list:
+def iter_blocks(lines):
     """
-    Convert markdown text to a list of blocks.
+    Yield markdown blocks one at a time from an iterable of lines.
+
+    lines may be an open text file, so a document is never held in memory
+    whole; only the block being collected is. Trailing newlines are ignored.
     """
-    lines = markdown.split('\n')
-    blocks = []
     current_block = []
 
     for line in lines:
-        if not line.strip():
+        line = line.strip()
+        if not line:
             if current_block:
-                blocks.append('\n'.join(line.strip() for line in current_block))
+                yield '\n'.join(current_block)
                 current_block = []
         else:
             current_block.append(line)
 
     if current_block:
-        blocks.append('\n'.join(line.strip() for line in current_block))
+        yield '\n'.join(current_block)
+
+def iter_file_blocks(path):
+    """
+    Yield the markdown blocks of the file at path, closing it once they run out.
+    """
+    with open(path, encoding='utf-8') as f:
+        yield from iter_blocks(f)
 
-    return blocks
+def markdown_to_blocks(markdown: str) -> list:
+    """
+    Convert markdown text to a list of blocks.
+    """
+    return list(iter_blocks(markdown.split('\n')))
 
-def markdown_to_html_node(markdown: str) -> ParentNode:
+def markdown_to_html_node(markdown: str, timer=None, cache=None) -> ParentNode:
     """
     Convert markdown text into an HTML node tree.
+
+    If a timings.StageTimer is given, block splitting is recorded as
+    "block_split" and building the block nodes, which is dominated by inline
+    parsing, as "inline_parse". With a block_cache.BlockCache, blocks are
+    rendered through it (see cached_block_node).
     """
-    blocks = markdown_to_blocks(markdown)
-    parent = ParentNode("div", children=[])
-
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        if block_type == BlockType.HEADING:
-            parent.add_child(create_heading_node(block))
-        elif block_type == BlockType.PARAGRAPH:
-            parent.add_child(create_paragraph_node(block))
-        elif block_type == BlockType.CODE:
-            parent.add_child(create_code_node(block))
-        elif block_type == BlockType.QUOTE:
-            parent.add_child(create_quote_node(block))
-        elif block_type == BlockType.UNORDERED_LIST:
-            parent.add_child(create_unordered_list_node(block))
-        elif block_type == BlockType.ORDERED_LIST:
-            parent.add_child(create_ordered_list_node(block))
-        else:
-            # Fallback to paragraph
-            parent.add_child(create_paragraph_node(block))
+    if timer is not None:
+        with timer.stage("block_split"):
+            blocks = markdown_to_blocks(markdown)
+        with timer.stage("inline_parse", calls=len(blocks)):
+            return blocks_to_html_node(blocks, cache)
+    return blocks_to_html_node(markdown_to_blocks(markdown), cache)
 
-    return parent
+def blocks_to_html_node(blocks, cache=None) -> ParentNode:
+    """
+    Convert markdown blocks into an HTML node tree.
+    """
+    if cache is not None:
+        return ParentNode("div", children=[cached_block_node(block, cache) for block in blocks])
+    return ParentNode("div", children=[block_to_html_node(block) for block in blocks])
 
-def create_paragraph_node(block: str) -> ParentNode:
-    text_nodes = text_to_textnodes(block.replace("\n", " "))
-    html_nodes = [text_node_to_html_node(n) for n in text_nodes]
-    return ParentNode(tag="p", children=html_nodes)
+class RenderedBlock(LeafNode):
+    """
+    A block already serialized to HTML, with the link and image URLs it
+    contains and, if the cache indexes terms, its search terms.
+    """
+    __slots__ = ("links", "images", "terms")
+
+    def __init__(self, fragment, links=(), images=(), terms=None):
+        super().__init__(None, fragment)
+        self.links = links
+        self.images = images
+        self.terms = terms
+
+def cached_block_node(block: str, cache) -> RenderedBlock:
+    """
+    Return a block as a raw HTML leaf, rendered once and then served from cache.
+
+    The leaf serializes to exactly what block_to_html_node(block) would.
+    With cache.index_terms set, an entry cached without terms is rendered
+    again to collect them.
+    """
+    entry = cache.get(block)
+    if entry is None or (cache.index_terms and entry[3] is None):
+        node = block_to_html_node(block)
+        links, images = collect_dependencies(node)
+        terms = collect_terms(node) if cache.index_terms else None
+        entry = (node.to_html(), links, images, terms)
+        cache.put(block, *entry)
+    return RenderedBlock(*entry)
 
-def create_heading_node(block: str) -> ParentNode:
+def block_to_html_node(block: str) -> ParentNode:
+    """
+    Convert a single markdown block into its HTML node.
+    """
+    block_type, lines = classify_block(block)
+    return _BLOCK_BUILDERS[block_type](block, lines)
+
+class StreamedDocument(object):
+    """
+    Stands in for the tree from markdown_to_html_node without building it.
+
+    open_blocks is called each time the document is serialized and must
+    return a fresh iterator of blocks, such as iter_file_blocks(path). Each
+    block is parsed, written and dropped before the next is read, going
+    through cache if one is given. The link and image URLs seen along the
+    way are kept in links and images, and with index_terms the search terms
+    in terms.
+    """
+
+    def __init__(self, open_blocks, cache=None, index_terms=False):
+        self.open_blocks = open_blocks
+        self.cache = cache
+        self.index_terms = index_terms
+        self.links = {}
+        self.images = {}
+        self.terms = set()
+
+    def iter_html(self):
+        self.links, self.images, self.terms = {}, {}, set()
+        yield "<div>"
+        for block in self.open_blocks():
+            if self.cache is not None:
+                node = cached_block_node(block, self.cache)
+            else:
+                node = block_to_html_node(block)
+            add_dependencies(node, self.links, self.images)
+            if self.index_terms:
+                add_terms(node, self.terms)
+            yield from node.iter_html()
+        yield "</div>"
+
+    def to_html(self) -> str:
+        return "".join(self.iter_html())
+
+# The text of each block type with its markdown syntax removed. Shared with
+# document_ir, which must see exactly the same text.
+
+def paragraph_text(block: str) -> str:
+    return block.replace("\n", " ")
+
+def heading_parts(block: str):
+    """Returns the (level, text) of a heading block."""
     stripped = block.lstrip()
     level = min(stripped.count("#"), 6)  # Clamp to h6 max
-    content = stripped[level:].strip()
+    return level, stripped[level:].strip()
+
+def quote_text(lines) -> str:
+    return " ".join(line.lstrip("> ").strip() for line in lines)
+
+def code_text(lines) -> str:
+    return "\n".join(lines[1:-1] if lines[0].startswith("```") else lines)
+
+def unordered_list_items(lines) -> list:
+    items = [line.lstrip("- ").strip() for line in lines]
+    return [item for item in items if item]
+
+_ORDERED_ITEM_PATTERN = re.compile(r"^\d+\.\s*")
+
+def ordered_list_items(lines) -> list:
+    items = [_ORDERED_ITEM_PATTERN.sub("", line).strip() for line in lines]
+    return [item for item in items if item]
+
+def create_paragraph_node(block: str, lines=None) -> ParentNode:
+    text_nodes = text_to_textnodes(paragraph_text(block))
+    html_nodes = [text_node_to_html_node(n) for n in text_nodes]
+    return ParentNode(tag="p", children=html_nodes)
+
+def create_heading_node(block: str, lines=None) -> ParentNode:
+    level, content = heading_parts(block)
     text_nodes = text_to_textnodes(content)
     html_nodes = [text_node_to_html_node(n) for n in text_nodes]
     return ParentNode(tag=f"h{level}", children=html_nodes)
 
-def create_quote_node(block: str) -> ParentNode:
-    quote_lines = [line.lstrip("> ").strip() for line in block.splitlines()]
-    content = " ".join(quote_lines)
-    text_nodes = text_to_textnodes(content)
+def create_quote_node(block: str, lines=None) -> ParentNode:
+    if lines is None:
+        lines = block.splitlines()
+    text_nodes = text_to_textnodes(quote_text(lines))
     html_nodes = [text_node_to_html_node(n) for n in text_nodes]
     return ParentNode(tag="blockquote", children=html_nodes)
 
-def create_code_node(block: str) -> ParentNode:
-    lines = block.splitlines()
-    code_content = "\n".join(lines[1:-1] if lines[0].startswith("```") else lines)
-    return ParentNode(tag="pre", children=[LeafNode(tag="code", value=code_content)])
+def create_code_node(block: str, lines=None) -> ParentNode:
+    if lines is None:
+        lines = block.splitlines()
+    return ParentNode(tag="pre", children=[LeafNode(tag="code", value=code_text(lines))])
 
-def create_unordered_list_node(block: str) -> ParentNode:
-    items = [line.lstrip("- ").strip() for line in block.splitlines()]
+def create_unordered_list_node(block: str, lines=None) -> ParentNode:
+    if lines is None:
+        lines = block.splitlines()
     list_items = [
         ParentNode(tag="li", children=[text_node_to_html_node(n) for n in text_to_textnodes(item)])
-        for item in items if item
+        for item in unordered_list_items(lines)
     ]
     return ParentNode(tag="ul", children=list_items)
 
-def create_ordered_list_node(block: str) -> ParentNode:
-    items = [re.sub(r"^\d+\.\s*", "", line).strip() for line in block.splitlines()]
+def create_ordered_list_node(block: str, lines=None) -> ParentNode:
+    if lines is None:
+        lines = block.splitlines()
     list_items = [
         ParentNode(tag="li", children=[text_node_to_html_node(n) for n in text_to_textnodes(item)])
-        for item in items if item
+        for item in ordered_list_items(lines)
     ]
     return ParentNode(tag="ol", children=list_items)
+
+# The create_*_node function for each BlockType, taking (block, lines) from classify_block.
+_BLOCK_BUILDERS = {
+    BlockType.HEADING: create_heading_node,
+    BlockType.PARAGRAPH: create_paragraph_node,
+    BlockType.CODE: create_code_node,
+    BlockType.QUOTE: create_quote_node,
+    BlockType.UNORDERED_LIST: create_unordered_list_node,
+    BlockType.ORDERED_LIST: create_ordered_list_node,
+}
@@ -0,0 +1,283 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from precompress import remove_compressed
+
+
+def _tmp_path(dest_path: Path) -> Path:
+    # Unique per process and thread so concurrent writers never share a temp file.
+    return dest_path.with_name(f".{dest_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+@contextmanager
+def atomic_open(dest_path: Path):
+    """
+    Opens a temporary file next to dest_path for writing text, and moves it
+    over dest_path only once the block completes without an error.
+    """
+    dest_path = Path(dest_path)
+    tmp_path = _tmp_path(dest_path)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as fp:
+            yield fp
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+def write_atomic(dest_path: Path, data: bytes) -> None:
+    """Writes data to dest_path through a temporary file, so readers never see it half written."""
+    dest_path = Path(dest_path)
+    tmp_path = _tmp_path(dest_path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
+# How much of a streamed page is held at once, and compared against the old file in one read.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def same_bytes(path: Path, data: bytes) -> bool:
+    """True if the file at path already holds exactly data."""
+    try:
+        if os.stat(path).st_size != len(data):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+class _PageFile(object):
+    """
+    One page being written by PageWriter: the chunks given to write() are
+    compared with the file already at dest_path. Nothing is written while
+    they match; at the first difference the matching prefix is copied from
+    the old file into a temporary file, which takes the rest of the page and
+    replaces dest_path in finish(). The old file is only opened with the
+    first chunk, on whichever thread writes the page.
+    """
+
+    def __init__(self, dest_path: Path):
+        self.dest_path = dest_path
+        self.failed = False
+        self._tmp_path = _tmp_path(dest_path)
+        self._started = False
+        self._matched = 0
+        self._old = None
+        self._tmp = None
+
+    def _start(self) -> None:
+        self._started = True
+        try:
+            self._old = open(self.dest_path, 'rb')
+        except OSError:
+            self._tmp = open(self._tmp_path, 'wb')
+
+    def write(self, data: bytes) -> None:
+        if not self._started:
+            self._start()
+        if self._tmp is None:
+            if self._old.read(len(data)) == data:
+                self._matched += len(data)
+                return
+            self._diverge()
+        self._tmp.write(data)
+
+    def _diverge(self) -> None:
+        self._tmp = open(self._tmp_path, 'wb')
+        self._old.seek(0)
+        remaining = self._matched
+        while remaining:
+            chunk = self._old.read(min(remaining, STREAM_CHUNK_SIZE))
+            self._tmp.write(chunk)
+            remaining -= len(chunk)
+
+    def finish(self) -> bool:
+        """Completes the page and returns whether dest_path was rewritten."""
+        if not self._started:
+            self._start()
+        if self._tmp is None and self._old.read(1) == b"":
+            self._old.close()
+            return False
+        if self._tmp is None:
+            self._diverge()
+        if self._old is not None:
+            self._old.close()
+        self._tmp.close()
+        os.replace(self._tmp_path, self.dest_path)
+        self._tmp = None
+        return True
+
+    def discard(self) -> None:
+        if self._old is not None:
+            self._old.close()
+        if self._tmp is not None:
+            self._tmp.close()
+            self._tmp_path.unlink()
+            self._tmp = None
+
+
+# What PageWriter.open sends after a page's last chunk, or instead of it if the page failed to render.
+_FINISH = "finish"
+_DISCARD = "discard"
+
+
+class _PageStream(object):
+    """
+    The file object PageWriter.open yields: text written to it is encoded
+    in chunks of STREAM_CHUNK_SIZE, each handed to send as it fills.
+    """
+
+    def __init__(self, send):
+        self._send = send
+        self._parts = []
+        self._pending = 0
+
+    def write(self, text: str) -> None:
+        self._parts.append(text)
+        self._pending += len(text)
+        if self._pending >= STREAM_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._parts:
+            data = "".join(self._parts).encode('utf-8')
+            self._parts = []
+            self._pending = 0
+            self._send(data)
+
+
+class PageWriter(object):
+    """
+    Writes generated pages to disk atomically, skipping pages whose bytes are unchanged.
+
+    open() yields a file object that a page is rendered into. Its text is
+    encoded in chunks of STREAM_CHUNK_SIZE and handed to a pool of threads,
+    so rendering doesn't wait on the filesystem; every chunk of a page goes
+    to the same thread, which writes them in order. Rendering only blocks
+    while chunks of max_pending_bytes in all are already waiting. With
+    workers=0 each chunk is written as it fills, on the calling thread, and
+    write errors are raised from the open() block.
+
+    Each output directory is created once, and a page whose bytes match the
+    file on disk is not rewritten at all, leaving its mtime alone; a page
+    that is rewritten loses its now stale precompressed copies. Errors
+    from the threads are collected and returned by close() as
+    (dest_path, exception) pairs.
+    """
+
+    def __init__(self, workers: int = 4, max_pending_bytes: int = 8 * 1024 * 1024):
+        self.written = 0
+        self.unchanged = 0
+        self.errors = []
+        self.max_pending_bytes = max_pending_bytes
+        self._pending_bytes = 0
+        self._dirs = set()
+        self._lock = threading.Lock()
+        self._room = threading.Condition(self._lock)
+        self._queues = [queue.Queue() for _ in range(workers)]
+        self._pages = 0
+        self._threads = [threading.Thread(target=self._drain, args=(q,), daemon=True) for q in self._queues]
+        for thread in self._threads:
+            thread.start()
+
+    @contextmanager
+    def open(self, dest_path: Path):
+        """
+        Yields a file object to write the page's text to. The page is
+        written once the block completes, and left alone if the block raises.
+        """
+        page = _PageFile(Path(dest_path))
+        if self._queues:
+            page_queue = self._queues[self._pages % len(self._queues)]
+            self._pages += 1
+            send = lambda data: self._put(page_queue, page, data)
+        else:
+            send = lambda data: self._handle(page, data)
+        stream = _PageStream(send)
+        try:
+            yield stream
+            stream.flush()
+            send(_FINISH)
+        except BaseException:
+            send(_DISCARD)
+            raise
+
+    def _put(self, page_queue: queue.Queue, page: _PageFile, data) -> None:
+        if isinstance(data, bytes):
+            with self._room:
+                while self._pending_bytes and self._pending_bytes + len(data) > self.max_pending_bytes:
+                    self._room.wait()
+                self._pending_bytes += len(data)
+        page_queue.put((page, data))
+
+    def _drain(self, page_queue: queue.Queue):
+        while True:
+            item = page_queue.get()
+            if item is None:
+                return
+            page, data = item
+            try:
+                self._handle(page, data)
+            except Exception as e:
+                page.failed = True
+                page.discard()
+                with self._lock:
+                    self.errors.append((page.dest_path, e))
+            if isinstance(data, bytes):
+                with self._room:
+                    self._pending_bytes -= len(data)
+                    self._room.notify_all()
+
+    def _handle(self, page: _PageFile, data) -> None:
+        """Writes one chunk of page, or finishes or discards it."""
+        if page.failed:
+            return
+        if data is _DISCARD:
+            page.discard()
+            return
+        if data is _FINISH:
+            self._make_dir(page.dest_path.parent)
+            written = page.finish()
+            if written:
+                remove_compressed(page.dest_path)
+            with self._lock:
+                if written:
+                    self.written += 1
+                else:
+                    self.unchanged += 1
+            return
+        self._make_dir(page.dest_path.parent)
+        page.write(data)
+
+    def _make_dir(self, directory: Path) -> None:
+        if directory not in self._dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._dirs.add(directory)
+
+    def close(self) -> list:
+        """Waits until every page is written and returns the failed writes."""
+        for page_queue in self._queues:
+            page_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        return self.errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
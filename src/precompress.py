@@ -0,0 +1,126 @@
+"""
+Writes precompressed copies of generated files for static hosts that serve them.
+
+Next to docs/index.html this writes docs/index.html.gz, and
+docs/index.html.br when the optional brotli package is installed. Each copy
+is given its original's mtime, which is how an unchanged original is
+recognized later without reading either file.
+"""
+import gzip
+import os
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # optional; without it only .gz copies are written
+    brotli = None
+
+# Files worth compressing; images, fonts and archives are compressed already.
+COMPRESSIBLE_SUFFIXES = frozenset((".html", ".htm", ".css", ".js", ".mjs", ".json", ".xml", ".svg", ".txt",
+                                   ".map", ".md", ".csv", ".ico", ".wasm"))
+
+# Smaller files gain nothing from precompression; hosts send them as they are.
+MIN_SIZE = 256
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 keeps the output byte for byte the same for the same input.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+ENCODINGS = [(".gz", _gzip)]
+if brotli is not None:
+    ENCODINGS.append((".br", lambda data: brotli.compress(data, quality=11)))
+
+
+def compressed_siblings(path) -> list:
+    """The paths the precompressed copies of path are written to."""
+    path = Path(path)
+    return [path.with_name(path.name + suffix) for suffix, _ in ENCODINGS]
+
+
+def is_compressible(path) -> bool:
+    return Path(path).suffix.lower() in COMPRESSIBLE_SUFFIXES
+
+
+def _worth_compressing(stat) -> bool:
+    return stat.st_size >= MIN_SIZE
+
+
+def is_current(path) -> bool:
+    """
+    True if every compressed copy of path exists and carries its mtime, or,
+    for a file too small to compress, if it has no copies at all.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    if not _worth_compressing(stat):
+        return not any(sibling.exists() for sibling in compressed_siblings(path))
+    try:
+        return all(os.stat(sibling).st_mtime_ns == stat.st_mtime_ns for sibling in compressed_siblings(path))
+    except FileNotFoundError:
+        return False
+
+
+def compress_file(path) -> None:
+    """Reads path once and writes each of its compressed copies atomically."""
+    from page_writer import write_atomic
+
+    path = Path(path)
+    stat = path.stat()
+    data = path.read_bytes()
+    for sibling, (_, compress) in zip(compressed_siblings(path), ENCODINGS):
+        write_atomic(sibling, compress(data))
+        os.utime(sibling, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def remove_compressed(path) -> None:
+    """
+    Removes the compressed copies of a file that is gone, or that was
+    rewritten without them, of every known encoding.
+    """
+    path = Path(path)
+    for suffix in (".gz", ".br"):
+        sibling = path.with_name(path.name + suffix)
+        if sibling.exists():
+            sibling.unlink()
+
+
+def precompress(paths, workers: int = None) -> tuple:
+    """
+    Compresses every compressible file among paths whose copies are missing
+    or older than it, on a pool of workers threads (default: one per CPU).
+
+    zlib and brotli release the GIL while compressing, so threads run in
+    parallel without pickling any data. Files smaller than MIN_SIZE are
+    skipped, and their stale copies removed. Returns (compressed, unchanged).
+    """
+    stale = []
+    unchanged = 0
+    for path in paths:
+        if not is_compressible(path):
+            continue
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if not _worth_compressing(stat):
+            remove_compressed(path)
+        elif is_current(path):
+            unchanged += 1
+        else:
+            stale.append(path)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(stale) <= 1:
+        for path in stale:
+            compress_file(path)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(stale))) as executor:
+            # list() re-raises the first error.
+            list(executor.map(compress_file, stale))
+    return len(stale), unchanged
@@ -1,6 +1,11 @@
+import os
 import re
+from bisect import bisect_left
 from textnode import TextNode, TextType
 
+_IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
@@ -25,14 +30,13 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
     return new_nodes
 
 def extract_markdown_images(text):
-    return (re.findall("!\[([^\[\]]*)\]\(([^\(\)]*)\)", text))
+    return _IMAGE_PATTERN.findall(text)
     
 def extract_markdown_links(text):
-    return (re.findall("(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text))
+    return _LINK_PATTERN.findall(text)
 
 def split_nodes_images(old_nodes):
     new_nodes = []
-    image_pattern = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
     
     for node in old_nodes:
         if node.text_type != TextType.NORMAL:
@@ -40,7 +44,7 @@ def split_nodes_images(old_nodes):
             continue
 
         pos = 0
-        for match in image_pattern.finditer(node.text):
+        for match in _IMAGE_PATTERN.finditer(node.text):
             start, end = match.span()
             alt_text, url = match.groups()
             
@@ -60,7 +64,6 @@ def split_nodes_images(old_nodes):
 
 def split_nodes_links(old_nodes):
     new_nodes = []
-    link_pattern = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
 
     for node in old_nodes:
         if node.text_type != TextType.NORMAL:
@@ -68,7 +71,7 @@ def split_nodes_links(old_nodes):
             continue
 
         pos = 0
-        for match in link_pattern.finditer(node.text):
+        for match in _LINK_PATTERN.finditer(node.text):
             start, end = match.span()
             text, url = match.groups()
 
@@ -86,83 +89,275 @@ def split_nodes_links(old_nodes):
 
 
 
+# Inline emphasis in priority order. Code spans are found first, bold only
+# between code spans, italic only between bold spans.
+_EMPHASIS = (
+    ("`", TextType.CODE),
+    ("**", TextType.BOLD),
+    ("_", TextType.ITALIC),
+)
+
+
 def text_to_textnodes(text: str) -> list[TextNode]:
     """
-    Recursively convert markdown text into a list of TextNodes.
-    Handles nested formatting: bold, italic, code, links, and images.
+    Convert markdown text into a list of TextNodes.
+    Handles images, links, inline code, bold and italic with the backend
+    chosen by set_inline_backend; every backend gives identical output.
     """
-    nodes = [TextNode(text, TextType.NORMAL)]
-    
-    # First handle images and links (they take priority and shouldn't be nested)
-    nodes = split_nodes_images(nodes)
-    nodes = split_nodes_links(nodes)
+    return _inline_backend(text)
 
-    # Then handle inline code, bold, italic recursively
-    nodes = recursively_format_nodes(nodes)
 
+def _scan_text(text: str) -> list[TextNode]:
+    """
+    The "scanner" backend: one left-to-right pass with str.find.
+    Images and links split the text first, then each plain stretch between
+    them is scanned for code, bold and italic in turn. Formatting nested
+    inside a span is flattened into the span's text.
+    """
+    nodes = []
+    pos = 0
+    for start, end, text_type, label, url in _scan_links(text):
+        if start > pos:
+            _scan_emphasis(text, pos, start, 0, nodes)
+        nodes.append(TextNode(label, text_type, url))
+        pos = end
+    if pos < len(text):
+        _scan_emphasis(text, pos, len(text), 0, nodes)
     return nodes
 
-def recursively_format_nodes(nodes: list[TextNode]) -> list[TextNode]:
-    formatted_nodes = []
 
-    for node in nodes:
-        if node.text_type != TextType.NORMAL:
-            formatted_nodes.append(node)
-            continue
+def _scan_links(text: str):
+    """
+    Yields (start, end, text_type, label, url) for each image and link in text.
 
-        text = node.text
+    Matches exactly what split_nodes_images followed by split_nodes_links
+    find: images are taken first, over the whole text, and links only in
+    the stretches between them.
+    """
+    pos = 0
+    for match in _IMAGE_PATTERN.finditer(text):
+        yield from _scan_plain_links(text, pos, match.start())
+        yield match.start(), match.end(), TextType.IMAGE, match.group(1), match.group(2)
+        pos = match.end()
+    yield from _scan_plain_links(text, pos, len(text))
 
-        # Order matters: code > bold > italic
-        match = re.search(r"`(.*?)`", text)
-        if match:
-            formatted_nodes.extend(
-                recursively_format_nodes_from_match(text, match, TextType.CODE, "`")
-            )
-            continue
 
-        match = re.search(r"\*\*(.*?)\*\*", text)
-        if match:
-            formatted_nodes.extend(
-                recursively_format_nodes_from_match(text, match, TextType.BOLD, "**")
-            )
-            continue
+def _scan_plain_links(text: str, start: int, end: int):
+    """
+    Yields the links in text[start:end] like _LINK_PATTERN.finditer on that slice.
 
-        match = re.search(r"_(.*?)_", text)
-        if match:
-            formatted_nodes.extend(
-                recursively_format_nodes_from_match(text, match, TextType.ITALIC, "_")
-            )
+    The label may not contain brackets, the url may not contain parentheses,
+    and a [label](url) preceded by ! is skipped.
+    """
+    pos = start
+    while True:
+        open_at = text.find("[", pos, end)
+        if open_at == -1:
+            return
+        label_end = text.find("]", open_at + 1, end)
+        if label_end == -1:
+            return
+        nested = text.find("[", open_at + 1, label_end)
+        if nested != -1:
+            pos = nested
+            continue
+        if open_at > start and text[open_at - 1] == "!":
+            pos = open_at + 1
+            continue
+        if not text.startswith("(", label_end + 1, end):
+            pos = label_end + 1
+            continue
+        url_end = text.find(")", label_end + 2, end)
+        if url_end == -1:
+            # No later candidate can find a closing parenthesis either.
+            return
+        if text.find("(", label_end + 2, url_end) != -1:
+            pos = label_end + 1
             continue
 
-        # No formatting found
-        formatted_nodes.append(TextNode(text, TextType.NORMAL))
+        yield open_at, url_end + 1, TextType.LINK, text[open_at + 1:label_end], text[label_end + 2:url_end]
+        pos = url_end + 1
 
-    return formatted_nodes
 
-def recursively_format_nodes_from_match(text, match, text_type, delimiter):
-    before = text[:match.start()]
-    matched_text = match.group(1)
-    after = text[match.end():]
+def _find_delimited(text: str, delimiter: str, start: int, end: int):
+    """
+    Yields (open, close) positions of delimiter pairs in text[start:end].
 
+    Pairs are found leftmost first, never overlap and never span a newline,
+    the same as re.finditer over DELIM(.*?)DELIM. A delimiter with no partner
+    on its line skips the rest of that line, so each line is scanned once.
+    """
+    width = len(delimiter)
+    pos = start
+    while pos < end:
+        open_at = text.find(delimiter, pos, end)
+        if open_at == -1:
+            return
+        line_end = text.find("\n", open_at + width, end)
+        if line_end == -1:
+            line_end = end
+        close_at = text.find(delimiter, open_at + width, line_end)
+        if close_at == -1:
+            pos = line_end + 1
+            continue
+        yield open_at, close_at
+        pos = close_at + width
+
+
+def _scan_emphasis(text: str, start: int, end: int, level: int, nodes: list) -> None:
+    """Appends TextNodes for text[start:end], applying the emphasis kinds from _EMPHASIS[level] on."""
+    if level == len(_EMPHASIS):
+        nodes.append(TextNode(text[start:end], TextType.NORMAL))
+        return
+
+    delimiter, text_type = _EMPHASIS[level]
+    width = len(delimiter)
+    pos = start
+    for open_at, close_at in _find_delimited(text, delimiter, start, end):
+        if open_at > pos:
+            _scan_emphasis(text, pos, open_at, level + 1, nodes)
+        inner = []
+        _scan_emphasis(text, open_at + width, close_at, level + 1, inner)
+        nodes.append(TextNode("".join(node.text for node in inner), text_type))
+        pos = close_at + width
+    if pos < end:
+        _scan_emphasis(text, pos, end, level + 1, nodes)
+
+
+# The "regex" backend tokenizes text in one finditer pass. The leading
+# lookahead lets the engine reject ordinary characters without trying every
+# alternative.
+_INLINE_PATTERN = re.compile(
+    r"(?=[!\[`*_\n])"
+    r"(?:(?P<image>!\[(?P<alt>[^\[\]]*)\]\((?P<src>[^\(\)]*)\))"
+    r"|(?P<link>(?<!!)\[(?P<label>[^\[\]]*)\]\((?P<href>[^\(\)]*)\))"
+    r"|(?P<code>`)|(?P<bold>\*\*)|(?P<italic>_)|(?P<newline>\n))"
+)
+
+# The emphasis level of each delimiter mark, in _EMPHASIS order.
+_MARK_LEVELS = {"code": 0, "bold": 1, "italic": 2}
+
+
+def _regex_text(text: str) -> list[TextNode]:
+    """
+    The "regex" backend: tokenizes the whole text with _INLINE_PATTERN, then
+    pairs the emphasis marks between links and images by priority, exactly
+    as _scan_emphasis does.
+
+    The marks are kept as one sorted list of positions per level, each with
+    the newlines mixed in, so pairing a level never walks the marks of the
+    others.
+    """
     nodes = []
+    pos = 0
+    marks = ([], [], [])
+    for match in _INLINE_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == "image" or kind == "link":
+            start = match.start()
+            if start > pos:
+                _pair_marks(text, pos, start, marks, 0, nodes)
+            if kind == "image":
+                nodes.append(TextNode(match.group("alt"), TextType.IMAGE, match.group("src")))
+            else:
+                href = match.group("href")
+                if "![" in href and _link_takes_image(text, match):
+                    return _scan_text(text)
+                nodes.append(TextNode(match.group("label"), TextType.LINK, href))
+            pos = match.end()
+        elif kind == "newline":
+            at = match.start()
+            for level_marks in marks:
+                level_marks.append(at)
+        else:
+            marks[_MARK_LEVELS[kind]].append(match.start())
+    if pos < len(text):
+        _pair_marks(text, pos, len(text), marks, 0, nodes)
+    return nodes
 
-    if before:
-        nodes.extend(recursively_format_nodes([TextNode(before, TextType.NORMAL)]))
 
-    # Recurse inside matched_text
-    inner_nodes = recursively_format_nodes([TextNode(matched_text, TextType.NORMAL)])
-    if len(inner_nodes) == 1:
-        # Wrap with the current text_type
-        inner_nodes[0].text_type = text_type
-        nodes.append(inner_nodes[0])
-    else:
-        # If it's multiple nodes, we join them back as plain text under current format
-        joined = ''.join(n.text for n in inner_nodes)
-        nodes.append(TextNode(joined, text_type))
+def _link_takes_image(text: str, match) -> bool:
+    """
+    True if an image starts inside the url of the link match, as in
+    "[a](b![c)](d)". Images are taken before links, so the image wins; such
+    rare texts are left to the scanner rather than slowing every link in
+    the pattern down with a lookahead.
+    """
+    image = _IMAGE_PATTERN.search(text, match.start("href"))
+    return image is not None and image.start() < match.end()
 
-    if after:
-        nodes.extend(recursively_format_nodes([TextNode(after, TextType.NORMAL)]))
 
-    return nodes
+def _pair_marks(text: str, start: int, end: int, marks: tuple, level: int, nodes: list) -> None:
+    """
+    Appends TextNodes for text[start:end], given the positions of the
+    delimiter marks and newlines of every level in marks.
+
+    Marks of the current level pair up left to right within a line; the
+    text around and inside each pair is handled at the next level, or,
+    at the last level, is plain text.
+    """
+    last = level == len(_EMPHASIS) - 1
+    level_marks = marks[level]
+    first = bisect_left(level_marks, start)
+    stop = bisect_left(level_marks, end)
+    if first == stop:
+        if last:
+            nodes.append(TextNode(text[start:end], TextType.NORMAL))
+        else:
+            _pair_marks(text, start, end, marks, level + 1, nodes)
+        return
+
+    delimiter, text_type = _EMPHASIS[level]
+    width = len(delimiter)
+    pos = start
+    open_at = None
+    for index in range(first, stop):
+        at = level_marks[index]
+        if text[at] == "\n":
+            open_at = None
+        elif open_at is None:
+            open_at = at
+        else:
+            if last:
+                if open_at > pos:
+                    nodes.append(TextNode(text[pos:open_at], TextType.NORMAL))
+                nodes.append(TextNode(text[open_at + width:at], text_type))
+            else:
+                if open_at > pos:
+                    _pair_marks(text, pos, open_at, marks, level + 1, nodes)
+                inner = []
+                _pair_marks(text, open_at + width, at, marks, level + 1, inner)
+                nodes.append(TextNode("".join(node.text for node in inner), text_type))
+            pos = at + width
+            open_at = None
+    if pos < end:
+        if last:
+            nodes.append(TextNode(text[pos:end], TextType.NORMAL))
+        else:
+            _pair_marks(text, pos, end, marks, level + 1, nodes)
+
+
+INLINE_BACKENDS = {
+    "scanner": _scan_text,
+    "regex": _regex_text,
+}
+
+
+def set_inline_backend(name: str) -> None:
+    """
+    Selects the inline parser used by text_to_textnodes: "scanner" (default) or "regex".
+
+    The SSG_INLINE_BACKEND environment variable sets it at import.
+    """
+    global _inline_backend, _inline_backend_name
+    if name not in INLINE_BACKENDS:
+        raise ValueError(f"Unknown inline backend {name!r}, expected one of {', '.join(INLINE_BACKENDS)}")
+    _inline_backend = INLINE_BACKENDS[name]
+    _inline_backend_name = name
+
+
+def get_inline_backend() -> str:
+    return _inline_backend_name
 
 
+set_inline_backend(os.environ.get("SSG_INLINE_BACKEND", "scanner"))
@@ -0,0 +1,96 @@
+"""
+Renders many markdown documents to HTML in one call.
+
+    from render_batch import render_many
+    html = render_many(snippets, workers=4)
+
+Each result is exactly markdown_to_html_node(markdown).to_html().
+"""
+import os
+import threading
+
+from markdown_to_blocks import markdown_to_html_node
+from raw_to_textnode import get_inline_backend, set_inline_backend
+
+# The pools render_many uses when it is not given an executor, by worker
+# count. Each is created on first use and kept for later calls, since
+# starting worker processes costs more than rendering a small batch.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _map_on_shared_pool(workers: int, fn, *iterables):
+    """Maps fn over iterables on the kept pool of workers processes, creating it first if needed."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        # map submits every task before it returns, so close_pool can't shut the pool down in between.
+        return pool.map(fn, *iterables)
+
+
+def close_pool() -> None:
+    """
+    Shuts down the worker processes kept by render_many, if any, once the
+    batches already running on them are done.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+def _render_chunk(inline_backend: str, chunk: list) -> list:
+    """Process-pool entry point: renders a whole chunk, so it is pickled as one task and one result."""
+    if get_inline_backend() != inline_backend:
+        set_inline_backend(inline_backend)
+    return render_all(chunk)
+
+
+def render_all(documents, cache=None) -> list:
+    """Renders documents in this process, in order."""
+    if cache is None:
+        return [markdown_to_html_node(markdown).to_html() for markdown in documents]
+    return [markdown_to_html_node(markdown, cache=cache).to_html() for markdown in documents]
+
+
+def render_many(documents, *, workers: int = 1, chunk_size: int = None, cache=None, executor=None) -> list:
+    """
+    Renders an iterable of markdown strings and returns their HTML in the same order.
+
+    With workers > 1 the documents are split into chunks of chunk_size
+    (by default about four per worker) and rendered by a process pool of
+    that many workers, which is kept and reused by later calls with the
+    same number of workers, from any thread (see close_pool). executor is a concurrent.futures executor to render the
+    chunks on instead. Every chunk goes to a worker as a single pickled
+    task, with the current inline backend, so the per-document cost is the
+    markdown and HTML strings themselves. Small batches that make a single
+    chunk are rendered in this process.
+
+    cache is an optional block_cache.BlockCache, for batches where blocks
+    repeat across documents; it is only used for batches rendered in this
+    process. The first document that fails to render raises its exception,
+    as markdown_to_html_node would.
+    """
+    documents = list(documents)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"workers must be at least 1, got {workers}")
+    if chunk_size is None:
+        chunk_size = max(1, len(documents) // (workers * 4))
+    elif chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    if (executor is None and workers == 1) or len(documents) <= chunk_size:
+        return render_all(documents, cache)
+
+    chunks = [documents[start:start + chunk_size] for start in range(0, len(documents), chunk_size)]
+    backends = [get_inline_backend()] * len(chunks)
+    if executor is None:
+        results = _map_on_shared_pool(workers, _render_chunk, backends, chunks)
+    else:
+        results = executor.map(_render_chunk, backends, chunks)
+    return [html for chunk in results for html in chunk]
@@ -0,0 +1,222 @@
+import heapq
+import json
+import os
+import re
+from pathlib import Path
+
+from page_writer import same_bytes, write_atomic
+from precompress import remove_compressed
+
+SEARCH_INDEX_VERSION = 1
+
+_TERM_PATTERN = re.compile(r"\w+")
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 32
+
+
+def text_terms(text: str, terms: set) -> None:
+    """Adds the lowercased words of text to terms, skipping very short and very long ones."""
+    for term in _TERM_PATTERN.findall(text.lower()):
+        if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH:
+            terms.add(term)
+
+
+def add_terms(node, terms: set) -> None:
+    """
+    Adds the search terms in node's tree to terms.
+
+    Terms come from the text of the leaves, which is the text of the
+    TextNodes they were made from, and from image alt text. Blocks served
+    from the block cache carry the terms they were rendered with instead.
+    """
+    if hasattr(node, "links"):
+        if node.terms is not None:
+            terms.update(node.terms)
+        return
+    if node.tag == "img":
+        text_terms(node.props.get("alt", ""), terms)
+    elif node.value:
+        text_terms(node.value, terms)
+    for child in node.children:
+        if hasattr(child, "tag"):
+            add_terms(child, terms)
+
+
+def collect_terms(node) -> list:
+    """Returns the search terms in node's tree, sorted."""
+    terms = set()
+    add_terms(node, terms)
+    return sorted(terms)
+
+
+def page_search_url(key: str, basepath: str = "/") -> str:
+    """The URL search results link to for the page generated from key."""
+    path = key[:-len(".md")] + ".html" if key.endswith(".md") else key
+    if path == "index.html" or path.endswith("/index.html"):
+        path = path[:-len("index.html")]
+    return basepath + path
+
+
+def shard_name(term: str) -> str:
+    """Terms are sharded by first character, so a lookup fetches a single small file."""
+    first = term[0]
+    return first if first.isascii() and first.isalnum() else "_"
+
+
+class SearchIndex(object):
+    """
+    Client-side search index written next to the generated site.
+
+    directory/pages.json lists [url, title] for every page id (null for ids
+    freed by removed pages), and directory/terms-<c>.json maps every term
+    starting with c to the sorted ids of the pages containing it; see
+    shard_name. Terms and titles come from the build manifest, where
+    generate_pages_recursive records them as it renders.
+
+    update() only touches the postings of pages whose title or terms
+    changed, and only rewrites the files those postings live in. To do that
+    it keeps the id and terms of every indexed page in state_path, outside
+    the site. If the state or the index files are missing, everything is
+    indexed again.
+    """
+
+    def __init__(self, directory, state_path=None):
+        self.directory = Path(directory)
+        self.state_path = Path(state_path) if state_path is not None else None
+        # key -> {"id", "url", "title", "terms"}, where terms is a space separated string.
+        self.pages = {}
+        self.urls = []
+        # Heap of the ids in urls freed by removed pages; the lowest is reused first.
+        self._free_ids = []
+        self.shards = set()
+        self._postings = {}
+        self._dirty = set()
+        self._rebuild = True
+
+    @classmethod
+    def load(cls, directory, state_path):
+        """Loads the index state, falling back to a full rebuild if it or the files it describes are missing."""
+        index = cls(directory, state_path)
+        try:
+            data = json.loads(Path(state_path).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return index
+        if data.get("version") != SEARCH_INDEX_VERSION:
+            return index
+        shards = data.get("shards", [])
+        if not (index.directory / "pages.json").exists():
+            return index
+        if not all(index._shard_path(name).exists() for name in shards):
+            return index
+        index.shards = set(shards)
+        index.pages = data.get("pages", {})
+        index.urls = [None] * (max((page["id"] for page in index.pages.values()), default=-1) + 1)
+        for page in index.pages.values():
+            index.urls[page["id"]] = [page["url"], page["title"]]
+        # Built in ascending order, so already a heap.
+        index._free_ids = [page_id for page_id, url in enumerate(index.urls) if url is None]
+        index._rebuild = False
+        return index
+
+    def _shard_path(self, name: str) -> Path:
+        return self.directory / f"terms-{name}.json"
+
+    def _shard(self, name: str) -> dict:
+        postings = self._postings.get(name)
+        if postings is None:
+            postings = {}
+            if not self._rebuild and self._shard_path(name).exists():
+                data = json.loads(self._shard_path(name).read_text(encoding='utf-8'))
+                postings = {term: set(ids) for term, ids in data.items()}
+            self._postings[name] = postings
+        return postings
+
+    def _add(self, page_id: int, terms) -> None:
+        for term in terms:
+            name = shard_name(term)
+            self._shard(name).setdefault(term, set()).add(page_id)
+            self._dirty.add(name)
+
+    def _remove(self, page_id: int, terms) -> None:
+        for term in terms:
+            name = shard_name(term)
+            ids = self._shard(name).get(term)
+            if ids is not None:
+                ids.discard(page_id)
+                if not ids:
+                    del self._shard(name)[term]
+            self._dirty.add(name)
+
+    def update(self, manifest_pages: dict, basepath: str = "/") -> int:
+        """
+        Brings the index up to date with the title and terms recorded per page
+        in manifest_pages, and returns how many pages changed.
+
+        Pages without recorded terms are left out of the index.
+        """
+        changed = 0
+        current = {key: entry for key, entry in manifest_pages.items() if entry.get("terms") is not None}
+        for key in sorted(set(self.pages) - set(current)):
+            page = self.pages.pop(key)
+            self._remove(page["id"], page["terms"].split())
+            self.urls[page["id"]] = None
+            heapq.heappush(self._free_ids, page["id"])
+            changed += 1
+
+        for key in sorted(current):
+            entry = current[key]
+            url = page_search_url(key, basepath)
+            page = self.pages.get(key)
+            if page is not None and (page["url"], page["title"], page["terms"]) == (url, entry["title"], entry["terms"]):
+                continue
+            if page is None:
+                page = {"id": self._free_id(), "terms": ""}
+                self.pages[key] = page
+            old_terms = set(page["terms"].split())
+            new_terms = set(entry["terms"].split())
+            self._remove(page["id"], old_terms - new_terms)
+            self._add(page["id"], new_terms - old_terms)
+            page.update(url=url, title=entry["title"], terms=entry["terms"])
+            self.urls[page["id"]] = [url, entry["title"]]
+            changed += 1
+        return changed
+
+    def _free_id(self) -> int:
+        if self._free_ids:
+            return heapq.heappop(self._free_ids)
+        self.urls.append(None)
+        return len(self.urls) - 1
+
+    def save(self) -> int:
+        """Writes pages.json and every changed terms file, then the state. Returns how many files were written."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        written = 0
+        files = [(self.directory / "pages.json", {"version": SEARCH_INDEX_VERSION, "pages": self.urls})]
+        for name in sorted(self._dirty):
+            postings = self._postings[name]
+            if postings:
+                self.shards.add(name)
+                files.append((self._shard_path(name), {term: sorted(postings[term]) for term in sorted(postings)}))
+            else:
+                self.shards.discard(name)
+        for path, data in files:
+            encoded = json.dumps(data, separators=(",", ":")).encode('utf-8')
+            if not same_bytes(path, encoded):
+                write_atomic(path, encoded)
+                remove_compressed(path)
+                written += 1
+
+        # Terms files whose terms are all gone, or left over from an index that could not be loaded.
+        for path in self.directory.glob("terms-*.json"):
+            if path.stem[len("terms-"):] not in self.shards:
+                path.unlink()
+        self._dirty.clear()
+        self._rebuild = False
+
+        if self.state_path is not None:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.state_path.with_name(f"{self.state_path.name}.{os.getpid()}.tmp")
+            data = {"version": SEARCH_INDEX_VERSION, "shards": sorted(self.shards), "pages": self.pages}
+            tmp_path.write_text(json.dumps(data), encoding='utf-8')
+            os.replace(tmp_path, self.state_path)
+        return written
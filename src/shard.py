@@ -0,0 +1,83 @@
+import hashlib
+from pathlib import Path
+
+from build_manifest import BuildManifest
+
+
+def parse_shard(value: str):
+    """Parses "i/N" (1 <= i <= N) into an (index, count) tuple."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {value!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got {value!r}")
+    return index, count
+
+
+def shard_of(key: str, count: int) -> int:
+    """
+    The 1-based shard a page belongs to, from a hash of its content-relative path.
+
+    The hash is stable across machines and Python runs (unlike hash()), so
+    every runner agrees on the partition without talking to the others.
+    """
+    digest = hashlib.sha1(key.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def shard_manifest_path(manifest_path, index: int, count: int) -> Path:
+    """Where shard index of count keeps its manifest, next to manifest_path."""
+    manifest_path = Path(manifest_path)
+    return manifest_path.with_name(f"{manifest_path.stem}.shard-{index}-of-{count}{manifest_path.suffix}")
+
+
+def merge_shard_manifests(manifest_path, count: int, dest_dir: Path = None) -> BuildManifest:
+    """
+    Combines the manifests of shards 1..count into manifest_path and returns it.
+
+    Raises ValueError listing every conflict: a missing shard, a page built
+    by a shard it doesn't belong to or by more than one shard, two pages or
+    a page and an asset writing the same file, assets that differ between
+    shards, and shards built with different templates or basepaths. Pass
+    dest_dir to check pages against assets.
+    """
+    merged = BuildManifest(manifest_path)
+    conflicts = []
+    owners = {}
+    builds = {}
+    for index in range(1, count + 1):
+        path = shard_manifest_path(manifest_path, index, count)
+        if not path.exists():
+            conflicts.append(f"shard {index}/{count}: no manifest at {path}")
+            continue
+        shard = BuildManifest.load(path)
+        for key, entry in sorted(shard.pages.items()):
+            expected = shard_of(key, count)
+            if expected != index:
+                conflicts.append(f"{key}: built by shard {index} but belongs to shard {expected}")
+            if key in merged.pages:
+                conflicts.append(f"{key}: built by more than one shard")
+                continue
+            if entry["dest"] in owners:
+                conflicts.append(f"{key}: writes {entry['dest']}, which {owners[entry['dest']]} also writes")
+            owners[entry["dest"]] = key
+            builds.setdefault((entry["template"], entry["basepath"]), index)
+            merged.pages[key] = entry
+        for key, entry in sorted(shard.assets.items()):
+            if key in merged.assets and merged.assets[key] != entry:
+                conflicts.append(f"{key}: asset differs between shards")
+            merged.assets[key] = entry
+
+    if len(builds) > 1:
+        conflicts.append("shards were built with different templates or basepaths")
+    if dest_dir is not None:
+        for key in sorted(merged.assets):
+            dest = str(Path(dest_dir) / key)
+            if dest in owners:
+                conflicts.append(f"{owners[dest]}: writes {dest}, which is also a static asset")
+
+    if conflicts:
+        raise ValueError(f"{len(conflicts)} conflict(s) merging shard manifests:\n" + "\n".join(conflicts))
+    merged.save()
+    return merged
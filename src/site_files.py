@@ -0,0 +1,106 @@
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from page_writer import same_bytes, write_atomic
+from precompress import remove_compressed
+from search_index import page_search_url
+
+SITE_FILES_VERSION = 1
+
+SITEMAP_NAME = "sitemap.xml"
+FEED_NAME = "feed.xml"
+PAGE_INDEX_NAME = "pages.json"
+
+# Pages whose source is under this directory of content/ are blog posts, and
+# the newest FEED_ITEMS of them make up the feed.
+FEED_PREFIX = "blog/"
+FEED_ITEMS = 20
+
+
+def _page_time(entry: dict) -> datetime:
+    return datetime.fromtimestamp(entry["mtime_ns"] / 1e9, tz=timezone.utc)
+
+
+def _feed_keys(pages: dict) -> list:
+    posts = [key for key in pages if key.startswith(FEED_PREFIX) and key != FEED_PREFIX + "index.md"]
+    return sorted(posts, key=lambda key: (-pages[key]["mtime_ns"], key))[:FEED_ITEMS]
+
+
+def sitemap_xml(pages: dict, site_url: str, basepath: str = "/") -> bytes:
+    """A sitemap of every page, with the date its source was last modified."""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for url, entry in sorted((page_search_url(key, basepath), entry) for key, entry in pages.items()):
+        lines.append(f"<url><loc>{escape(site_url + url)}</loc>"
+                     f"<lastmod>{_page_time(entry).date().isoformat()}</lastmod></url>")
+    lines.append("</urlset>")
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def feed_xml(pages: dict, site_url: str, basepath: str = "/") -> bytes:
+    """
+    An RSS 2.0 feed of the newest blog posts, newest first.
+
+    The channel takes its title and description from the home page.
+    """
+    home = pages.get("index.md", {})
+    title = home.get("title") or site_url
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<rss version="2.0"><channel>',
+             f"<title>{escape(title)}</title>",
+             f"<link>{escape(site_url + basepath)}</link>",
+             f"<description>{escape(home.get('summary') or title)}</description>"]
+    for key in _feed_keys(pages):
+        entry = pages[key]
+        link = escape(site_url + page_search_url(key, basepath))
+        lines.append(f"<item><title>{escape(entry['title'] or key)}</title><link>{link}</link>"
+                     f"<guid>{link}</guid><pubDate>{format_datetime(_page_time(entry), usegmt=True)}</pubDate>"
+                     f"<description>{escape(entry.get('summary') or '')}</description></item>")
+    lines.append("</channel></rss>")
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def page_index_json(pages: dict, dest_dir: Path, site_url: str, basepath: str = "/") -> bytes:
+    """Every page's URL, output path relative to dest_dir, title, date and summary, as JSON."""
+    entries = []
+    for key in sorted(pages):
+        entry = pages[key]
+        entries.append({
+            "url": page_search_url(key, basepath),
+            "path": Path(os.path.relpath(entry["dest"], dest_dir)).as_posix(),
+            "title": entry["title"],
+            "date": _page_time(entry).date().isoformat(),
+            "summary": entry.get("summary"),
+        })
+    data = {"version": SITE_FILES_VERSION, "site_url": site_url, "pages": entries}
+    return json.dumps(data, indent=1).encode('utf-8')
+
+
+def write_site_files(pages: dict, dest_dir: Path, site_url: str, basepath: str = "/") -> int:
+    """
+    Writes the sitemap, the blog feed and the page index into dest_dir and
+    returns how many of them changed.
+
+    pages maps source keys to build manifest entries, which carry each page's
+    title, destination, source mtime and summary, so nothing is read back
+    from the generated site. Files whose bytes are unchanged are left alone.
+    """
+    site_url = site_url.rstrip("/")
+    files = [
+        (SITEMAP_NAME, sitemap_xml(pages, site_url, basepath)),
+        (FEED_NAME, feed_xml(pages, site_url, basepath)),
+        (PAGE_INDEX_NAME, page_index_json(pages, dest_dir, site_url, basepath)),
+    ]
+    written = 0
+    Path(dest_dir).mkdir(parents=True, exist_ok=True)
+    for name, data in files:
+        path = Path(dest_dir) / name
+        if not same_bytes(path, data):
+            write_atomic(path, data)
+            remove_compressed(path)
+            written += 1
+    return written
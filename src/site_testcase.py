@@ -0,0 +1,37 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+
+class SiteTestCase(unittest.TestCase):
+    """
+    Base class for tests that build a site in a temporary directory.
+
+    setUp creates the content directory and a minimal template, and sets
+    self.content, self.static, self.dest, self.template and self.manifest
+    to the usual paths under self.root; nothing else exists until a test
+    writes it.
+    """
+
+    TEMPLATE = "<title>{{Title}}</title>{{Content}}"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = self.root / "content"
+        self.static = self.root / "static"
+        self.dest = self.root / "docs"
+        self.template = self.root / "template.html"
+        self.manifest = self.root / "manifest.json"
+        self.content.mkdir()
+        self.template.write_text(self.TEMPLATE, encoding='utf-8')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_page(self, name, markdown) -> Path:
+        """Writes markdown to content/name, creating directories as needed, and returns its path."""
+        path = self.content / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(markdown, encoding='utf-8')
+        return path
@@ -0,0 +1,163 @@
+import re
+from pathlib import Path
+from urllib.parse import quote, unquote, urlsplit
+
+# Placeholders the generator knows how to fill. Anything else in {{...}} is
+# left in the page untouched.
+SLOTS = ("Title", "Content", "Date", "Description", "Nav")
+REQUIRED_SLOTS = ("Title", "Content")
+
+_SLOT_PATTERN = re.compile(r"\{\{(" + "|".join(SLOTS) + r")\}\}")
+_ROOT_URL_PATTERN = re.compile(r'\b(href|src)="/([^"]*)"')
+_IMG_PATTERN = re.compile(r'<img\b([^>]*?)\ssrc="/([^"]*)"([^>]*?)(\s*/?)>')
+
+
+def add_image_sizes(html: str, images: dict) -> str:
+    """
+    Adds width, height, loading="lazy" and decoding="async" to the img tags
+    whose root-relative src is one of the images, which maps site-relative
+    paths to (width, height). The src is looked up without its query and
+    with percent-escapes decoded. Tags that already have a width are left alone.
+    """
+    if "<img" not in html:
+        return html
+    def replace(match):
+        size = images.get(unquote(urlsplit(match.group(2)).path))
+        if size is None or " width=" in match.group(0):
+            return match.group(0)
+        return (f'<img{match.group(1)} src="/{match.group(2)}"{match.group(3)} width="{size[0]}" height="{size[1]}" '
+                f'loading="lazy" decoding="async"{match.group(4)}>')
+    return _IMG_PATTERN.sub(replace, html)
+
+
+def rewrite_root_urls(html: str, basepath: str, assets: dict = None, images: dict = None) -> str:
+    """
+    Points root-relative href and src attributes at the basepath.
+
+    assets maps site-relative asset paths to the fingerprinted paths of
+    their copies (see copy_static.sync_fingerprinted); URLs of those assets
+    are pointed at the copies as well, looked up like add_image_sizes does
+    and keeping their query and fragment. images gives the sizes of images
+    for add_image_sizes.
+    """
+    if images:
+        html = add_image_sizes(html, images)
+    if assets:
+        if '="/' not in html:
+            return html
+        def replace(match):
+            path = match.group(2)
+            url = assets.get(unquote(urlsplit(path).path))
+            if url is not None:
+                path = quote(url) + path[len(path.partition("#")[0].partition("?")[0]):]
+            return f'{match.group(1)}="{basepath}{path}"'
+        return _ROOT_URL_PATTERN.sub(replace, html)
+    if basepath == "/":
+        return html
+    return html.replace('href="/', f'href="{basepath}').replace('src="/', f'src="{basepath}')
+
+
+# A raw text element, whose contents are kept exactly as written, or any
+# other tag, with the whitespace after it and the name of the tag that follows.
+_MINIFY_PATTERN = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>|</?([!A-Za-z][\w-]*)[^>]*>)(\s*)"
+                             r"(?:(?=</?([!A-Za-z][\w-]*)))?", re.IGNORECASE | re.DOTALL)
+# Tags that never render the whitespace next to them.
+_BLOCK_TAGS = frozenset((
+    "!doctype html head body title meta link base script style noscript template article aside header footer "
+    "main nav section div p h1 h2 h3 h4 h5 h6 ul ol li dl dt dd table caption thead tbody tfoot tr td th "
+    "form fieldset textarea blockquote pre hr br figure figcaption details summary"
+).split())
+
+
+def _close_gap(match) -> str:
+    gap, following = match.group(4), match.group(5)
+    if not gap or following is None:
+        return match.group(0)
+    tag = (match.group(2) or match.group(3)).lower()
+    if "\n" in gap and (tag in _BLOCK_TAGS or following.lower() in _BLOCK_TAGS):
+        return match.group(1)
+    return match.group(1) + " "
+
+
+def minify_whitespace(source: str) -> str:
+    """
+    Strips the whitespace in template source that can't change how the page renders.
+
+    Line breaks and indentation between tags are dropped when either tag
+    is a block-level element, and collapsed to one space otherwise. Text,
+    slots and the contents of pre, textarea, script and style are left alone.
+    """
+    return _MINIFY_PATTERN.sub(_close_gap, source.strip())
+
+
+class Slot(object):
+    """A named hole in a compiled template."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Slot({self.name})"
+
+
+class Template(object):
+    """
+    A page template parsed once into literal segments and slots.
+
+    The basepath rewrite is applied to the literals at compile time, so
+    rendering a page is a single pass over the segment list. Slot values and
+    the content fragments are rewritten as they are written out. With
+    assets, URLs of static assets are also rewritten to their fingerprinted
+    copies, and with images, img tags get their sizes; see rewrite_root_urls.
+    """
+
+    def __init__(self, source: str, basepath: str = "/", assets: dict = None, images: dict = None):
+        self.basepath = basepath
+        self.assets = assets
+        self.images = images
+        self.segments = []
+        self.slots = set()
+        pos = 0
+        for match in _SLOT_PATTERN.finditer(source):
+            if match.start() > pos:
+                self.segments.append(rewrite_root_urls(source[pos:match.start()], basepath, assets, images))
+            self.segments.append(Slot(match.group(1)))
+            self.slots.add(match.group(1))
+            pos = match.end()
+        if pos < len(source):
+            self.segments.append(rewrite_root_urls(source[pos:], basepath, assets, images))
+
+        if any(name not in self.slots for name in REQUIRED_SLOTS):
+            raise ValueError("Template missing {{Title}} or {{Content}} placeholder")
+
+    @classmethod
+    def from_file(cls, path: Path, basepath: str = "/", assets: dict = None, images: dict = None):
+        return cls(Path(path).read_text(encoding='utf-8'), basepath, assets, images)
+
+    def iter_render(self, content, values: dict):
+        """
+        Yields the page in fragments.
+
+        content is the HTMLNode that fills {{Content}}; values maps the other
+        slot names to text that is inserted verbatim. Missing values render
+        as an empty string.
+        """
+        basepath = self.basepath
+        assets = self.assets
+        images = self.images
+        for segment in self.segments:
+            if type(segment) is str:
+                yield segment
+            elif segment.name == "Content":
+                for fragment in content.iter_html():
+                    yield rewrite_root_urls(fragment, basepath, assets, images)
+            else:
+                yield rewrite_root_urls(values.get(segment.name, ""), basepath, assets, images)
+
+    def render(self, content, values: dict) -> str:
+        return "".join(self.iter_render(content, values))
+
+    def write(self, fp, content, values: dict) -> None:
+        write = fp.write
+        for fragment in self.iter_render(content, values):
+            write(fragment)
@@ -0,0 +1,70 @@
+import unittest
+import tempfile
+from pathlib import Path
+from block_cache import BlockCache
+from generate_page import generate_pages_recursive
+from markdown_to_blocks import markdown_to_html_node
+
+
+class TestBlockCache(unittest.TestCase):
+
+    def test_cached_render_matches_uncached(self):
+        md = "# Title\n\n[< Back Home](/)\n\n- **one**\n- two\n\n```\ncode\n```\n\n[< Back Home](/)"
+        cache = BlockCache()
+        expected = markdown_to_html_node(md).to_html()
+        self.assertEqual(markdown_to_html_node(md, cache=cache).to_html(), expected)
+        self.assertEqual(markdown_to_html_node(md, cache=cache).to_html(), expected)
+        self.assertEqual(cache.misses, 4)
+        self.assertEqual(cache.hits, 6)
+
+    def test_least_recently_used_entries_are_evicted_by_size(self):
+        cache = BlockCache(max_size=20)
+        cache.put("a", "x" * 9)
+        cache.put("b", "y" * 9)
+        cache.get("a")
+        cache.put("c", "z" * 9)
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual(cache.size, 20)
+        cache.put("huge", "w" * 100)
+        self.assertNotIn("huge", cache.entries)
+
+    def test_size_is_counted_in_utf8_bytes(self):
+        cache = BlockCache(max_size=20)
+        cache.put("é", "€" * 6)
+        self.assertEqual(cache.size, 20)
+        cache.put("b", "€")
+        self.assertEqual(list(cache.entries), ["b"])
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cache.json"
+            cache = BlockCache(path=path)
+            cache.put("[a](/a)", '<p><a href="/a">a</a></p>', ["/a"])
+            cache.save()
+            loaded = BlockCache.load(path)
+            self.assertEqual(loaded.get("[a](/a)"), ('<p><a href="/a">a</a></p>', ("/a",), (), None))
+            path.write_text("not json", encoding='utf-8')
+            self.assertEqual(len(BlockCache.load(path)), 0)
+
+
+    def test_worker_processes_build_without_the_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = Path(tmp) / "content"
+            content.mkdir()
+            for name in ("a", "b", "c"):
+                (content / f"{name}.md").write_text(f"# {name}\n\nSame paragraph.", encoding='utf-8')
+            template = Path(tmp) / "template.html"
+            template.write_text("<title>{{Title}}</title>{{Content}}", encoding='utf-8')
+            path = Path(tmp) / "cache.json"
+            cache = BlockCache(path=path)
+            generate_pages_recursive(content, template, Path(tmp) / "docs", "/", jobs=2, block_cache=cache)
+            self.assertEqual(len(cache), 0)
+            self.assertFalse(path.exists())
+            self.assertIn("not used by the 2 worker processes", cache.stats())
+            generate_pages_recursive(content, template, Path(tmp) / "docs", "/", block_cache=cache)
+            self.assertEqual(cache.workers, 0)
+            self.assertEqual(cache.hits, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import os
+import tempfile
+from pathlib import Path
+from copy_static import fingerprint_name, sync_directory, sync_fingerprinted
+
+
+class TestSyncDirectory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.static = root / "static"
+        self.docs = root / "docs"
+        self.manifest = root / "manifest.json"
+        (self.static / "images").mkdir(parents=True)
+        (self.static / "index.css").write_text("body {}", encoding='utf-8')
+        (self.static / "images" / "tom.png").write_bytes(b"\x89PNG tom")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self, **kwargs):
+        return sync_directory(self.static, self.docs, self.manifest, **kwargs)
+
+    def test_first_sync_copies_everything(self):
+        self.assertEqual(self.sync(), (2, 0, 0))
+        self.assertEqual((self.docs / "images" / "tom.png").read_bytes(), b"\x89PNG tom")
+
+    def test_second_sync_copies_nothing(self):
+        self.sync()
+        self.assertEqual(self.sync(), (0, 2, 0))
+
+    def test_changed_file_is_recopied(self):
+        self.sync()
+        (self.static / "index.css").write_text("body { color: red }", encoding='utf-8')
+        self.assertEqual(self.sync(), (1, 1, 0))
+        self.assertEqual((self.docs / "index.css").read_text(encoding='utf-8'), "body { color: red }")
+
+    def test_touched_file_is_skipped_with_hash(self):
+        self.sync()
+        os.utime(self.static / "index.css", ns=(0, 0))
+        self.assertEqual(self.sync(use_hash=True), (0, 2, 0))
+        self.assertEqual((self.docs / "index.css").stat().st_mtime_ns, 0)
+
+    def test_only_orphaned_assets_are_removed(self):
+        self.sync()
+        (self.docs / "index.html").write_text("<html></html>", encoding='utf-8')
+        (self.static / "images" / "tom.png").unlink()
+        self.assertEqual(self.sync(), (0, 1, 1))
+        self.assertFalse((self.docs / "images").exists())
+        self.assertTrue((self.docs / "index.html").exists())
+
+    def test_hardlinked_assets(self):
+        self.sync(link=True)
+        self.assertTrue(os.path.samefile(self.static / "index.css", self.docs / "index.css"))
+        self.assertEqual(self.sync(link=True), (0, 2, 0))
+
+
+    def test_fingerprinted_copies(self):
+        (self.static / "images" / "tom2.png").write_bytes(b"\x89PNG tom")
+        urls, copied, unchanged, removed = sync_fingerprinted(self.static, self.docs, self.manifest)
+        tom = urls["images/tom.png"]
+        self.assertRegex(tom, r"^images/tom\.[0-9a-f]{8}\.png$")
+        self.assertEqual(urls["images/tom2.png"], tom)
+        # Three files under their own names, two distinct fingerprinted copies.
+        self.assertEqual((copied, unchanged, removed), (5, 0, 0))
+        self.assertEqual((self.docs / tom).read_bytes(), b"\x89PNG tom")
+        self.assertEqual((self.docs / "images" / "tom.png").read_bytes(), b"\x89PNG tom")
+        self.assertEqual(sync_fingerprinted(self.static, self.docs, self.manifest)[1:], (0, 5, 0))
+
+        (self.static / "images" / "tom.png").write_bytes(b"\x89PNG bombadil")
+        (self.static / "images" / "tom2.png").unlink()
+        urls, *counts = sync_fingerprinted(self.static, self.docs, self.manifest)
+        self.assertNotEqual(urls["images/tom.png"], tom)
+        self.assertEqual(counts, [2, 2, 2])
+        self.assertFalse((self.docs / tom).exists())
+        self.assertFalse((self.docs / "images" / "tom2.png").exists())
+        self.assertEqual((self.docs / "images" / "tom.png").read_bytes(), b"\x89PNG bombadil")
+
+    def test_switching_back_removes_fingerprinted_copies(self):
+        urls = sync_fingerprinted(self.static, self.docs, self.manifest)[0]
+        self.assertEqual(self.sync(), (0, 2, 2))
+        self.assertFalse((self.docs / urls["index.css"]).exists())
+        self.assertTrue((self.docs / "index.css").exists())
+
+    def test_fingerprint_name(self):
+        self.assertEqual(fingerprint_name("images/tom.png", "3f9a2c1b77"), "images/tom.3f9a2c1b.png")
+        self.assertEqual(fingerprint_name("LICENSE", "3f9a2c1b77"), "LICENSE.3f9a2c1b")
+
+
+if __name__ == "__main__":
+    unittest.main()
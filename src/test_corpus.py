@@ -0,0 +1,31 @@
+import unittest
+import random
+import tempfile
+from pathlib import Path
+from corpus import SHAPES, generate_corpus, generate_page_markdown
+from generate_page import extract_title
+from markdown_to_blocks import markdown_to_html_node
+
+
+class TestCorpus(unittest.TestCase):
+
+    def test_every_shape_renders(self):
+        for shape in SHAPES:
+            markdown = generate_page_markdown(random.Random(1), shape)
+            self.assertTrue(extract_title(markdown))
+            self.assertTrue(markdown_to_html_node(markdown).to_html().startswith("<div><h1>"))
+
+    def test_corpus_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            a = generate_corpus(Path(first), pages=20, shape="nested", seed=3)
+            b = generate_corpus(Path(second), pages=20, shape="nested", seed=3)
+            self.assertEqual([p.relative_to(first) for p in a], [p.relative_to(second) for p in b])
+            self.assertEqual([p.read_text() for p in a], [p.read_text() for p in b])
+
+    def test_unknown_shape(self):
+        with self.assertRaises(ValueError):
+            generate_corpus(Path("unused"), pages=1, shape="tables")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from block_cache import BlockCache
+from dependencies import DependencyGraph, collect_dependencies, url_target
+from markdown_to_blocks import markdown_to_html_node
+
+
+class TestDependencies(unittest.TestCase):
+
+    def test_url_target(self):
+        self.assertEqual(url_target("/blog/tom"), "blog/tom")
+        self.assertEqual(url_target("/blog/tom/index.html"), "blog/tom")
+        self.assertEqual(url_target("/"), "")
+        self.assertEqual(url_target("/images/my%20tom.png"), "images/my tom.png")
+        self.assertEqual(url_target("../images/tom.png", "/blog/tom/index.html"), "blog/images/tom.png")
+        self.assertIsNone(url_target("https://example.com/blog"))
+        self.assertIsNone(url_target("#top"))
+
+    def test_collect_dependencies_with_and_without_cache(self):
+        md = "# Tom\n\n[Home](/) and ![Tom](/images/tom.png)\n\n- [Tom](/blog/tom)\n- [Home](/)"
+        expected = (["/", "/blog/tom"], ["/images/tom.png"])
+        self.assertEqual(collect_dependencies(markdown_to_html_node(md)), expected)
+        cache = BlockCache()
+        markdown_to_html_node(md, cache=cache)
+        self.assertEqual(collect_dependencies(markdown_to_html_node(md, cache=cache)), expected)
+
+    def test_reverse_index_and_broken_links(self):
+        pages = {
+            "index.md": {"links": ["/blog/tom", "/blog/gone"], "images": [], "template_path": "template.html"},
+            "blog/tom/index.md": {"links": ["/"], "images": ["/images/tom.png"], "template_path": "template.html"},
+        }
+        graph = DependencyGraph(pages, {"images/tom.png": {}})
+        self.assertEqual(graph.page_dependents("blog/tom/index.md"), {"index.md"})
+        self.assertEqual(graph.page_dependents("index.md"), {"blog/tom/index.md"})
+        self.assertEqual(graph.asset_dependents("images/tom.png"), {"blog/tom/index.md"})
+        self.assertEqual(graph.template_dependents("template.html"), set(pages))
+        self.assertEqual(graph.broken_links(), [("index.md", "/blog/gone")])
+
+
+if __name__ == '__main__':
+    unittest.main()
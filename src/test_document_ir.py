@@ -0,0 +1,35 @@
+import unittest
+import random
+from corpus import SHAPES, generate_page_markdown
+from document_ir import CLOSE, OPEN, TAG_IDS, TEXT, markdown_to_document
+from markdown_to_blocks import markdown_to_html_node
+
+
+class TestDocumentIR(unittest.TestCase):
+
+    def test_ops_are_flat_spans_of_one_buffer(self):
+        document = markdown_to_document("# Hi **there**")
+        h1, b = TAG_IDS["h1"], TAG_IDS["b"]
+        self.assertEqual(document.text, "Hi there")
+        self.assertEqual(list(document.ops), [OPEN, TAG_IDS["div"], 0, OPEN, h1, 0, TEXT, 0, 3,
+                                              OPEN, b, 0, TEXT, 3, 8, CLOSE, b, CLOSE, h1, CLOSE, TAG_IDS["div"]])
+        self.assertEqual(document.to_html(), "<div><h1>Hi <b>there</b></h1></div>")
+
+    def test_matches_the_node_tree(self):
+        samples = [
+            "",
+            "# Title\n\n[< Back Home](/) and ![a *cat*](/cat.png)\n\n> a\n> *b* `c`",
+            "- one\n- **two**\n\n1. x\n2. [y](/y)\n\n```\ncode <here>\n```",
+            "####### deep\n\n```\n```",
+        ]
+        rng = random.Random(4)
+        samples += [generate_page_markdown(rng, shape) for shape in SHAPES]
+        for markdown in samples:
+            expected = markdown_to_html_node(markdown).to_html()
+            document = markdown_to_document(markdown)
+            self.assertEqual(document.to_html(), expected)
+            self.assertEqual(document.to_html_node().to_html(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
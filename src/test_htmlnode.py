@@ -1,5 +1,6 @@
 import unittest
-from htmlnode import HTMLNode, LeafNode, ParentNode
+import io
+from htmlnode import HTMLNode, LeafNode, ParentNode, EMPTY_PROPS
 from textnode import TextNode, TextType, text_node_to_html_node
 
 class TestHTMLNode(unittest.TestCase):
@@ -66,6 +67,37 @@ class TestHTMLNode(unittest.TestCase):
             "<div><span><b>grandchild</b></span></div>",
             )
 
+    def test_iter_html_matches_to_html(self):
+        tree = ParentNode("div", [
+            ParentNode("p", [LeafNode(None, "Hi "), LeafNode("b", "there")]),
+            LeafNode("img", "", {"src": "/a.png", "alt": "a"}),
+        ], {"class": "c"})
+        fragments = list(tree.iter_html())
+        self.assertGreater(len(fragments), 1)
+        self.assertEqual("".join(fragments), tree.to_html())
+
+    def test_write_html(self):
+        tree = ParentNode("ul", [ParentNode("li", [LeafNode("i", "x")])])
+        fp = io.StringIO()
+        tree.write_html(fp)
+        self.assertEqual(fp.getvalue(), "<ul><li><i>x</i></li></ul>")
+
+    def test_iter_html_requires_tag(self):
+        with self.assertRaises(ValueError):
+            list(ParentNode(None, [LeafNode("b", "x")]).iter_html())
+
+    def test_compact_nodes(self):
+        leaf = LeafNode("b", "bold")
+        other = LeafNode(None, "text")
+        parent = ParentNode("p", [leaf, other])
+        self.assertFalse(hasattr(leaf, "__dict__"))
+        self.assertFalse(hasattr(parent, "__dict__"))
+        self.assertEqual(leaf.children, ())
+        self.assertIs(leaf.props, EMPTY_PROPS)
+        self.assertIs(other.props, parent.props)
+        with self.assertRaises(TypeError):
+            leaf.props["class"] = "x"
+
     def test_text(self):
         # Testing NORMAL text type
         node_normal = TextNode("This is normal text", TextType.NORMAL)
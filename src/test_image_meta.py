@@ -0,0 +1,93 @@
+import unittest
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from image_meta import ImageMetadata, read_image_size
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", width, height) + b"\x08\x06\x00\x00\x00"
+
+
+def jpeg(width, height, orientation=None):
+    data = b"\xff\xd8" + b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + bytes(9)
+    if orientation is not None:
+        tiff = b"MM\x00\x2a" + struct.pack(">I", 8) + struct.pack(">H", 1)
+        tiff += struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack(">I", 0)
+        exif = b"Exif\x00\x00" + tiff
+        data += b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+    data += b"\xff\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return data + b"\xff\xda" + bytes(100) + b"\xff\xd9"
+
+
+class TestImageMeta(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.static = self.root / "static"
+        (self.static / "images").mkdir(parents=True)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = self.static / name
+        path.write_bytes(data)
+        return path
+
+    def test_turning_image_sizes_on_over_an_existing_build(self):
+        (self.root / "content").mkdir()
+        (self.root / "content" / "index.md").write_text("# Home\n\n![Tom](/images/tom.png)", encoding='utf-8')
+        (self.root / "template.html").write_text("<title>{{Title}}</title>{{Content}}", encoding='utf-8')
+        self.write("images/tom.png", png(3, 4))
+        main = str(Path(__file__).resolve().parent / "main.py")
+
+        def build(*args):
+            return subprocess.run([sys.executable, main, *args], cwd=self.root, capture_output=True, text=True,
+                                  check=True).stdout
+
+        build()
+        build("--image-sizes")
+        self.assertIn('width="3" height="4"', (self.root / "docs" / "index.html").read_text(encoding='utf-8'))
+        self.assertIn("Nothing changed", build("--image-sizes"))
+
+    def test_read_image_size(self):
+        self.assertEqual(read_image_size(self.write("a.png", png(1100, 438))), (1100, 438))
+        self.assertEqual(read_image_size(self.write("b.gif", b"GIF89a" + struct.pack("<HH", 16, 32) + bytes(20))), (16, 32))
+        self.assertEqual(read_image_size(self.write("c.jpg", jpeg(640, 480))), (640, 480))
+        self.assertEqual(read_image_size(self.write("d.jpg", jpeg(640, 480, orientation=6))), (480, 640))
+        self.assertEqual(read_image_size(self.write("e.jpg", jpeg(640, 480, orientation=3))), (640, 480))
+        # Named .png but a JPEG, as in static/images.
+        self.assertEqual(read_image_size(self.write("f.png", jpeg(20, 10))), (20, 10))
+        self.assertIsNone(read_image_size(self.write("g.png", b"not an image")))
+        self.assertIsNone(read_image_size(self.write("h.jpg", jpeg(640, 480)[:25])))
+
+    def test_scan_reads_only_changed_images(self):
+        tom = self.write("images/tom.png", png(928, 468))
+        self.write("images/broken.gif", b"GIF")
+        self.write("index.css", b"body {}")
+        index = ImageMetadata.load(self.root / "meta.json")
+        self.assertEqual(index.scan(self.static), {"images/tom.png": (928, 468)})
+        self.assertIn("images/broken.gif", index.entries)
+        index.save()
+
+        index = ImageMetadata.load(self.root / "meta.json")
+        entry = index.entries["images/tom.png"]
+        entry["width"] = 1  # a re-read would put the real width back
+        self.assertEqual(index.scan(self.static, workers=1)["images/tom.png"], (1, 468))
+        self.assertFalse(index.changed)
+
+        tom.write_bytes(png(10, 20))
+        os.utime(tom, ns=(0, entry["mtime_ns"] + 1))
+        (self.static / "images" / "broken.gif").unlink()
+        self.assertEqual(index.scan(self.static), {"images/tom.png": (10, 20)})
+        self.assertEqual(set(index.entries), {"images/tom.png"})
+        self.assertTrue(index.changed)
+
+
+if __name__ == '__main__':
+    unittest.main()
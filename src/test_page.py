@@ -1,5 +1,10 @@
 import unittest
-from generate_page import extract_title
+import io
+import os
+import generate_page
+from generate_page import BuildOptions, extract_description, extract_title, extract_title_from_lines, generate_pages_recursive
+from precompress import precompress
+from site_testcase import SiteTestCase
 
 
 class TestPageFunctions(unittest.TestCase):
@@ -26,5 +31,131 @@ class TestPageFunctions(unittest.TestCase):
         expected_title = "This is a title"
         self.assertEqual(extract_title(md), expected_title)
 
+    def test_extract_title_from_lines_matches_extract_title(self):
+        for md in ["# Title\n\nBody", "Intro\n#nope\n## Sub\n#  Late title ", "#\n\n  Title below", "#  "]:
+            self.assertEqual(extract_title_from_lines(io.StringIO(md)), extract_title(md))
+        with self.assertRaises(ValueError):
+            extract_title_from_lines(io.StringIO("#\n\n"))
+
+    def test_extract_description_skips_link_and_image_paragraphs(self):
+        md = "# Tom\n\n[< Back Home](/)\n\n ![Tom](/tom.png) \n\nOld Tom [Bombadil](/tom) & **Goldberry**"
+        self.assertEqual(extract_description(md), "Old Tom Bombadil &amp; Goldberry")
+        self.assertEqual(extract_description("# Tom\n\n[< Back Home](/)"), "")
+
+
+class TestIncrementalBuild(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_page("index.md", "# Home\n\n[post](/blog/post)")
+        self.write_page("blog/post.md", "# Post\n\nHello")
+
+    def build(self, basepath="/"):
+        generate_pages_recursive(self.content, self.template, self.dest, basepath, self.manifest)
+
+    def mark_outputs(self):
+        for page in self.dest.rglob("*.html"):
+            os.utime(page, ns=(0, 0))
+
+    def test_unchanged_pages_are_skipped(self):
+        self.build()
+        self.mark_outputs()
+        self.build()
+        self.assertEqual((self.dest / "index.html").stat().st_mtime_ns, 0)
+        self.assertEqual((self.dest / "blog" / "post.html").stat().st_mtime_ns, 0)
+
+    def test_changed_page_is_rebuilt(self):
+        self.build()
+        self.mark_outputs()
+        (self.content / "blog" / "post.md").write_text("# Post\n\nHello again", encoding='utf-8')
+        self.build()
+        self.assertEqual((self.dest / "index.html").stat().st_mtime_ns, 0)
+        self.assertIn("Hello again", (self.dest / "blog" / "post.html").read_text(encoding='utf-8'))
+
+    def test_template_and_basepath_changes_rebuild_everything(self):
+        self.build()
+        self.mark_outputs()
+        self.build("/site/")
+        self.assertIn('href="/site/blog/post"', (self.dest / "index.html").read_text(encoding='utf-8'))
+        self.mark_outputs()
+        self.template.write_text("<h1>{{Title}}</h1>{{Content}}", encoding='utf-8')
+        self.build("/site/")
+        self.assertNotEqual((self.dest / "blog" / "post.html").stat().st_mtime_ns, 0)
+
+    def test_asset_and_image_changes_rebuild_only_the_pages_using_them(self):
+        (self.content / "blog" / "post.md").write_text("# Post\n\n![Tom](/tom.png?v=2)", encoding='utf-8')
+        self.template.write_text('<link href="/site.css">{{Title}}{{Content}}', encoding='utf-8')
+        assets = {"site.css": "site.11111111.css", "tom.png": "tom.22222222.png"}
+        images = {"tom.png": (1, 2)}
+        generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest, assets=assets, images=images)
+        self.mark_outputs()
+        generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest,
+                                 assets=dict(assets, **{"tom.png": "tom.33333333.png"}), images=images)
+        self.assertEqual((self.dest / "index.html").stat().st_mtime_ns, 0)
+        self.assertIn("tom.33333333.png?v=2", (self.dest / "blog" / "post.html").read_text(encoding='utf-8'))
+        self.mark_outputs()
+        generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest,
+                                 assets=dict(assets, **{"tom.png": "tom.33333333.png"}), images={"tom.png": (3, 4)})
+        self.assertEqual((self.dest / "index.html").stat().st_mtime_ns, 0)
+        self.assertIn('width="3"', (self.dest / "blog" / "post.html").read_text(encoding='utf-8'))
+        self.mark_outputs()
+        generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest,
+                                 assets=dict(assets, **{"site.css": "site.44444444.css"}), images={"tom.png": (3, 4)})
+        self.assertNotEqual((self.dest / "index.html").stat().st_mtime_ns, 0)
+
+    def test_removed_source_deletes_output(self):
+        self.build()
+        (self.content / "blog" / "post.md").unlink()
+        self.build()
+        self.assertFalse((self.dest / "blog" / "post.html").exists())
+        self.assertTrue((self.dest / "index.html").exists())
+
+    def test_minified_template_rebuilds_and_removed_pages_lose_compressed_copies(self):
+        self.template.write_text("<title>{{Title}}</title>\n  <main>{{Content}}</main>\n", encoding='utf-8')
+        self.build()
+        precompress(self.dest.rglob("*.html"))
+        generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest, minify=True)
+        self.assertTrue((self.dest / "index.html").read_text(encoding='utf-8').startswith("<title>Home</title><main>"))
+        (self.content / "blog" / "post.md").unlink()
+        generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest, minify=True)
+        self.assertEqual(list((self.dest / "blog").iterdir()), [])
+
+    def test_build_options_and_overrides(self):
+        self.template.write_text("<title>{{Title}}</title>\n  <main>{{Content}}</main>\n", encoding='utf-8')
+        generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest, BuildOptions(minify=True),
+                                 jobs=2)
+        self.assertTrue((self.dest / "index.html").read_text(encoding='utf-8').startswith("<title>Home</title><main>"))
+        with self.assertRaises(ValueError):
+            generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest, minfy=True)
+
+    def outputs(self, dest):
+        return {p.relative_to(dest): p.read_text(encoding='utf-8') for p in dest.rglob("*.html")}
+
+    def test_parallel_build_matches_sequential(self):
+        self.build()
+        # A fresh directory, so pages the parallel build fails to write can't pass for its output.
+        parallel = self.root / "parallel"
+        generate_pages_recursive(self.content, self.template, parallel, "/", self.root / "parallel.json", jobs=2)
+        self.assertEqual(self.outputs(parallel), self.outputs(self.dest))
+
+    def test_failed_pages_are_reported_with_source_path(self):
+        (self.content / "blog" / "untitled.md").write_text("No title here", encoding='utf-8')
+        with self.assertRaises(ValueError) as context:
+            generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest, jobs=2)
+        self.assertIn("untitled.md", str(context.exception))
+        self.assertTrue((self.dest / "blog" / "post.html").exists())
+
+    def test_large_pages_are_streamed_from_disk(self):
+        self.build()
+        streamed = self.root / "streamed"
+        threshold = generate_page.STREAM_THRESHOLD
+        generate_page.STREAM_THRESHOLD = 0
+        try:
+            generate_pages_recursive(self.content, self.template, streamed, "/", self.root / "streamed.json")
+        finally:
+            generate_page.STREAM_THRESHOLD = threshold
+        self.assertEqual(self.outputs(streamed), self.outputs(self.dest))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import unittest
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+from page_writer import PageWriter, atomic_open
+
+
+class TestPageWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, writer, dest_path, text, step=30):
+        with writer.open(dest_path) as fp:
+            for start in range(0, len(text), step):
+                fp.write(text[start:start + step])
+
+    def test_pages_are_written_in_the_background(self):
+        with patch("page_writer.STREAM_CHUNK_SIZE", 16):
+            with PageWriter(workers=2, max_pending_bytes=64) as writer:
+                for n in range(20):
+                    self.write(writer, self.root / f"d{n % 3}" / f"page{n}.html", f"<p>{n}</p>" * 20, step=7)
+        self.assertEqual(writer.written, 20)
+        self.assertEqual((self.root / "d1" / "page4.html").read_text(encoding='utf-8'), "<p>4</p>" * 20)
+        self.assertEqual([p.name for p in self.root.rglob(".*.tmp")], [])
+
+    def test_identical_pages_are_not_rewritten(self):
+        page = self.root / "index.html"
+        page.write_text("<p>same</p>", encoding='utf-8')
+        os.utime(page, ns=(0, 0))
+        with PageWriter(workers=1) as writer:
+            self.write(writer, page, "<p>same</p>")
+        self.assertEqual(page.stat().st_mtime_ns, 0)
+        with PageWriter(workers=1) as writer:
+            self.write(writer, page, "<p>changed</p>")
+        self.assertEqual((writer.written, writer.unchanged), (1, 0))
+        self.assertEqual(page.read_text(encoding='utf-8'), "<p>changed</p>")
+
+    def test_streamed_pages_are_compared_in_chunks(self):
+        page = self.root / "index.html"
+        old = "a" * 100 + "b" * 100
+        page.write_text(old, encoding='utf-8')
+        os.utime(page, ns=(0, 0))
+        writer = PageWriter(workers=0)
+        with writer.open(page) as fp:
+            fp.write(old[:150])
+            fp.write(old[150:])
+        self.assertEqual(page.stat().st_mtime_ns, 0)
+        with patch("page_writer.STREAM_CHUNK_SIZE", 64):
+            for new in (old[:199], old + "c", "a" * 150 + "c" * 50):
+                self.write(writer, page, new)
+                self.assertEqual(page.read_text(encoding='utf-8'), new)
+                old = new
+            with self.assertRaises(RuntimeError):
+                with writer.open(page) as fp:
+                    fp.write("x" * 100)
+                    raise RuntimeError("render failed")
+        self.assertEqual(page.read_text(encoding='utf-8'), old)
+        self.assertEqual((writer.written, writer.unchanged), (3, 1))
+        self.assertEqual(os.listdir(self.root), ["index.html"])
+
+    def test_write_errors_are_returned_by_close(self):
+        (self.root / "blocked").write_text("a file, not a directory", encoding='utf-8')
+        writer = PageWriter(workers=1)
+        self.write(writer, self.root / "blocked" / "page.html", "<p>x</p>")
+        self.write(writer, self.root / "page.html", "<p>y</p>")
+        errors = writer.close()
+        self.assertEqual([dest for dest, _ in errors], [self.root / "blocked" / "page.html"])
+        self.assertEqual((self.root / "page.html").read_text(encoding='utf-8'), "<p>y</p>")
+
+    def test_atomic_open_keeps_old_file_on_error(self):
+        page = self.root / "index.html"
+        page.write_text("old", encoding='utf-8')
+        with self.assertRaises(RuntimeError):
+            with atomic_open(page) as fp:
+                fp.write("half")
+                raise RuntimeError("render failed")
+        self.assertEqual(page.read_text(encoding='utf-8'), "old")
+        self.assertEqual(os.listdir(self.root), ["index.html"])
+
+
+if __name__ == '__main__':
+    unittest.main()
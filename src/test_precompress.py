@@ -0,0 +1,75 @@
+import unittest
+import gzip
+import os
+import tempfile
+from pathlib import Path
+from copy_static import copy_file
+from generate_page import write_page
+from page_writer import PageWriter
+from precompress import MIN_SIZE, compressed_siblings, is_current, precompress, remove_compressed
+
+
+class TestPrecompress(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.page = self.root / "index.html"
+        self.page.write_text("<p>hello</p>" * 100, encoding='utf-8')
+        self.image = self.root / "tom.png"
+        self.image.write_bytes(b"\x89PNG" * 100)
+        self.small = self.root / "small.css"
+        self.small.write_text("body {}", encoding='utf-8')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compresses_only_stale_files(self):
+        paths = [self.page, self.image, self.small]
+        self.assertEqual(precompress(paths, workers=2), (1, 0))
+        gz = self.root / "index.html.gz"
+        self.assertEqual(gzip.decompress(gz.read_bytes()), self.page.read_bytes())
+        self.assertEqual(gz.stat().st_mtime_ns, self.page.stat().st_mtime_ns)
+        self.assertFalse((self.root / "tom.png.gz").exists())
+        self.assertFalse((self.root / "small.css.gz").exists())
+        self.assertTrue(is_current(self.page))
+        self.assertTrue(is_current(self.small))
+        self.assertFalse(is_current(self.root / "missing.css"))
+
+        self.assertEqual(precompress(paths), (0, 1))
+        self.page.write_text("<p>changed</p>" * 100, encoding='utf-8')
+        os.utime(self.page, ns=(0, self.page.stat().st_mtime_ns + 1))
+        self.assertFalse(is_current(self.page))
+        self.assertEqual(precompress(paths), (1, 0))
+        self.assertEqual(gzip.decompress(gz.read_bytes()), self.page.read_bytes())
+
+    def test_stale_copies_are_removed(self):
+        precompress([self.page])
+        self.page.write_text("x" * (MIN_SIZE - 1), encoding='utf-8')
+        self.assertEqual(precompress([self.page]), (0, 0))
+        self.assertFalse(any(sibling.exists() for sibling in compressed_siblings(self.page)))
+        self.assertTrue(is_current(self.page))
+        precompress([self.page, self.root / "missing.html"])
+
+        self.page.write_text("<p>hello</p>" * 100, encoding='utf-8')
+        precompress([self.page])
+        remove_compressed(self.page)
+        self.assertEqual(list(self.root.glob("*.gz")), [])
+
+    def test_rewritten_files_lose_their_copies(self):
+        template = "<title>{{Title}}</title>{{Content}}"
+        writer = PageWriter(workers=0)
+        rewrites = [
+            lambda: write_page("# Hi\n\nchanged", template, self.page),
+            lambda: write_page("# Hi\n\nagain", template, self.page, writer=writer),
+            lambda: copy_file(str(self.small), str(self.page)),
+        ]
+        for rewrite in rewrites:
+            self.page.write_text("<p>hello</p>" * 100, encoding='utf-8')
+            precompress([self.page])
+            rewrite()
+            self.assertEqual(list(self.root.glob("*.gz")), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
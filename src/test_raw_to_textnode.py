@@ -3,9 +3,10 @@ import re
 from textnode import TextNode, TextType
 from raw_to_textnode import split_nodes_delimiter, extract_markdown_images, extract_markdown_links, split_nodes_images, split_nodes_links, text_to_textnodes
 from markdown_to_blocks import markdown_to_blocks
-from blocktype import BlockType, block_to_block_type
+from blocktype import BlockType, block_to_block_type, classify_block
 from markdown_to_blocks import *
 from htmlnode import ParentNode
+import raw_to_textnode
 
 def text_to_textnodes(text):
     nodes = []
@@ -448,6 +449,16 @@ Another paragraph."""
         paragraph = "Just a regular paragraph with no backticks."
         self.assertEqual(block_to_block_type(paragraph), BlockType.PARAGRAPH)
 
+    def test_classify_block_returns_split_lines(self):
+        self.assertEqual(classify_block("- one\n- two"), (BlockType.UNORDERED_LIST, ["- one", "- two"]))
+        self.assertEqual(classify_block("```\ncode\n```"), (BlockType.CODE, ["```", "code", "```"]))
+        self.assertEqual(classify_block("# Heading"), (BlockType.HEADING, None))
+        self.assertEqual(classify_block("-not a list"), (BlockType.PARAGRAPH, None))
+
+    def test_classify_block_unstripped_code(self):
+        block = "  ```\ncode\n```\n "
+        self.assertEqual(classify_block(block), (BlockType.CODE, block.splitlines()))
+
     def test_textnode_repr(self):
         node = TextNode("Hello", TextType.NORMAL)
         self.assertEqual(repr(node), "TextNode(Hello, normal, None)")
@@ -533,5 +544,92 @@ Another paragraph."""
    
     
 
+class TestInlineScanner(unittest.TestCase):
+    """Exercises raw_to_textnode.text_to_textnodes itself; the module-level helper above shadows it."""
+
+    def test_all_inline_kinds(self):
+        text = "A **bold** and _italic_ `code` with ![img](/i.png) and [link](/l)."
+        self.assertEqual(raw_to_textnode.text_to_textnodes(text), [
+            TextNode("A ", TextType.NORMAL),
+            TextNode("bold", TextType.BOLD),
+            TextNode(" and ", TextType.NORMAL),
+            TextNode("italic", TextType.ITALIC),
+            TextNode(" ", TextType.NORMAL),
+            TextNode("code", TextType.CODE),
+            TextNode(" with ", TextType.NORMAL),
+            TextNode("img", TextType.IMAGE, "/i.png"),
+            TextNode(" and ", TextType.NORMAL),
+            TextNode("link", TextType.LINK, "/l"),
+            TextNode(".", TextType.NORMAL),
+        ])
+
+    def test_code_takes_priority_over_bold(self):
+        self.assertEqual(raw_to_textnode.text_to_textnodes("**a `b** c`"), [
+            TextNode("**a ", TextType.NORMAL),
+            TextNode("b** c", TextType.CODE),
+        ])
+
+    def test_nested_formatting_is_flattened(self):
+        self.assertEqual(raw_to_textnode.text_to_textnodes("`a **b** _c_`"), [
+            TextNode("a b c", TextType.CODE),
+        ])
+        self.assertEqual(raw_to_textnode.text_to_textnodes("**x _y_**"), [
+            TextNode("x y", TextType.BOLD),
+        ])
+
+    def test_delimiters_do_not_span_lines(self):
+        self.assertEqual(raw_to_textnode.text_to_textnodes("_a\nb_ _c_"), [
+            TextNode("_a\nb", TextType.NORMAL),
+            TextNode(" ", TextType.ITALIC),
+            TextNode("c_", TextType.NORMAL),
+        ])
+
+    def test_formatting_does_not_cross_links(self):
+        self.assertEqual(raw_to_textnode.text_to_textnodes("`[a](b)`"), [
+            TextNode("`", TextType.NORMAL),
+            TextNode("a", TextType.LINK, "b"),
+            TextNode("`", TextType.NORMAL),
+        ])
+
+    def test_unmatched_markers_stay_plain(self):
+        self.assertEqual(raw_to_textnode.text_to_textnodes("a ** b [c](d"), [
+            TextNode("a ** b [c](d", TextType.NORMAL),
+        ])
+        self.assertEqual(raw_to_textnode.text_to_textnodes(""), [])
+
+    def test_image_inside_link_url_wins(self):
+        # Images are split out before links, so the image claims the overlap.
+        self.assertEqual(raw_to_textnode.text_to_textnodes("[a](b![c)](d)"), [
+            TextNode("[a](b", TextType.NORMAL),
+            TextNode("c)", TextType.IMAGE, "d"),
+        ])
+
+    def test_links_and_images_match_split_nodes(self):
+        # The scanner must find exactly what the original split_nodes_images
+        # then split_nodes_links pipeline found, overlaps included.
+        texts = ["[a](b![c)](d)", "![a](b[c](d))", "[a](![b](c))", "!![x](y)[z](w)", "[a]![b](c)(d)",
+                 "[a](b)![c](d)[e](f![g](h)", "![a](b![c](d)"]
+        for text in texts:
+            expected = [(node.text_type, node.text, node.url) for node in
+                        split_nodes_links(split_nodes_images([TextNode(text, TextType.NORMAL)]))
+                        if node.text_type != TextType.NORMAL]
+            found = [(text_type, label, url) for _, _, text_type, label, url in raw_to_textnode._scan_links(text)]
+            self.assertEqual(found, expected, text)
+
+    def test_regex_backend_matches_scanner(self):
+        texts = [
+            "A **bold** and _italic_ `code` with ![img](/i.png) and [link](/l).",
+            "**a `b** c`", "`a **b** _c_`", "_a\nb_ _c_", "`[a](b)`", "a ** b [c](d",
+            "[a](b![c)](d)", "!![x](y)[z](w)***a**_", "",
+        ]
+        self.addCleanup(raw_to_textnode.set_inline_backend, raw_to_textnode.get_inline_backend())
+        raw_to_textnode.set_inline_backend("scanner")
+        expected = [raw_to_textnode.text_to_textnodes(text) for text in texts]
+        raw_to_textnode.set_inline_backend("regex")
+        self.assertEqual([raw_to_textnode.text_to_textnodes(text) for text in texts], expected)
+        with self.assertRaises(ValueError):
+            raw_to_textnode.set_inline_backend("fast")
+
+
 if __name__ == '__main__':
     unittest.main()
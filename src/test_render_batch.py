@@ -0,0 +1,69 @@
+import unittest
+import random
+from concurrent.futures import ThreadPoolExecutor
+import render_batch
+from block_cache import BlockCache
+from corpus import SHAPES, generate_page_markdown
+from markdown_to_blocks import markdown_to_html_node
+from raw_to_textnode import get_inline_backend, set_inline_backend
+from render_batch import close_pool, render_many
+
+
+class TestRenderMany(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.documents = ["", "# Hi **there**", "- [a](/a)\n- ![b](/b.png)"]
+        self.documents += [generate_page_markdown(rng, shape) for shape in SHAPES]
+        self.expected = [markdown_to_html_node(markdown).to_html() for markdown in self.documents]
+
+    def test_results_are_in_order(self):
+        self.assertEqual(render_many(iter(self.documents)), self.expected)
+        self.assertEqual(render_many(self.documents, cache=BlockCache()), self.expected)
+        self.assertEqual(render_many([]), [])
+
+    def test_process_pool(self):
+        backend = get_inline_backend()
+        set_inline_backend("regex")
+        try:
+            self.assertEqual(render_many(self.documents, workers=2, chunk_size=2), self.expected)
+            self.assertEqual(render_many(self.documents, workers=3, cache=BlockCache()), self.expected)
+        finally:
+            set_inline_backend(backend)
+            close_pool()
+
+    def test_pool_is_reused(self):
+        try:
+            render_many(self.documents, workers=2, chunk_size=2)
+            pool = render_batch._pools[2]
+            self.assertEqual(render_many(self.documents, workers=2, chunk_size=3), self.expected)
+            self.assertIs(render_batch._pools[2], pool)
+        finally:
+            close_pool()
+        self.assertEqual(render_batch._pools, {})
+
+    def test_pools_are_shared_between_threads(self):
+        # Calls with different worker counts from several threads must not shut down each other's pools.
+        try:
+            with ThreadPoolExecutor(max_workers=4) as threads:
+                futures = [threads.submit(render_many, self.documents, workers=2 + n % 2, chunk_size=2)
+                           for n in range(8)]
+                results = [future.result() for future in futures]
+            self.assertEqual(results, [self.expected] * 8)
+            self.assertEqual(sorted(render_batch._pools), [2, 3])
+        finally:
+            close_pool()
+
+    def test_given_executor(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(render_many(self.documents, chunk_size=2, executor=executor), self.expected)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            render_many(self.documents, workers=0)
+        with self.assertRaises(ValueError):
+            render_many(self.documents, chunk_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
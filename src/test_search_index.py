@@ -0,0 +1,83 @@
+import unittest
+import json
+from block_cache import BlockCache
+from build_manifest import BuildManifest
+from generate_page import generate_pages_recursive
+from markdown_to_blocks import markdown_to_html_node
+from search_index import SearchIndex, collect_terms, page_search_url
+from site_testcase import SiteTestCase
+
+
+class TestSearchIndex(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.state = self.root / "search.json"
+        self.write_page("index.md", "# Home\n\nWelcome to **Middle-earth**")
+        self.write_page("blog/tom/index.md", "# Tom\n\nTom Bombadil and ![a hobbit](/images/hobbit.png)")
+
+    def build(self):
+        generate_pages_recursive(self.content, self.template, self.dest, "/site/", self.manifest,
+                                 index_terms=True)
+        index = SearchIndex.load(self.dest / "search", self.state)
+        index.update(BuildManifest.load(self.manifest).pages, "/site/")
+        index.save()
+
+    def read(self, name):
+        return json.loads((self.dest / "search" / name).read_text(encoding='utf-8'))
+
+    def test_collect_terms(self):
+        md = "# The Hobbit\n\n- **Bilbo** and `ring`\n\n![Bag End](/b.png) a x"
+        self.assertEqual(collect_terms(markdown_to_html_node(md)),
+                         ["and", "bag", "bilbo", "end", "hobbit", "ring", "the"])
+        cache = BlockCache(index_terms=True)
+        markdown_to_html_node(md, cache=cache)
+        self.assertEqual(collect_terms(markdown_to_html_node(md, cache=cache)), collect_terms(markdown_to_html_node(md)))
+
+    def test_page_search_url(self):
+        self.assertEqual(page_search_url("index.md", "/site/"), "/site/")
+        self.assertEqual(page_search_url("blog/tom/index.md"), "/blog/tom/")
+        self.assertEqual(page_search_url("contact.md"), "/contact.html")
+
+    def test_build_and_incremental_update(self):
+        self.build()
+        self.assertEqual(self.read("pages.json")["pages"], [["/site/blog/tom/", "Tom"], ["/site/", "Home"]])
+        self.assertEqual(self.read("terms-m.json")["middle"], [1])
+        self.assertEqual(self.read("terms-h.json")["hobbit"], [0])
+
+        untouched = self.dest / "search" / "terms-b.json"
+        before = untouched.stat().st_mtime_ns
+        self.write_page("index.md", "# Home\n\nWelcome to **Mordor**")
+        self.build()
+        self.assertNotIn("middle", self.read("terms-m.json"))
+        self.assertEqual(self.read("terms-m.json")["mordor"], [1])
+        self.assertFalse((self.dest / "search" / "terms-e.json").exists())
+        self.assertEqual(untouched.stat().st_mtime_ns, before)
+
+        (self.content / "blog/tom/index.md").unlink()
+        self.write_page("new.md", "# New\n\nhobbit")
+        self.build()
+        self.assertEqual(self.read("pages.json")["pages"], [["/site/new.html", "New"], ["/site/", "Home"]])
+        self.assertEqual(self.read("terms-h.json")["hobbit"], [0])
+        self.assertNotIn("tom", self.read("terms-t.json"))
+
+    def test_freed_ids_are_reused_after_loading(self):
+        self.build()
+        (self.content / "blog/tom/index.md").unlink()
+        self.build()
+        self.assertEqual(self.read("pages.json")["pages"], [None, ["/site/", "Home"]])
+        self.write_page("a.md", "# A\n\nfirst")
+        self.write_page("b.md", "# B\n\nsecond")
+        self.build()
+        self.assertEqual(self.read("pages.json")["pages"],
+                         [["/site/a.html", "A"], ["/site/", "Home"], ["/site/b.html", "B"]])
+
+    def test_missing_index_files_are_rebuilt(self):
+        self.build()
+        (self.dest / "search" / "terms-w.json").unlink()
+        self.build()
+        self.assertEqual(self.read("terms-w.json")["welcome"], [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
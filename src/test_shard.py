@@ -0,0 +1,53 @@
+import unittest
+import json
+from generate_page import generate_pages_recursive
+from shard import merge_shard_manifests, parse_shard, shard_manifest_path, shard_of
+from site_testcase import SiteTestCase
+
+
+class TestShard(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for n in range(12):
+            self.write_page(f"d{n % 3}/page{n}.md", f"# Page {n}\n\n[next](/d{(n + 1) % 3}/page{n + 1}.html)")
+
+    def build_shards(self, count):
+        for index in range(1, count + 1):
+            generate_pages_recursive(self.content, self.template, self.dest, "/",
+                                     shard_manifest_path(self.manifest, index, count), shard=(index, count))
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for bad in ["0/4", "5/4", "1/0", "two/4", "1"]:
+            with self.assertRaises(ValueError):
+                parse_shard(bad)
+
+    def test_shard_of_is_stable_and_in_range(self):
+        self.assertEqual(shard_of("blog/tom/index.md", 4), shard_of("blog/tom/index.md", 4))
+        shards = {shard_of(f"page{n}.md", 4) for n in range(100)}
+        self.assertEqual(shards, {1, 2, 3, 4})
+
+    def test_shards_cover_every_page_once(self):
+        self.build_shards(3)
+        merged = merge_shard_manifests(self.manifest, 3, self.dest)
+        self.assertEqual(len(merged.pages), 12)
+        self.assertEqual(len(list(self.dest.rglob("*.html"))), 12)
+        self.assertTrue(self.manifest.exists())
+
+    def test_merge_reports_conflicts(self):
+        self.build_shards(2)
+        first = shard_manifest_path(self.manifest, 1, 2)
+        second = shard_manifest_path(self.manifest, 2, 2)
+        data = json.loads(second.read_text(encoding='utf-8'))
+        data["pages"].update(json.loads(first.read_text(encoding='utf-8'))["pages"])
+        second.write_text(json.dumps(data), encoding='utf-8')
+        with self.assertRaises(ValueError) as context:
+            merge_shard_manifests(self.manifest, 2)
+        self.assertIn("built by more than one shard", str(context.exception))
+        self.assertIn("belongs to shard 1", str(context.exception))
+        self.assertFalse(self.manifest.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
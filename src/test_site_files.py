@@ -0,0 +1,77 @@
+import unittest
+import json
+import os
+from build_manifest import BuildManifest
+from generate_page import generate_pages_recursive
+from site_files import FEED_NAME, PAGE_INDEX_NAME, SITEMAP_NAME
+from site_testcase import SiteTestCase
+
+
+class TestSiteFiles(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_page("index.md", "# Home\n\nWelcome to **Middle-earth** & friends", 1_000)
+        self.write_page("blog/index.md", "# Blog\n\nAll posts", 2_000)
+        self.write_page("blog/tom/index.md", "# Tom\n\nTom Bombadil", 3_000)
+        self.write_page("blog/glorfindel/index.md", "# Glorfindel\n\nAn elf lord", 4_000)
+
+    def write_page(self, name, markdown, days):
+        """Writes a page last modified days after the epoch."""
+        path = super().write_page(name, markdown)
+        os.utime(path, (days * 86400, days * 86400))
+        return path
+
+    def build(self, manifest=True):
+        generate_pages_recursive(self.content, self.template, self.dest, "/site/",
+                                 self.manifest if manifest else None, site_url="https://example.com/")
+
+    def read(self, name):
+        return (self.dest / name).read_text(encoding='utf-8')
+
+    def test_site_files(self):
+        self.build()
+        sitemap = self.read(SITEMAP_NAME)
+        self.assertIn("<url><loc>https://example.com/site/</loc><lastmod>1972-09-27</lastmod></url>", sitemap)
+        self.assertIn("<loc>https://example.com/site/blog/tom/</loc>", sitemap)
+
+        feed = self.read(FEED_NAME)
+        self.assertIn("<title>Home</title>", feed)
+        self.assertIn("<description>Welcome to Middle-earth &amp; friends</description>", feed)
+        self.assertNotIn("All posts", feed)
+        self.assertLess(feed.index("Glorfindel"), feed.index("Tom"))
+
+        index = json.loads(self.read(PAGE_INDEX_NAME))
+        self.assertEqual(index["site_url"], "https://example.com")
+        self.assertEqual(index["pages"][-1], {"url": "/site/", "path": "index.html", "title": "Home",
+                                              "date": "1972-09-27",
+                                              "summary": "Welcome to Middle-earth & friends"})
+
+        without_manifest = {name: self.read(name) for name in (SITEMAP_NAME, FEED_NAME, PAGE_INDEX_NAME)}
+        self.build(manifest=False)
+        self.assertEqual({name: self.read(name) for name in without_manifest}, without_manifest)
+
+    def test_incremental_update(self):
+        self.build()
+        feed = self.dest / FEED_NAME
+        before = feed.stat().st_mtime_ns
+        self.build()
+        self.assertEqual(feed.stat().st_mtime_ns, before)
+
+        self.write_page("blog/tom/index.md", "# Tom\n\nOld Tom Bombadil", 5_000)
+        home = self.dest / "index.html"
+        home_before = home.stat().st_mtime_ns
+        self.build()
+        self.assertEqual(home.stat().st_mtime_ns, home_before)
+        self.assertIn("Old Tom Bombadil", self.read(FEED_NAME))
+        self.assertLess(self.read(FEED_NAME).index("Tom"), self.read(FEED_NAME).index("Glorfindel"))
+
+        (self.content / "blog/glorfindel/index.md").unlink()
+        self.build()
+        self.assertNotIn("glorfindel", self.read(SITEMAP_NAME))
+        self.assertEqual(BuildManifest.load(self.manifest).pages["index.md"]["summary"],
+                         "Welcome to Middle-earth & friends")
+
+
+if __name__ == '__main__':
+    unittest.main()
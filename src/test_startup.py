@@ -0,0 +1,80 @@
+import unittest
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent
+
+# Modules of this package that a build with nothing to do may import. Anything
+# else, the renderer in particular, must be imported only once there is work.
+STARTUP_MODULES = {"main", "build_manifest", "shard"}
+
+
+def imported_modules(args, cwd) -> tuple:
+    """Runs python -X importtime with args and returns (stdout, names of the modules it imported)."""
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return result.stdout, modules
+
+
+class TestStartup(unittest.TestCase):
+
+    def own_modules(self, modules):
+        return {name for name in modules if (SRC_DIR / f"{name}.py").exists()}
+
+    def test_importing_main_does_not_import_the_renderer(self):
+        _, modules = imported_modules(["-c", "import main"], SRC_DIR)
+        self.assertEqual(self.own_modules(modules), STARTUP_MODULES)
+
+    def test_noop_build_exits_before_importing_the_renderer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "content").mkdir()
+            (root / "content" / "index.md").write_text("# Home\n\nHello", encoding='utf-8')
+            (root / "static").mkdir()
+            (root / "static" / "style.css").write_text("body {}", encoding='utf-8')
+            (root / "template.html").write_text("<title>{{Title}}</title>{{Content}}", encoding='utf-8')
+            main = str(SRC_DIR / "main.py")
+
+            output, modules = imported_modules([main], root)
+            self.assertIn("generate_page", modules)
+            self.assertFalse((root / ".block-cache.json").exists())
+            output, modules = imported_modules([main], root)
+            self.assertIn("Nothing changed", output)
+            # Run as a script, main itself is __main__.
+            self.assertEqual(self.own_modules(modules), STARTUP_MODULES - {"main"})
+
+            (root / "static" / "style.css").write_text("body { margin: 0 }", encoding='utf-8')
+            output, modules = imported_modules([main], root)
+            self.assertNotIn("Nothing changed", output)
+            (root / "content" / "index.md").unlink()
+            output, modules = imported_modules([main], root)
+            self.assertNotIn("Nothing changed", output)
+            self.assertFalse((root / "docs" / "index.html").exists())
+
+    def test_precompressed_noop_build_skips_small_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "content").mkdir()
+            (root / "content" / "index.md").write_text("# Home\n\n" + "Hello. " * 100, encoding='utf-8')
+            (root / "static").mkdir()
+            (root / "static" / "style.css").write_text("body {}", encoding='utf-8')
+            (root / "template.html").write_text("<title>{{Title}}</title>{{Content}}", encoding='utf-8')
+            main = str(SRC_DIR / "main.py")
+
+            imported_modules([main, "--precompress"], root)
+            self.assertTrue((root / "docs" / "index.html.gz").exists())
+            self.assertFalse((root / "docs" / "style.css.gz").exists())
+            output, _ = imported_modules([main, "--precompress"], root)
+            self.assertIn("Nothing changed", output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from htmlnode import LeafNode, ParentNode
+from template import Template, Slot, add_image_sizes, minify_whitespace
+
+
+class TestTemplate(unittest.TestCase):
+
+    def test_compiles_literals_and_slots(self):
+        template = Template('<title>{{Title}}</title><link href="/a.css">{{Content}}', "/site/")
+        self.assertEqual(template.segments[0], "<title>")
+        self.assertIsInstance(template.segments[1], Slot)
+        self.assertEqual(template.segments[2], '</title><link href="/site/a.css">')
+        self.assertEqual(template.slots, {"Title", "Content"})
+
+    def test_missing_required_slot(self):
+        with self.assertRaises(ValueError):
+            Template("<title>{{Title}}</title>")
+
+    def test_render(self):
+        template = Template("<title>{{Title}}</title>{{Nav}}<main>{{Content}}</main>{{Unknown}}", "/site/")
+        content = ParentNode("div", [LeafNode("img", "", {"src": "/tom.png"})])
+        html = template.render(content, {"Title": "Tom", "Nav": '<a href="/">Home</a>'})
+        self.assertEqual(
+            html,
+            '<title>Tom</title><a href="/site/">Home</a><main><div><img src="/site/tom.png"></img></div></main>{{Unknown}}',
+        )
+
+    def test_fingerprinted_assets(self):
+        assets = {"a.css": "a.1234abcd.css", "tom.png": "tom.5678ef01.png"}
+        template = Template('<link href="/a.css"><a href="/b.css">{{Title}}</a>{{Content}}', "/site/", assets)
+        content = ParentNode("div", [LeafNode("img", "", {"src": "/tom.png"}), LeafNode("a", "x", {"href": "/tom"})])
+        self.assertEqual(
+            template.render(content, {"Title": "Tom"}),
+            '<link href="/site/a.1234abcd.css"><a href="/site/b.css">Tom</a>'
+            '<div><img src="/site/tom.5678ef01.png"></img><a href="/site/tom">x</a></div>',
+        )
+
+    def test_fingerprinted_asset_urls_keep_their_query(self):
+        template = Template("{{Title}}{{Content}}", "/", {"my tom.png": "my tom.5678ef01.png"})
+        content = ParentNode("div", [LeafNode("img", "", {"src": "/my%20tom.png?v=2#top"})])
+        self.assertEqual(template.render(content, {"Title": "Tom"}),
+                         'Tom<div><img src="/my%20tom.5678ef01.png?v=2#top"></img></div>')
+
+    def test_image_sizes(self):
+        images = {"tom.png": (928, 468)}
+        template = Template('<img src="/tom.png" />{{Title}}{{Content}}', "/site/", {"tom.png": "tom.1234abcd.png"}, images)
+        content = ParentNode("div", [LeafNode("img", "", {"src": "/tom.png", "alt": "Tom"}),
+                                     LeafNode("img", "", {"src": "/other.png"}),
+                                     LeafNode("img", "", {"src": "/tom.png", "width": "10"})])
+        self.assertEqual(
+            template.render(content, {"Title": "Tom"}),
+            '<img src="/site/tom.1234abcd.png" width="928" height="468" loading="lazy" decoding="async" />Tom'
+            '<div><img alt="Tom" src="/site/tom.1234abcd.png" width="928" height="468" loading="lazy" decoding="async">'
+            '</img><img src="/site/other.png"></img><img src="/site/tom.1234abcd.png" width="10"></img></div>',
+        )
+
+    def test_image_sizes_of_escaped_urls(self):
+        html = add_image_sizes('<img src="/my%20tom.png?v=2">', {"my tom.png": (1, 2)})
+        self.assertEqual(html, '<img src="/my%20tom.png?v=2" width="1" height="2" loading="lazy" decoding="async">')
+
+    def test_minify_whitespace(self):
+        source = ("<!doctype html>\n<html>\n  <head>\n    <title>{{Title}}</title>\n  </head>\n"
+                  "  <body>\n    <b>a</b>\n    <i>b</i>  {{Content}}\n"
+                  "    <pre>\n  kept\n  <b>x</b>\n</pre>\n  </body>\n</html>\n")
+        self.assertEqual(
+            minify_whitespace(source),
+            "<!doctype html><html><head><title>{{Title}}</title></head><body><b>a</b> <i>b</i>  {{Content}}\n"
+            "    <pre>\n  kept\n  <b>x</b>\n</pre></body></html>",
+        )
+
+    def test_missing_values_render_empty(self):
+        template = Template("{{Title}}|{{Date}}|{{Content}}")
+        self.assertEqual(template.render(LeafNode(None, "x"), {"Title": "T"}), "T||x")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import json
+import os
+import tempfile
+from pathlib import Path
+from generate_page import generate_pages_recursive
+from timings import StageTimer, Timings
+
+
+class TestTimings(unittest.TestCase):
+
+    def test_stage_totals_and_slowest_pages(self):
+        timings = Timings()
+        timings.add_spans([("read", 0.0, 0.5, 1), ("write", 0.5, 0.25, 1)], page="a.md")
+        timings.add_spans([("read", 1.0, 0.1, 1)], page="b.md")
+        self.assertEqual(timings.totals["read"], [0.6, 2])
+        self.assertEqual(timings.slowest_pages(1), [("a.md", 0.75)])
+        self.assertIn("a.md", timings.report(2))
+
+    def test_stage_timer_records_spans(self):
+        timer = StageTimer()
+        with timer.stage("block_split", calls=3):
+            pass
+        name, _, seconds, calls = timer.spans[0]
+        self.assertEqual((name, calls), ("block_split", 3))
+        self.assertGreaterEqual(seconds, 0)
+
+    def test_build_records_every_page_stage(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "content").mkdir()
+            (root / "content" / "index.md").write_text("# Home\n\nHello", encoding='utf-8')
+            (root / "template.html").write_text("{{Title}}{{Content}}", encoding='utf-8')
+            timings = Timings()
+            generate_pages_recursive(root / "content", root / "template.html", root / "docs", timings=timings)
+            for stage in ("walk", "read", "block_split", "inline_parse", "serialize", "template", "write"):
+                self.assertIn(stage, timings.totals)
+            self.assertEqual((root / "docs" / "index.html").read_text(encoding='utf-8'), "Home<div><h1>Home</h1><p>Hello</p></div>")
+
+            trace_path = root / "trace.json"
+            timings.write_trace(trace_path)
+            events = json.loads(trace_path.read_text(encoding='utf-8'))["traceEvents"]
+            self.assertTrue(all(event["ph"] == "X" and event["pid"] == os.getpid() for event in events))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import os
+from pathlib import Path
+from copy_static import sync_directory
+from generate_page import generate_pages_recursive
+from site_testcase import SiteTestCase
+from watch import SiteWatcher
+
+
+class TestSiteWatcher(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.static.mkdir()
+        self.write_page("index.md", "# Home\n\nWelcome")
+        self.write_page("about.md", "# About\n\nUs")
+        (self.static / "index.css").write_text("body {}", encoding='utf-8')
+        sync_directory(self.static, self.dest, self.manifest)
+        generate_pages_recursive(self.content, self.template, self.dest, "/", self.manifest)
+        self.watcher = SiteWatcher(self.content, self.static, self.template, self.dest, "/", self.manifest)
+
+    def bump(self, path: Path, text: str):
+        # Push the mtime forward so the change is seen even on coarse-grained filesystems.
+        mtime = path.stat().st_mtime_ns if path.exists() else 0
+        path.write_text(text, encoding='utf-8')
+        os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.poll(), [])
+
+    def test_markdown_change_rebuilds_one_page(self):
+        self.bump(self.content / "about.md", "# About\n\nThem")
+        self.assertEqual(self.watcher.poll(), [f"Rebuilt {self.dest / 'about.html'}"])
+        self.assertIn("Them", (self.dest / "about.html").read_text(encoding='utf-8'))
+
+    def test_removed_markdown_removes_page(self):
+        (self.content / "about.md").unlink()
+        self.watcher.poll()
+        self.assertFalse((self.dest / "about.html").exists())
+
+    def test_removed_files_lose_their_compressed_copies(self):
+        copies = [self.dest / "about.html.gz", self.dest / "index.css.gz"]
+        for copy in copies:
+            copy.write_bytes(b"stale")
+        (self.content / "about.md").unlink()
+        (self.static / "index.css").unlink()
+        self.watcher.poll()
+        self.assertFalse(any(copy.exists() for copy in copies))
+
+    def test_template_change_rebuilds_all_pages(self):
+        self.bump(self.template, "<h1>{{Title}}</h1>{{Content}}")
+        self.watcher.poll()
+        self.assertTrue((self.dest / "index.html").read_text(encoding='utf-8').startswith("<h1>Home</h1>"))
+        self.assertTrue((self.dest / "about.html").read_text(encoding='utf-8').startswith("<h1>About</h1>"))
+
+    def test_static_change_recopies_asset(self):
+        self.bump(self.static / "index.css", "body { margin: 0 }")
+        self.assertEqual(self.watcher.poll(), [f"Copied {self.dest / 'index.css'}"])
+        self.assertEqual((self.dest / "index.css").read_text(encoding='utf-8'), "body { margin: 0 }")
+
+    def test_failed_page_does_not_stop_the_others(self):
+        self.bump(self.content / "about.md", "No title any more")
+        self.bump(self.content / "index.md", "# Home\n\nWelcome back")
+        self.bump(self.static / "index.css", "body { margin: 0 }")
+        actions = self.watcher.poll()
+        self.assertEqual(len(actions), 3)
+        self.assertIn(f"Rebuild failed for {self.content / 'about.md'}: ValueError", actions[0])
+        self.assertIn("Welcome back", (self.dest / "index.html").read_text(encoding='utf-8'))
+        self.assertEqual((self.dest / "index.css").read_text(encoding='utf-8'), "body { margin: 0 }")
+
+        # Still broken: tried again, but not reported again.
+        self.assertEqual(self.watcher.poll(), [])
+        (self.content / "about.md").write_text("# About\n\nFixed", encoding='utf-8')
+        self.assertEqual(self.watcher.poll(), [f"Rebuilt {self.dest / 'about.html'}"])
+        self.assertIn("Fixed", (self.dest / "about.html").read_text(encoding='utf-8'))
+
+    def test_removed_page_rebuilds_and_reports_dependents(self):
+        self.bump(self.content / "index.md", "# Home\n\n[About us](/about.html)")
+        self.watcher.poll()
+        (self.content / "about.md").unlink()
+        self.assertEqual(self.watcher.poll(), [
+            f"Removed {self.dest / 'about.html'}",
+            f"Rebuilt {self.dest / 'index.html'}",
+            "Broken link in index.md: /about.html",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
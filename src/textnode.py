@@ -30,6 +30,8 @@ def text_node_to_html_node(text_node):
         raise ValueError(f"Invalid text type: {text_node.text_type}")
 
 class TextNode(object):
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
@@ -0,0 +1,88 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Build stages in pipeline order, used to order reports.
+STAGES = ("static_copy", "walk", "read", "stream", "block_split", "inline_parse", "serialize", "template", "write")
+
+
+class StageTimer(object):
+    """
+    Records (stage, start, seconds, calls) spans for one page or one step of the build.
+
+    Spans are plain tuples so a timer filled in a worker process can be sent
+    back to the parent and merged into its Timings.
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def stage(self, name: str, calls: int = 1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, start, time.perf_counter() - start, calls))
+
+
+class Timings(object):
+    """Wall time and call counts per build stage, in aggregate and per page."""
+
+    def __init__(self):
+        self.totals = {}
+        self.pages = {}
+        self.events = []
+
+    def add_spans(self, spans, page: str = None, pid: int = None) -> None:
+        pid = pid if pid is not None else os.getpid()
+        for name, start, seconds, calls in spans:
+            total = self.totals.setdefault(name, [0.0, 0])
+            total[0] += seconds
+            total[1] += calls
+            if page is not None:
+                self.pages[page] = self.pages.get(page, 0.0) + seconds
+            self.events.append((name, page, start, seconds, pid))
+
+    @contextmanager
+    def stage(self, name: str, page: str = None, calls: int = 1):
+        timer = StageTimer()
+        with timer.stage(name, calls):
+            yield
+        self.add_spans(timer.spans, page)
+
+    def slowest_pages(self, count: int = 10) -> list:
+        return sorted(self.pages.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def report(self, count: int = 10) -> str:
+        order = {name: index for index, name in enumerate(STAGES)}
+        lines = [f"{'stage':<14}{'seconds':>10}{'calls':>10}"]
+        for name, (seconds, calls) in sorted(self.totals.items(), key=lambda item: order.get(item[0], len(order))):
+            lines.append(f"{name:<14}{seconds:>10.4f}{calls:>10}")
+        if self.pages and count:
+            lines.append("")
+            lines.append(f"{count} slowest pages:")
+            for page, seconds in self.slowest_pages(count):
+                lines.append(f"{seconds:>10.4f}  {page}")
+        return "\n".join(lines)
+
+    def write_trace(self, path) -> None:
+        """Writes the recorded spans as Chrome trace-event JSON (chrome://tracing, Perfetto)."""
+        origin = min((start for _, _, start, _, _ in self.events), default=0.0)
+        events = []
+        for name, page, start, seconds, pid in self.events:
+            event = {
+                "name": name,
+                "cat": "build",
+                "ph": "X",
+                "ts": (start - origin) * 1e6,
+                "dur": seconds * 1e6,
+                "pid": pid,
+                "tid": pid,
+            }
+            if page is not None:
+                event["args"] = {"page": page}
+            events.append(event)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,267 @@
+import functools
+import os
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from build_manifest import BuildManifest, hash_bytes, template_fingerprint
+from copy_static import copy_file
+from dependencies import DependencyGraph
+from generate_page import decode_text, generate_pages_recursive, page_summary, page_values, write_page
+from precompress import remove_compressed
+from site_files import write_site_files
+from template import Template, minify_whitespace
+
+
+def snapshot(paths) -> dict:
+    """Maps every file under the given files and directories to its mtime in nanoseconds."""
+    mtimes = {}
+    for path in paths:
+        path = Path(path)
+        if path.is_file():
+            mtimes[path] = path.stat().st_mtime_ns
+            continue
+        for root, _, files in os.walk(path):
+            for name in files:
+                file_path = Path(root) / name
+                try:
+                    mtimes[file_path] = file_path.stat().st_mtime_ns
+                except FileNotFoundError:
+                    pass
+    return mtimes
+
+
+def diff_snapshots(old: dict, new: dict):
+    """Returns the (changed, removed) paths between two snapshots; added files count as changed."""
+    changed = {path for path, mtime in new.items() if old.get(path) != mtime}
+    removed = set(old) - set(new)
+    return changed, removed
+
+
+class _BasepathHandler(SimpleHTTPRequestHandler):
+    """Serves docs/ and strips the basepath prefix so a site built for a subdirectory still works locally."""
+
+    basepath = "/"
+
+    def translate_path(self, path):
+        if self.basepath != "/" and path.startswith(self.basepath):
+            path = "/" + path[len(self.basepath):]
+        return super().translate_path(path)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory: Path, port: int, basepath: str = "/") -> ThreadingHTTPServer:
+    """Starts a local HTTP server for directory on a daemon thread and returns it."""
+    handler = type("Handler", (_BasepathHandler,), {"basepath": basepath})
+    server = ThreadingHTTPServer(("127.0.0.1", port), functools.partial(handler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class SiteWatcher(object):
+    """
+    Keeps a built site up to date as its sources change.
+
+    A changed markdown file rebuilds only its own page, a changed static file
+    is recopied on its own, and a changed template rebuilds every page. When
+    a page or asset is added, removed or renamed, the pages that link to it
+    are rebuilt too, found through the dependency graph, and any of their
+    links that are now broken are reported. The build manifest is kept
+    current so a later full build skips the same work, and so are
+    search_index, an optional search_index.SearchIndex, and with site_url
+    the site files (see site_files.write_site_files). minify renders pages
+    from the minified template, as generate_pages_recursive does.
+    """
+
+    def __init__(self, content_dir: Path, static_dir: Path, template_path: Path, dest_dir: Path,
+                 basepath: str = "/", manifest_path: Path = None, site_values: dict = None, search_index=None,
+                 site_url: str = None, minify: bool = False):
+        self.content_dir = Path(content_dir)
+        self.static_dir = Path(static_dir)
+        self.template_path = Path(template_path)
+        self.dest_dir = Path(dest_dir)
+        self.basepath = basepath
+        self.manifest_path = manifest_path
+        self.site_values = dict(site_values) if site_values else {}
+        self.search_index = search_index
+        self.site_url = site_url
+        self.minify = minify
+        # The last failure reported for each path, so a page that stays broken is reported once.
+        self._failures = {}
+        self._load_template()
+        self.mtimes = snapshot(self._watched())
+
+    def _watched(self):
+        return [self.content_dir, self.static_dir, self.template_path]
+
+    def _load_template(self):
+        template_bytes = self.template_path.read_bytes()
+        source = decode_text(template_bytes)
+        self.template = Template(minify_whitespace(source) if self.minify else source, self.basepath)
+        self.template_hash = template_fingerprint(template_bytes, self.site_values, minify=self.minify)
+
+    def poll(self) -> list:
+        """
+        Rebuilds whatever changed since the last poll and returns a description of each action.
+
+        A page or asset that fails is reported and tried again on the next
+        poll, without stopping the others; the same failure is only reported once.
+        """
+        new_mtimes = snapshot(self._watched())
+        changed, removed = diff_snapshots(self.mtimes, new_mtimes)
+        added = set(new_mtimes) - set(self.mtimes)
+        if not changed and not removed:
+            return []
+
+        actions = []
+        failed = set()
+        rebuilt_all = False
+        if self.template_path in changed:
+            try:
+                self._load_template()
+                rebuilt_all = True
+                generate_pages_recursive(self.content_dir, self.template_path, self.dest_dir, self.basepath,
+                                         self.manifest_path, site_values=self.site_values,
+                                         index_terms=self.search_index is not None, site_url=self.site_url,
+                                         minify=self.minify)
+                actions.append(f"Rebuilt all pages for {self.template_path}")
+                self._failures.pop(self.template_path, None)
+            except Exception as e:
+                failed.add(self.template_path)
+                actions.extend(self._failure(self.template_path, e))
+
+        manifest = BuildManifest.load(self.manifest_path) if self.manifest_path is not None else BuildManifest()
+        graph = DependencyGraph.from_manifest(manifest)
+        updated = set()
+        dependents = set()
+        for path in sorted(changed | removed):
+            is_page = _is_under(path, self.content_dir) and path.suffix == ".md"
+            if (is_page and rebuilt_all) or not (is_page or _is_under(path, self.static_dir)):
+                continue
+            try:
+                if is_page:
+                    key = path.relative_to(self.content_dir).as_posix()
+                    actions.append(self._update_page(manifest, path, path in changed))
+                    updated.add(key)
+                    if path in added or path in removed:
+                        dependents |= graph.page_dependents(key)
+                else:
+                    actions.append(self._update_asset(manifest, path, path in changed))
+                    if path in added or path in removed:
+                        dependents |= graph.asset_dependents(path.relative_to(self.static_dir).as_posix())
+                self._failures.pop(path, None)
+            except Exception as e:
+                failed.add(path)
+                actions.extend(self._failure(path, e))
+
+        for key in sorted(dependents - updated):
+            md_path = self.content_dir / key
+            if md_path.exists():
+                try:
+                    actions.append(self._update_page(manifest, md_path, True))
+                    updated.add(key)
+                except Exception as e:
+                    actions.extend(self._failure(md_path, e))
+
+        # Failed paths keep their old mtime, so the next poll tries them again.
+        for path in failed:
+            if path in self.mtimes:
+                new_mtimes[path] = self.mtimes[path]
+            else:
+                new_mtimes.pop(path, None)
+        self.mtimes = new_mtimes
+
+        broken = DependencyGraph.from_manifest(manifest).broken_links(self.dest_dir)
+        actions.extend(f"Broken link in {key}: {url}" for key, url in broken if key in updated)
+        if self.manifest_path is not None:
+            manifest.save()
+        if self.search_index is not None:
+            self._update_search_index(manifest)
+        if self.site_url is not None:
+            write_site_files(manifest.pages, self.dest_dir, self.site_url, self.basepath)
+        return actions
+
+    def _failure(self, path: Path, error: Exception) -> list:
+        """The action reporting a failed rebuild of path, or nothing if it failed the same way last time."""
+        message = f"Rebuild failed for {path}: {type(error).__name__}: {error}"
+        if self._failures.get(path) == message:
+            return []
+        self._failures[path] = message
+        return [message]
+
+    def _update_search_index(self, manifest: BuildManifest) -> None:
+        if self.search_index.update(manifest.pages, self.basepath):
+            self.search_index.save()
+
+    def _update_page(self, manifest: BuildManifest, md_path: Path, exists: bool) -> str:
+        relative_path = md_path.relative_to(self.content_dir)
+        dest_path = self.dest_dir / relative_path.with_suffix('.html')
+        key = relative_path.as_posix()
+        if not exists:
+            manifest.pages.pop(key, None)
+            if dest_path.exists():
+                dest_path.unlink()
+            remove_compressed(dest_path)
+            return f"Removed {dest_path}"
+
+        stat = md_path.stat()
+        md_bytes = md_path.read_bytes()
+        values = page_values(self.template, stat, self.site_values)
+        markdown_content = decode_text(md_bytes)
+        info = write_page(markdown_content, self.template, dest_path, self.basepath, values,
+                          index_terms=self.search_index is not None)
+        summary = page_summary(md_path, markdown_content) if self.site_url is not None else None
+        manifest.record_page(key, stat, hash_bytes(md_bytes), self.template_hash, self.basepath, dest_path,
+                             info.links, info.images, self.template_path, info.title, info.terms, summary)
+        return f"Rebuilt {dest_path}"
+
+    def _update_asset(self, manifest: BuildManifest, path: Path, exists: bool) -> str:
+        key = path.relative_to(self.static_dir).as_posix()
+        dest_path = self.dest_dir / key
+        if not exists:
+            manifest.assets.pop(key, None)
+            if dest_path.exists():
+                dest_path.unlink()
+            remove_compressed(dest_path)
+            return f"Removed {dest_path}"
+
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        copy_file(str(path), str(dest_path))
+        stat = path.stat()
+        manifest.assets[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return f"Copied {dest_path}"
+
+
+def _is_under(path: Path, directory: Path) -> bool:
+    try:
+        path.relative_to(directory)
+    except ValueError:
+        return False
+    return True
+
+
+def watch(content_dir: Path, static_dir: Path, template_path: Path, dest_dir: Path, basepath: str = "/",
+          manifest_path: Path = None, port: int = 8888, interval: float = 0.5, search_index=None,
+          site_url: str = None, minify: bool = False) -> None:
+    """Serves dest_dir on localhost and rebuilds changed pages and assets until interrupted."""
+    watcher = SiteWatcher(content_dir, static_dir, template_path, dest_dir, basepath, manifest_path,
+                          search_index=search_index, site_url=site_url, minify=minify)
+    server = serve(dest_dir, port, basepath)
+    print(f"Serving {dest_dir} at http://127.0.0.1:{port}{basepath}")
+    print(f"Watching {content_dir}, {static_dir} and {template_path} for changes (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(interval)
+            try:
+                for action in watcher.poll():
+                    print(action)
+            except Exception as e:
+                # poll() reports failed pages itself; keep serving whatever else goes wrong.
+                print(f"Rebuild failed: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()